@@ -0,0 +1,83 @@
+"""Times loading objects with Metastore.get_object one after another against
+AsyncMetastore.get_object run concurrently on one event loop, with an in-process fake
+Gremlin server that answers each request after a fixed round trip.
+
+    python benchmarks/bench_async_metastore.py --calls 500 --latency-ms 5 --limit 64
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import (  # noqa: E402
+    checksum_raw_object,
+    encode_raw_object_for_db,
+)
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from tests.fake_gremlin import (  # noqa: E402
+    FakeGremlinServer,
+    fake_async_metastore,
+    fake_metastore,
+)
+
+
+def fake_server(latency):
+    ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+    raw_content = encode_raw_object_for_db(ml_object)
+    properties = {
+        "raw_content": [{"value": raw_content}],
+        "raw_content_checksum": [{"value": checksum_raw_object(raw_content)}],
+    }
+    return FakeGremlinServer(
+        latency=latency, results_for=lambda query: [{"properties": properties}]
+    )
+
+
+def load_sequentially(calls, latency):
+    server = fake_server(latency)
+    metastore = fake_metastore(server)
+    start = time.perf_counter()
+    for index in range(calls):
+        metastore.get_object(f"node_{index}")
+    return time.perf_counter() - start, server.max_in_flight
+
+
+def load_concurrently(calls, latency, limit):
+    server = fake_server(latency)
+    metastore = fake_async_metastore(server, concurrency_limit=limit)
+
+    async def load_all():
+        await asyncio.gather(
+            *[metastore.get_object(f"node_{index}") for index in range(calls)]
+        )
+
+    start = time.perf_counter()
+    asyncio.run(load_all())
+    return time.perf_counter() - start, server.max_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--limit", type=int, default=64)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    latency = args.latency_ms / 1000
+
+    print(f"{'':<12} {'in flight':>9} {'seconds':>8}")
+    sequential, in_flight = load_sequentially(args.calls, latency)
+    print(f"{'sequential':<12} {in_flight:>9} {sequential:>8.3f}")
+    concurrent, in_flight = load_concurrently(args.calls, latency, args.limit)
+    print(f"{'concurrent':<12} {in_flight:>9} {concurrent:>8.3f}")
+    print(f"speedup: {sequential / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compares validating train_results submissions one at a time through
+MLObject.create_object_from_string with MLSchema.validate_batch, through its default
+compiled validators and through marshmallow (compiled=False).
+
+    python benchmarks/bench_batch_validation.py --count 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import convert_yaml_to_dict  # noqa: E402
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+SAMPLE_PATH = (
+    Path(__file__).parent.parent
+    / "tests"
+    / "data"
+    / "0"
+    / "0"
+    / "1"
+    / "train_results.yaml"
+)
+
+
+def build_submissions(count):
+    sample = convert_yaml_to_dict(SAMPLE_PATH.read_text(encoding="utf-8"))
+    submissions = []
+    for i in range(count):
+        submission = dict(sample)
+        submission["run_id"] = str(uuid.uuid4())
+        submission["global_step"] = i
+        submission["accuracy"] = (i % 1000) / 1000
+        submissions.append(submission)
+    return submissions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument(
+        "--per-object-count",
+        type=int,
+        default=2000,
+        help="The per-object path is slow, so it is timed on a smaller sample.",
+    )
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    submissions = build_submissions(args.count)
+
+    per_object = submissions[: args.per_object_count]
+    start = time.perf_counter()
+    for submission in per_object:
+        MLObject.create_object_from_string(submission)
+    per_object_rate = len(per_object) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    failures = sum(
+        1 for _, _, errors in MLSchema.validate_batch(submissions) if len(errors) > 0
+    )
+    batch_rate = len(submissions) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    marshmallow_failures = sum(
+        1
+        for _, _, errors in MLSchema.validate_batch(submissions, compiled=False)
+        if len(errors) > 0
+    )
+    marshmallow_rate = len(submissions) / (time.perf_counter() - start)
+
+    print(f"per object : {per_object_rate:>10.0f} docs/s ({len(per_object)} docs)")
+    print(
+        f"batch      : {batch_rate:>10.0f} docs/s ({len(submissions)} docs, {failures} failures)"
+    )
+    print(
+        f"marshmallow: {marshmallow_rate:>10.0f} docs/s ({len(submissions)} docs, {marshmallow_failures} failures)"
+    )
+    print(f"speedup    : {batch_rate / per_object_rate:>10.1f}x batch")
+    print(f"             {marshmallow_rate / per_object_rate:>10.1f}x marshmallow")
+
+if __name__ == "__main__":
+    main()
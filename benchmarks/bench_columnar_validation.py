@@ -0,0 +1,74 @@
+"""Compares validating a table of train_results rows as columns with
+MLSchemaColumns against validating each row as a dict with the compiled validator.
+
+    python benchmarks/bench_columnar_validation.py --count 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+import numpy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from mlspeclib.mlschemacolumns import MLSchemaColumns  # noqa: E402
+from mlspeclib.mlschemacompiler import MLSchemaCompiler  # noqa: E402
+
+SCHEMA_NAME = "0_0_1_train_results"
+
+
+def build_columns(count, invalid_every):
+    random = numpy.random.default_rng(0)
+    accuracy = random.random(count)
+    accuracy[::invalid_every] = numpy.nan
+    return {
+        "schema_version": numpy.full(count, "0.0.1"),
+        "schema_type": numpy.full(count, "train_results"),
+        "run_id": numpy.array([str(uuid.uuid4()) for _ in range(count)]),
+        "step_id": numpy.array([str(uuid.uuid4()) for _ in range(count)]),
+        "run_date": numpy.full(count, "1970-01-11 00:00:00.00000"),
+        "training_execution_id": numpy.full(count, str(uuid.uuid4())),
+        "accuracy": accuracy,
+        "global_step": numpy.arange(count),
+        "loss": random.random(count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--invalid-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    columns = build_columns(args.count, args.invalid_every)
+
+    start = time.perf_counter()
+    error_mask, errors = MLSchemaColumns.validate(SCHEMA_NAME, columns)
+    columnar = time.perf_counter() - start
+
+    validator = MLSchemaCompiler.validator_for(SCHEMA_NAME)
+    start = time.perf_counter()
+    lists = {name: column.tolist() for name, column in columns.items()}
+    row_errors = {}
+    for index in range(args.count):
+        row = {name: values[index] for name, values in lists.items()}
+        errors_for_row = validator(row)
+        if errors_for_row:
+            row_errors[index] = errors_for_row
+    per_row = time.perf_counter() - start
+
+    assert row_errors == errors and int(error_mask.sum()) == len(errors)
+    print(f"rows: {args.count}, failing: {len(errors)}")
+    print(f"compiled, per row : {per_row:>7.2f}s {args.count / per_row:>12,.0f} rows/s")
+    print(
+        f"columnar          : {columnar:>7.2f}s {args.count / columnar:>12,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
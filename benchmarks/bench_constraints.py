@@ -0,0 +1,74 @@
+"""Times checking a column of values against a constraint one value at a time, as
+marshmallow does, against the constraint's numpy-vectorized form, and compiling a
+constraint against fetching it from the compiled constraint cache.
+
+    python benchmarks/bench_constraints.py --count 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import COMPILED_CONSTRAINTS, generate_lambda  # noqa: E402
+
+CONSTRAINTS = {
+    "accuracy": ("0 <= x <= 1", lambda count: numpy.random.random(count)),
+    "batch size": (
+        "x % 32 == 0 and x > 0",
+        lambda count: numpy.random.randint(1, 64, count) * 32,
+    ),
+}
+
+
+def time_compile(constraint, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        COMPILED_CONSTRAINTS.pop(constraint, None)
+        generate_lambda(constraint)
+    uncached = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        generate_lambda(constraint)
+    cached = (time.perf_counter() - start) / repeat
+    return uncached, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--compile-repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(
+        f"{'':<12} {'scalar ms':>10} {'vector ms':>10} {'speedup':>8}"
+        f" {'compile us':>11} {'cached us':>10}"
+    )
+    for label, (constraint, make_column) in CONSTRAINTS.items():
+        column = make_column(args.count)
+        fxn = generate_lambda(constraint)
+
+        start = time.perf_counter()
+        values = column.tolist()
+        scalar_result = [fxn(value) is not False for value in values]
+        scalar = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector_result = fxn.vectorized(column)
+        vector = time.perf_counter() - start
+        assert vector_result.tolist() == scalar_result
+
+        uncached, cached = time_compile(constraint, args.compile_repeat)
+        print(
+            f"{label:<12} {scalar * 1e3:>10.1f} {vector * 1e3:>10.2f}"
+            f" {scalar / vector:>7.0f}x {uncached * 1e6:>11.1f} {cached * 1e6:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
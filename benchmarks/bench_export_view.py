@@ -0,0 +1,79 @@
+"""Compares exporting a large conversion object (long tf_inputs list of tensor shapes)
+through copies made by dict_without_internal_variables with exporting through
+view_without_internal_variables, for the steps of a save: validate, then yaml.
+
+    python benchmarks/bench_export_view.py --shapes 20000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import convert_dict_to_yaml  # noqa: E402
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "data", "0", "0", "1", "conversion.yaml"
+)
+
+
+def build_object(shapes):
+    ml_object, errors = MLObject.create_object_from_file(SAMPLE_PATH)
+    assert errors == {}, errors
+    ml_object.tf_inputs = [
+        [f"X:{index}", [1, index % 7 + 1]] for index in range(shapes)
+    ]
+    return ml_object
+
+
+def export_copies(ml_object):
+    errors = ml_object.get_schema().validate(
+        ml_object.dict_without_internal_variables()
+    )
+    return errors, convert_dict_to_yaml(ml_object.dict_without_internal_variables())
+
+
+def export_view(ml_object):
+    errors = ml_object.get_schema().validate(
+        ml_object.view_without_internal_variables()
+    )
+    return errors, convert_dict_to_yaml(ml_object.view_without_internal_variables())
+
+
+def measure(export, ml_object):
+    """Returns seconds and the bytes allocated beyond the yaml output, at peak."""
+    gc.collect()
+    start = time.perf_counter()
+    export(ml_object)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    errors, yaml_text = export(ml_object)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert errors == {}, errors
+    return elapsed, peak - sys.getsizeof(yaml_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shapes", type=int, default=20000)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    ml_object = build_object(args.shapes)
+    print(f"{'':<8} {'seconds':>8} {'peak MB':>8}")
+    for label, export in [("copies", export_copies), ("view", export_view)]:
+        elapsed, peak = measure(export, ml_object)
+        print(f"{label:<8} {elapsed:>8.3f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
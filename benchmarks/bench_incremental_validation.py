@@ -0,0 +1,68 @@
+"""Times a training loop that updates a few metrics and validates after each update,
+validating the whole object each time against MLObject's change-only validation.
+
+    python benchmarks/bench_incremental_validation.py --epochs 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+DATA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "data", "0", "0", "1"
+)
+
+
+def full_validation(ml_object):
+    return ml_object.get_schema().validate(ml_object.dict_without_internal_variables())
+
+
+def run_epochs(validate, epochs):
+    """Returns seconds per epoch for the train_results loop and for a nested update on
+    a datapath."""
+    train_results, _ = MLObject.create_object_from_file(
+        os.path.join(DATA_PATH, "train_results.yaml")
+    )
+    datapath, _ = MLObject.create_object_from_file(
+        os.path.join(DATA_PATH, "datapath.yaml")
+    )
+
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        train_results.global_step = epoch
+        train_results.accuracy = epoch / epochs
+        train_results.loss = 1 - epoch / epochs
+        assert validate(train_results) == {}
+    train_time = (time.perf_counter() - start) / epochs
+
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        datapath.connection.endpoint = f"S3://mybucket/{epoch}.jpg"
+        assert validate(datapath) == {}
+    datapath_time = (time.perf_counter() - start) / epochs
+    return train_time, datapath_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--epochs", type=int, default=2000)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    print(f"{'':<12} {'train_results us':>17} {'datapath us':>12}")
+    for label, validate in [
+        ("full", full_validation),
+        ("incremental", MLObject.validate),
+    ]:
+        train_time, datapath_time = run_epochs(validate, args.epochs)
+        print(f"{label:<12} {train_time * 1e6:>17.1f} {datapath_time * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
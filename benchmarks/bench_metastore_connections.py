@@ -0,0 +1,50 @@
+"""Times pipeline-style calls that each create a Metastore and run one query, against
+an in-process fake Gremlin server where connecting a client (TLS and auth) takes
+--connect-ms and each query takes --latency-ms. Compares a client per Metastore, which
+is what every Metastore used to open, with the shared GremlinClientPool.
+
+    python benchmarks/bench_metastore_connections.py --calls 100 --connect-ms 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.experimental.metastore import Metastore  # noqa: E402
+from tests.fake_gremlin import FakeGremlinServer, fake_credentials  # noqa: E402
+
+
+def run_calls(server, calls, shared_pool):
+    """Returns seconds per call."""
+    credentials_packed = fake_credentials()
+    start = time.perf_counter()
+    for _ in range(calls):
+        client_pool = shared_pool if shared_pool is not None else server.client_pool()
+        Metastore(credentials_packed, client_pool).get_all_runs("NODE_ID", "step")
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--connect-ms", type=float, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'':<22} {'connections':>11} {'ms per call':>12}")
+    results = {}
+    for label in ["client per Metastore", "shared pool"]:
+        server = FakeGremlinServer(
+            latency=args.latency_ms / 1000, connect_latency=args.connect_ms / 1000
+        )
+        shared_pool = server.client_pool() if label == "shared pool" else None
+        results[label] = run_calls(server, args.calls, shared_pool)
+        print(f"{label:<22} {server.connections:>11} {results[label] * 1000:>12.2f}")
+    print(f"speedup: {results['client per Metastore'] / results['shared pool']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
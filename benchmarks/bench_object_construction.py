@@ -0,0 +1,61 @@
+"""Times constructing MLObjects with set_type, which builds each object from a cached
+stub prototype, against building the stub from the schema every time.
+
+    python benchmarks/bench_object_construction.py --count 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import marshmallow.class_registry
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import recursive_fromkeys  # noqa: E402
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+
+def build_from_schema(schema_name):
+    """What create_stub_object did before stubs were cached."""
+    ml_object = MLObject()
+    object_schema = marshmallow.class_registry.get_class(schema_name)
+    object_schema()
+    ml_object.merge_update(recursive_fromkeys(object_schema().fields))
+    return ml_object
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--schema-type", default="datapath")
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    schema_name = f"0_0_1_{args.schema_type}"
+
+    start = time.perf_counter()
+    for _ in range(args.count):
+        build_from_schema(schema_name)
+    uncached = (time.perf_counter() - start) / args.count
+
+    start = time.perf_counter()
+    for _ in range(args.count):
+        MLObject().set_type("0.0.1", args.schema_type)
+    cached = (time.perf_counter() - start) / args.count
+
+    _, stub_dict = MLObject._stub_prototype(schema_name)
+    start = time.perf_counter()
+    for _ in range(args.count):
+        MLObject._clone_stub(stub_dict)
+    dict_copy = (time.perf_counter() - start) / args.count
+
+    print(f"stub from schema   : {uncached * 1e6:>8.1f} us/object")
+    print(f"set_type (cached)  : {cached * 1e6:>8.1f} us/object")
+    print(f"plain dict clone   : {dict_copy * 1e6:>8.1f} us/object")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Measures MLSchemaBatchValidator throughput on train_results submissions as the
+number of worker processes grows.
+
+    python benchmarks/bench_process_validation.py --count 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_batch_validation import build_submissions  # noqa: E402
+
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from mlspeclib.mlschemabatch import MLSchemaBatchValidator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    submissions = build_submissions(args.count)
+
+    start = time.perf_counter()
+    for _ in MLSchema.validate_batch(submissions):
+        pass
+    single_rate = args.count / (time.perf_counter() - start)
+    print(f"{'in process':>12}: {single_rate:>10.0f} docs/s")
+
+    for workers in sorted(set(args.workers)):
+        with MLSchemaBatchValidator(
+            workers=workers, chunk_size=args.chunk_size
+        ).start() as validator:
+            start = time.perf_counter()
+            for _ in validator.validate(submissions):
+                pass
+            rate = args.count / (time.perf_counter() - start)
+        print(
+            f"{workers:>4} workers: {rate:>10.0f} docs/s ({rate / single_rate:.2f}x in process)"
+        )
+
+
+if __name__ == "__main__":
+    main()
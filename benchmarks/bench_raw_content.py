@@ -0,0 +1,69 @@
+"""Compares raw_content encodings - the base64 yaml written before the codec header,
+and msgpack uncompressed, with zlib and with lzma - on the sample submissions under
+tests/data: total size and encode/decode time per object.
+
+    python benchmarks/bench_raw_content.py --iterations 200
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import (  # noqa: E402
+    decode_raw_object_from_db,
+    encode_raw_object_for_db,
+)
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+DATA_ROOT = Path(__file__).parent.parent / "tests" / "data"
+
+ENCODINGS = [
+    ("yaml (legacy)", dict(codec="yaml")),
+    ("msgpack", dict(codec="msgpack", compression="none")),
+    ("msgpack + zlib", dict(codec="msgpack", compression="zlib")),
+    ("msgpack + lzma", dict(codec="msgpack", compression="lzma")),
+]
+
+
+def time_it(function, items, iterations):
+    """Returns microseconds per item."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - start) / (iterations * len(items)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    ml_objects = [
+        MLObject.create_object_from_file(path)[0]
+        for path in sorted(DATA_ROOT.glob("**/*.yaml"))
+    ]
+
+    print(f"{'':<16} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for label, options in ENCODINGS:
+        encoded = [
+            encode_raw_object_for_db(ml_object, **options) for ml_object in ml_objects
+        ]
+        encode_time = time_it(
+            lambda ml_object: encode_raw_object_for_db(ml_object, **options),
+            ml_objects,
+            args.iterations,
+        )
+        decode_time = time_it(decode_raw_object_from_db, encoded, args.iterations)
+        total_size = sum(len(raw_content) for raw_content in encoded)
+        print(f"{label:<16} {total_size:>7} {encode_time:>10.1f} {decode_time:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compares memory use and attribute access of slots-based MLRecords with Box-backed
+MLObjects holding the same datapath submissions.
+
+    python benchmarks/bench_record_memory.py --count 20000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import convert_yaml_to_dict  # noqa: E402
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlrecord import MLRecord  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "data", "0", "0", "1", "datapath.yaml"
+)
+
+
+def build_submissions(count):
+    with open(SAMPLE_PATH, encoding="utf-8") as sample_file:
+        sample = convert_yaml_to_dict(sample_file.read())
+    submissions = []
+    for _ in range(count):
+        submission = dict(sample)
+        submission["connection"] = dict(sample["connection"])
+        submission["run_id"] = str(uuid.uuid4())
+        submissions.append(submission)
+    return submissions
+
+
+def measure(create, submissions):
+    """Returns the objects, bytes allocated per object and seconds per object."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [create(submission) for submission in submissions]
+    elapsed = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objects, allocated / len(objects), elapsed / len(objects)
+
+
+def time_access(objects, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for ml_object in objects:
+            ml_object.connection.endpoint  # pylint: disable=pointless-statement
+            ml_object.run_id  # pylint: disable=pointless-statement
+    return (time.perf_counter() - start) / (repeat * len(objects) * 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--access-repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    submissions = build_submissions(args.count)
+    record_type = MLRecord.type_for("0.0.1", "datapath")
+
+    def create_mlobject(submission):
+        ml_object = MLObject()
+        ml_object.set_type("0.0.1", "datapath")
+        MLObject.update_tree(ml_object, submission)
+        return ml_object
+
+    print(
+        f"{'':<10} {'bytes/object':>13} {'GB per 1M':>10} {'build us':>9} {'attr ns':>8}"
+    )
+    for label, create in [
+        ("MLObject", create_mlobject),
+        ("MLRecord", record_type.from_dict),
+    ]:
+        objects, bytes_per_object, build_time = measure(create, submissions)
+        access_time = time_access(objects, args.access_repeat)
+        print(
+            f"{label:<10} {bytes_per_object:>13.0f} {bytes_per_object * 1e6 / 1e9:>10.2f}"
+            f" {build_time * 1e6:>9.1f} {access_time * 1e9:>8.0f}"
+        )
+        del objects
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compares packing validated train_results MLObjects into a numpy record array with
+MLSchemaColumns.pack against converting each object to a dict and building the
+array from per-field lists.
+
+    python benchmarks/bench_record_packing.py --count 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import numpy
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import convert_yaml_to_dict  # noqa: E402
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from mlspeclib.mlschemacolumns import MLSchemaColumns  # noqa: E402
+
+SCHEMA_NAME = "0_0_1_train_results"
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "tests",
+    "data",
+    "0",
+    "0",
+    "1",
+    "train_results.yaml",
+)
+
+
+def build_objects(count):
+    with open(SAMPLE_PATH, encoding="utf-8") as sample_file:
+        sample = convert_yaml_to_dict(sample_file.read())
+    objects = []
+    for index in range(count):
+        ml_object = MLObject()
+        ml_object.set_type("0.0.1", "train_results")
+        MLObject.update_tree(ml_object, sample)
+        ml_object.run_id = str(uuid.uuid4())
+        ml_object.global_step = index
+        ml_object.accuracy = (index % 1000) / 1000
+        objects.append(ml_object)
+    return objects
+
+
+def pack_by_hand(objects):
+    """Each object to a dict, then a list and an array per field."""
+    record_dtype = MLSchemaColumns.dtype_for(SCHEMA_NAME)
+    rows = [ml_object.dict_without_internal_variables() for ml_object in objects]
+    records = numpy.zeros(len(rows), record_dtype)
+    for field_name in record_dtype.names:
+        records[field_name] = [row[field_name] for row in rows]
+    return records
+
+
+def measure(pack, objects):
+    start = time.perf_counter()
+    records = pack(objects)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    pack(objects)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    objects = build_objects(args.count)
+
+    print(f"{'':<14} {'seconds':>8} {'objects/s':>11} {'peak MB':>8}")
+    results = []
+    for label, pack in [
+        ("by hand", pack_by_hand),
+        ("pack", lambda objects: MLSchemaColumns.pack(SCHEMA_NAME, objects)),
+    ]:
+        records, elapsed, peak = measure(pack, objects)
+        results.append(numpy.asarray(records))
+        print(
+            f"{label:<14} {elapsed:>8.2f} {args.count / elapsed:>11,.0f}"
+            f" {peak / 1e6:>8.1f}"
+        )
+    assert (results[0] == results[1]).all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Times loading single runs of a step with a long run history, against an in-process
+fake Gremlin server that answers after a fixed round trip and serializes its results
+through JSON (so, like GraphSON, a bigger answer costs more to decode). Compares
+fetching every run of the step and picking one out, which is what get_run_info used
+to do, with the point lookup and the point lookup through the run cache, and times
+building the run's MLObject with get_step_object with and without the cache (the
+cache keeps each run's raw_content decoded). Cached loads are timed again once every
+run is cached, to show what a hit costs on its own.
+
+    python benchmarks/bench_run_lookup.py --runs 500 --loads 200 --distinct 50
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.experimental.vertex_cache import VertexCache  # noqa: E402
+from mlspeclib.helpers import (  # noqa: E402
+    checksum_raw_object,
+    encode_raw_object_for_db,
+)
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from tests.fake_gremlin import FakeGremlinServer, fake_metastore  # noqa: E402
+
+
+def run_history(run_count):
+    ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+    raw_content = encode_raw_object_for_db(ml_object)
+    checksum = checksum_raw_object(raw_content)
+    return {
+        f"run_{index}": {
+            "id": f"run_{index}",
+            "properties": {
+                "raw_content": [{"value": raw_content}],
+                "raw_content_checksum": [{"value": checksum}],
+            },
+        }
+        for index in range(run_count)
+    }
+
+
+def fake_server(runs, latency):
+    def results_for(query):
+        if ".out('results')" in query:
+            results = list(runs.values())
+        else:
+            results = [runs[query[len("g.V('") :].split("'")[0]]]
+        return json.loads(json.dumps(results))
+
+    return FakeGremlinServer(latency=latency, results_for=results_for)
+
+
+def time_loads(load, run_ids):
+    start = time.perf_counter()
+    for run_id in run_ids:
+        load(run_id)
+    return (time.perf_counter() - start) / len(run_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    runs = run_history(args.runs)
+    random.seed(0)
+    run_ids = [f"run_{random.randrange(args.distinct)}" for _ in range(args.loads)]
+    latency = args.latency_ms / 1000
+
+    def all_runs(metastore):
+        return lambda run_id: metastore.get_all_runs("NODE_ID", "step")[run_id]
+
+    def point_lookup(metastore):
+        return lambda run_id: metastore.load("NODE_ID", "step", run_id)
+
+    def step_object(metastore):
+        return lambda run_id: metastore.get_step_object("NODE_ID", "step", run_id)
+
+    print(f"{'':<22} {'ms per load':>12} {'hit ratio':>10} {'us per hit':>11}")
+    results = {}
+    for label, loader, cache_size in [
+        ("all runs of the step", all_runs, 0),
+        ("point lookup", point_lookup, 0),
+        ("point lookup, cached", point_lookup, None),
+        ("step object", step_object, 0),
+        ("step object, cached", step_object, None),
+    ]:
+        metastore = fake_metastore(
+            fake_server(runs, latency), run_cache=VertexCache(maxsize=cache_size)
+        )
+        results[label] = time_loads(loader(metastore), run_ids)
+        hit_ratio = metastore.run_cache_stats()["hit_ratio"]
+        row = f"{label:<22} {results[label] * 1000:>12.3f} {hit_ratio:>10.2f}"
+        if cache_size is None:
+            row += f" {time_loads(loader(metastore), run_ids) * 1e6:>11.1f}"
+        print(row)
+
+    for label in ["point lookup", "point lookup, cached"]:
+        speedup = results["all runs of the step"] / results[label]
+        print(f"speedup, {label}: {speedup:.1f}x")
+    speedup = results["step object"] / results["step object, cached"]
+    print(f"speedup, step object, cached: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
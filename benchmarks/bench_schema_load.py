@@ -0,0 +1,104 @@
+"""Benchmarks loading large synthetic schema trees with append_schema_to_registry,
+parsing serially and across a process pool.
+
+    python benchmarks/bench_schema_load.py --sizes 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import marshmallow.class_registry
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from mlspeclib.mlschemaregistry import MLSchemaRegistry  # noqa: E402
+
+SCHEMA_TEMPLATE = """
+mlspec_schema_version:
+  meta: 9.9.9
+{base_block}
+mlspec_schema_type:
+  meta: {schema_type}
+
+schema_version:
+  type: semver
+  required: True
+
+schema_type:
+  type: allowed_schema_types
+  required: True
+
+{schema_type}_name:
+  type: string
+  required: True
+
+{schema_type}_score:
+  type: float
+  constraint: "x >= 0"
+
+{schema_type}_tags:
+  type: tags
+
+{schema_type}_location:
+  type: nested
+  schema:
+    endpoint:
+      type: URI
+      required: True
+    bucket:
+      type: bucket
+"""
+
+
+def write_synthetic_tree(schema_root: Path, count: int):
+    """Every tenth schema is a root, the rest inherit in chains up to four deep."""
+    for i in range(count):
+        base_block = ""
+        if i % 10 != 0:
+            base_block = f"\nmlspec_base_type:\n  meta: synthetic_{i - 1 if i % 10 % 4 else i - i % 10}\n"
+        (schema_root / f"synthetic_{i}.yaml").write_text(
+            SCHEMA_TEMPLATE.format(base_block=base_block, schema_type=f"synthetic_{i}")
+        )
+
+
+def time_load(schema_root: Path, workers: int):
+    registry_before = marshmallow.class_registry._registry.copy()
+
+    start = time.perf_counter()
+    parsed = MLSchemaRegistry.parse_schema_files(
+        MLSchemaRegistry.schema_files(schema_root), workers=workers
+    )
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    MLSchema.append_schema_to_registry(schema_root, workers=workers)
+    load_time = time.perf_counter() - start
+
+    marshmallow.class_registry._registry = registry_before
+    return len(parsed), parse_time, load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+
+    print(f"{'schemas':>8} {'workers':>8} {'parse (s)':>10} {'full load (s)':>14}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tree(Path(temp_dir), size)
+            for workers in sorted({1, args.workers}):
+                count, parse_time, load_time = time_load(Path(temp_dir), workers)
+                print(f"{count:>8} {workers:>8} {parse_time:>10.3f} {load_time:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
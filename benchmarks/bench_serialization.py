@@ -0,0 +1,62 @@
+"""Compares the yaml backends (pure python and libyaml) and the json fast path on
+the sample submissions under tests/data.
+
+    python benchmarks/bench_serialization.py --iterations 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.helpers import (  # noqa: E402
+    YAML_BACKENDS,
+    convert_dict_to_yaml,
+    convert_yaml_to_dict,
+    set_yaml_backend,
+)
+
+DATA_ROOT = Path(__file__).parent.parent / "tests" / "data"
+
+
+def time_it(function, documents, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for document in documents:
+            function(document)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    yaml_documents = [
+        path.read_text(encoding="utf-8") for path in sorted(DATA_ROOT.glob("**/*.yaml"))
+    ]
+    dict_documents = [convert_yaml_to_dict(document) for document in yaml_documents]
+    json_documents = [json.dumps(document, default=str) for document in dict_documents]
+    total = len(yaml_documents) * args.iterations
+
+    print(f"{len(yaml_documents)} documents x {args.iterations} iterations")
+    print(f"{'backend':>10} {'parse (us/doc)':>15} {'emit (us/doc)':>14}")
+    for backend in YAML_BACKENDS:
+        set_yaml_backend(backend)
+        parse_time = time_it(convert_yaml_to_dict, yaml_documents, args.iterations)
+        emit_time = time_it(convert_dict_to_yaml, dict_documents, args.iterations)
+        print(
+            f"{backend:>10} {parse_time / total * 1e6:>15.1f} {emit_time / total * 1e6:>14.1f}"
+        )
+
+    set_yaml_backend()
+    parse_time = time_it(convert_yaml_to_dict, json_documents, args.iterations)
+    print(f"{'json':>10} {parse_time / total * 1e6:>15.1f} {'-':>14}")
+
+
+if __name__ == "__main__":
+    main()
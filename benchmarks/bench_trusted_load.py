@@ -0,0 +1,77 @@
+"""Compares loading stored objects the way Metastore.get_object does, with full
+validation and with the trusted path taken when the raw_content checksum matches.
+
+    python benchmarks/bench_trusted_load.py --count 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.experimental.metastore import Metastore  # noqa: E402
+from mlspeclib.helpers import (  # noqa: E402
+    checksum_raw_object,
+    encode_raw_object_for_db,
+)
+from mlspeclib.mlobject import MLObject  # noqa: E402
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+
+SAMPLE_PATHS = [
+    os.path.join(os.path.dirname(__file__), "..", "tests", "data", *parts)
+    for parts in [
+        ("0", "0", "1", "datapath.yaml"),
+        ("0", "0", "1", "train_results.yaml"),
+        ("0", "0", "1", "workflow.yaml"),
+    ]
+]
+
+
+def build_raw_items(count):
+    """Returns vertices as get_node returns them, with raw_content and its checksum."""
+    raw_items = []
+    for path in SAMPLE_PATHS:
+        ml_object, errors = MLObject.create_object_from_file(path)
+        assert errors == {}, errors
+        raw_content = encode_raw_object_for_db(ml_object)
+        raw_items.append(
+            {
+                "properties": {
+                    "raw_content": [{"value": raw_content}],
+                    "raw_content_checksum": [
+                        {"value": checksum_raw_object(raw_content)}
+                    ],
+                }
+            }
+        )
+    return [raw_items[index % len(raw_items)] for index in range(count)]
+
+
+def time_load(raw_items, validate):
+    start = time.perf_counter()
+    for raw_item in raw_items:
+        Metastore._object_from_raw_item(raw_item, validate)
+    return (time.perf_counter() - start) / len(raw_items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    raw_items = build_raw_items(args.count)
+    time_load(raw_items[:10], True)
+
+    validated = time_load(raw_items, True)
+    trusted = time_load(raw_items, False)
+    print(f"{'':<10} {'us/object':>10}")
+    print(f"{'validated':<10} {validated * 1e6:>10.1f}")
+    print(f"{'trusted':<10} {trusted * 1e6:>10.1f}")
+    print(f"speedup: {validated / trusted:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
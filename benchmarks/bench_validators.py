@@ -0,0 +1,60 @@
+"""Times the MLSchemaValidators validators of single values over a stream in which a
+few hundred distinct values repeat, memoized and not.
+
+    python benchmarks/bench_validators.py --count 1000000 --distinct 300
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.mlschemavalidators import MLSchemaValidators  # noqa: E402
+
+VALUE_TEMPLATES = {
+    "semver": "{0}.{1}.{2}",
+    "URI": "https://storage.example.com/bucket-{0}/run-{1}/model-{2}.onnx",
+    "path": "/mnt/data/run-{0}/step-{1}/part-{2}.parquet",
+    "bucket": "training-bucket-{0}-{1}-{2}",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'':<8} {'plain ns':>9} {'memoized ns':>12} {'hit ratio':>10}")
+    for name, validator in MLSchemaValidators.memoized_validators().items():
+        template = VALUE_TEMPLATES[name]
+        distinct_values = [
+            template.format(index % 10, index // 10 % 10, index // 100)
+            for index in range(args.distinct)
+        ]
+        values = [rng.choice(distinct_values) for _ in range(args.count)]
+
+        start = time.perf_counter()
+        for value in values:
+            validator.__wrapped__(value)
+        plain = (time.perf_counter() - start) / args.count
+
+        MLSchemaValidators.clear_caches()
+        start = time.perf_counter()
+        for value in values:
+            validator(value)
+        memoized = (time.perf_counter() - start) / args.count
+
+        cache_info = validator.cache_info()
+        hit_ratio = cache_info.hits / (cache_info.hits + cache_info.misses)
+        print(
+            f"{name:<8} {plain * 1e9:>9.0f} {memoized * 1e9:>12.0f} {hit_ratio:>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Times registering a workflow's steps with Metastore.create_workflow_steps against an
+in-process fake Gremlin server that answers each request after a fixed round trip,
+writing one step or edge per request against the default batching.
+
+    python benchmarks/bench_workflow_registration.py --steps 200 --latency-ms 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mlspeclib.mlschema import MLSchema  # noqa: E402
+from tests.fake_gremlin import FakeGremlinServer, fake_metastore  # noqa: E402
+from tests.test_gremlinclient import workflow_with_steps  # noqa: E402
+
+
+def register(workflow_object, latency, batch_size):
+    """Returns seconds taken and requests made."""
+    server = FakeGremlinServer(latency=latency)
+    metastore = fake_metastore(server)
+    start = time.perf_counter()
+    metastore.create_workflow_steps("FAKE_NODE_ID", workflow_object, batch_size)
+    return time.perf_counter() - start, len(server.queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    MLSchema.populate_registry()
+    workflow_object = workflow_with_steps(args.steps)
+    latency = args.latency_ms / 1000
+
+    print(f"{'':<14} {'requests':>9} {'seconds':>8}")
+    results = {}
+    for label, batch_size in [("one per step", 1), ("batched", None)]:
+        elapsed, requests = register(workflow_object, latency, batch_size)
+        results[label] = elapsed
+        print(f"{label:<14} {requests:>9} {elapsed:>8.3f}")
+    print(f"speedup: {results['one per step'] / results['batched']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import asyncio
 import base64
+import functools
 import logging
 import re
 import sys
@@ -9,18 +10,26 @@ from pathlib import Path
 
 import pymysql
 import tornado
-import yaml
-from gremlin_python.driver import client, serializer
 
 from mlspeclib.helpers import (
+    checksum_raw_object,
+    convert_yaml_to_dict,
     encode_raw_object_for_db,
     return_schema_name,
 )
+from mlspeclib.experimental.gremlin_pool import GremlinClientPool
+from mlspeclib.experimental.vertex_cache import DecodedVertex, VertexCache
 from mlspeclib.mlobject import MLObject
 
 sys.path.append("..")
 sys.path.append(str(Path(__file__).parent.resolve()))
 
+# Traversals sent per request by execute_batch
+GREMLIN_BATCH_SIZE = 25
+
+# Queries an AsyncGremlinHelpers has in flight at once, unless given another limit
+GREMLIN_CONCURRENCY_LIMIT = 64
+
 
 class GremlinHelpers:
     _gremlin_cleanup_graph = "g.V().drop()"
@@ -32,7 +41,8 @@ class GremlinHelpers:
     _database_name = None
     _container_name = None
     _workflow_partition_id = None
-    _gremlin_client = None
+    _client_pool = None
+    _run_cache = None
     _workflow_node_id = None
     _request = None
     _driver_remote_connection = None
@@ -46,11 +56,12 @@ class GremlinHelpers:
         database_name=None,
         container_name=None,
         credentials_packed: str = None,
+        client_pool: GremlinClientPool = None,
+        run_cache: VertexCache = None,
     ):
         self._rootLogger = logging.getLogger()
 
-        credential_unpacked = base64.urlsafe_b64decode(credentials_packed)
-        credential_dict = yaml.safe_load(credential_unpacked)
+        credential_dict = unpack_credentials(credentials_packed)
 
         if credential_dict is not None:
             url = credential_dict["url"]
@@ -66,19 +77,27 @@ class GremlinHelpers:
         # TODO this is almost certainly wrong. Should probably partition by workflow.
         self._workflow_partition_id = str(uuid.uuid4())
 
-        self._rootLogger.debug(f"Loading gremlin wss endpoint: {self._url}")
-        self._gremlin_client = client.Client(
-            f"{self._url}",
-            "g",
-            username=f"/dbs/{self._database_name}/colls/{self._container_name}",
-            password=f"{self._key}",
-            message_serializer=serializer.GraphSONSerializersV2d0(),
+        # Connected on the first query, and shared with every GremlinHelpers for the
+        # same container
+        if client_pool is None:
+            client_pool = GremlinClientPool.shared()
+        self._client_pool = client_pool
+
+        # Runs loaded by get_run_info, shared with every GremlinHelpers by default
+        if run_cache is None:
+            run_cache = VertexCache.shared()
+        self._run_cache = run_cache
+
+    def _gremlin_client(self):
+        return self._client_pool.client_for(
+            self._url, self._key, self._database_name, self._container_name
         )
 
     def cleanup_graph(self):
         self._rootLogger.debug(
             "\tRunning this Gremlin query:\n\t{0}".format(self._gremlin_cleanup_graph)
         )
+        self._run_cache.clear()
         try:
             self.execute_query(self._gremlin_cleanup_graph)
         except ValueError:
@@ -90,6 +109,15 @@ class GremlinHelpers:
         )
 
     def create_workflow_node(self, workflow_object, workflow_partition_id=None):
+        save_workflow_node_query, workflow_vertex_id = self._create_workflow_node_query(
+            workflow_object, workflow_partition_id
+        )
+        self.execute_query(save_workflow_node_query)
+
+        return workflow_vertex_id
+
+    def _create_workflow_node_query(self, workflow_object, workflow_partition_id=None):
+        """ Returns the query that saves a workflow node and the node's id."""
         if workflow_partition_id is None:
             workflow_partition_id = self._workflow_partition_id
         else:
@@ -118,18 +146,19 @@ class GremlinHelpers:
         ]
 
         s = sQuery(save_workflow_node_query, save_workflow_node_parameters)
+        s += raw_content_checksum_property(workflow_object, raw_content)
 
         self._rootLogger.debug(s)
-        self.execute_query(s)
-
-        return workflow_vertex_id
+        return s, workflow_vertex_id
 
     def get_workflow_node(self, workflow_node_id):
         return self.get_node(workflow_node_id)
 
     def get_node(self, node_id):
-        query = "g.V('%s')"
-        return self.execute_query(sQuery(query, [node_id]))
+        return self.execute_query(self._get_node_query(node_id))
+
+    def _get_node_query(self, node_id):
+        return sQuery("g.V('%s')", [node_id])
 
     def insert_workflow_step(
         self,
@@ -145,6 +174,47 @@ class GremlinHelpers:
         previous_step=None,
         next_step=None,
     ):
+        insert_query = self._insert_workflow_step_query(
+            step_name,
+            input_schema_version,
+            input_schema_type,
+            execution_schema_version,
+            execution_schema_type,
+            output_schema_version,
+            output_schema_type,
+            workflow_version,
+            workflow_node_id,
+        )
+        self.execute_query(insert_query)
+
+    def _insert_workflow_step_query(self, *args, **kwargs):
+        insert_query = "g." + self._workflow_step_traversal(*args, **kwargs)
+        self._rootLogger.debug(f"Insert_query: {insert_query}")
+        return insert_query
+
+    def insert_workflow_steps(self, steps: list, batch_size: int = None):
+        """ Inserts many workflow steps, batch_size to a request. Each step is a dict of
+        the arguments to insert_workflow_step."""
+        self.execute_batch(
+            [self._workflow_step_traversal(**step) for step in steps], batch_size
+        )
+
+    def _workflow_step_traversal(
+        self,
+        step_name,
+        input_schema_version,
+        input_schema_type,
+        execution_schema_version,
+        execution_schema_type,
+        output_schema_version,
+        output_schema_type,
+        workflow_version,
+        workflow_node_id,
+        previous_step=None,
+        next_step=None,
+    ):
+        """ A traversal that adds a step's vertex along with its 'part_of' and 'contains'
+        edges to the workflow node."""
         step_type = "root"
         step_vertex_id = build_vertex_id(
             step_name, step_type, workflow_version, self._workflow_partition_id
@@ -161,10 +231,12 @@ class GremlinHelpers:
             output_schema_type,
             workflow_node_id,
             str(self._workflow_partition_id),
+            workflow_node_id,
+            workflow_node_id,
         ]
 
-        insert_query = sQuery(
-            """g.addV('id','%s').property('type', 'workflow_step')
+        return sQuery(
+            """addV('id','%s').property('type', 'workflow_step')
             .property('step_name', '%s')
             .property('step_type', '%s')
             .property('input_schema_version', '%s')
@@ -174,21 +246,32 @@ class GremlinHelpers:
             .property('output_schema_version', '%s')
             .property('output_schema_type', '%s')
             .property('workflow_node_id', '%s')
-            .property('workflow_partition_id', '%s')""",
+            .property('workflow_partition_id', '%s')
+            .as('step').addE('part_of').to(g.V().has('id', '%s'))
+            .select('step').addE('contains').from(g.V().has('id', '%s'))""",
             params,
         )
 
-        self.execute_query(insert_query)
+    def attach_step_info(
+        self,
+        mlobject: MLObject,
+        workflow_version,
+        workflow_node_id,
+        step_name: str,
+        step_type: str,
+    ):
+        run_info_id, add_run_info_query, edge_queries = self._attach_step_info_queries(
+            mlobject, workflow_version, workflow_node_id, step_name, step_type
+        )
 
-        part_of_query = f"g.V('{step_vertex_id}').addE('part_of').to(g.V().has('id', '{workflow_node_id}'))"
-        self._rootLogger.debug(f"Part_of_query: {part_of_query}")
-        self.execute_query(part_of_query)
+        self._forget_run(workflow_node_id, step_name, run_info_id)
+        self.execute_query(add_run_info_query)
+        for edge_query in edge_queries:
+            self.execute_query(edge_query)
 
-        contains_query = f"g.V('{step_vertex_id}').addE('contains').from(g.V().has('id', '{workflow_node_id}'))"
-        self._rootLogger.debug(f"Contains_query: {contains_query}")
-        self.execute_query(contains_query)
+        return run_info_id
 
-    def attach_step_info(
+    def _attach_step_info_queries(
         self,
         mlobject: MLObject,
         workflow_version,
@@ -196,6 +279,8 @@ class GremlinHelpers:
         step_name: str,
         step_type: str,
     ):
+        """ Returns the run info vertex id, the query that adds the vertex and the
+        queries that connect it to its step (which need the vertex to exist)."""
         if step_type not in ["input", "execution", "output", "log"]:
             raise ValueError(
                 f"Error when saving '{mlobject.get_schema_name()}', the step_type must be from ['input', 'execution', 'output', 'log']."
@@ -208,97 +293,170 @@ class GremlinHelpers:
             workflow_version,
             self._workflow_partition_id,
         )
-        mlobject_dict = mlobject.dict_without_internal_variables()
-        property_string = convert_to_property_strings(mlobject_dict)
+        property_string = convert_to_property_strings(
+            mlobject.view_without_internal_variables()
+        )
         raw_content = encode_raw_object_for_db(mlobject)
-        add_run_info_query = f"""g.addV('id', '{run_info_id}'){property_string}.property('raw_content', '{raw_content}').property('workflow_node_id', '{workflow_node_id}').property('workflow_partition_id', '{self._workflow_partition_id}')"""
+        add_run_info_query = f"""g.addV('id', '{run_info_id}'){property_string}.property('raw_content', '{raw_content}'){raw_content_checksum_property(mlobject, raw_content)}.property('workflow_node_id', '{workflow_node_id}').property('workflow_partition_id', '{self._workflow_partition_id}')"""
 
-        self.execute_query(add_run_info_query)
-
-        self.execute_query(
+        edge_queries = [
             sQuery(
                 "g.V('id', '%s').out().hasId('%s').addE('results').to(g.V('%s')).executionProfile()",
                 [workflow_node_id, step_name, run_info_id],
-            )
-        )
-        self.execute_query(
+            ),
             sQuery(
                 "g.V('id', '%s').out().hasId('%s').addE('root').from(g.V('%s')).executionProfile()",
                 [workflow_node_id, step_name, run_info_id],
-            )
-        )
+            ),
+        ]
 
-        return run_info_id
+        return run_info_id, add_run_info_query, edge_queries
+
+    def connect_workflow_steps(
+        self, workflow_node_id, edges_to_submit, batch_size: int = None
+    ):
+        """ Adds the 'previous' and 'next' edges between steps, batch_size to a request.
+        edges_to_submit maps each step name to (previous_step, next_step)."""
+        self.execute_batch(
+            self._connect_workflow_steps_traversals(workflow_node_id, edges_to_submit),
+            batch_size,
+        )
 
-    def connect_workflow_steps(self, workflow_node_id, edges_to_submit):
+    def _connect_workflow_steps_traversals(self, workflow_node_id, edges_to_submit):
+        traversals = []
         for edge in edges_to_submit:
-            self.connect_next_previous_vertices(
-                workflow_node_id,
-                edge,
-                edges_to_submit[edge][0],
-                edges_to_submit[edge][1],
+            traversals.extend(
+                self._step_edge_traversals(
+                    workflow_node_id,
+                    edge,
+                    edges_to_submit[edge][0],
+                    edges_to_submit[edge][1],
+                )
             )
+        return traversals
 
     def connect_next_previous_vertices(
         self, workflow_node_id, step_name, previous_step, next_step
     ):
+        for traversal in self._step_edge_traversals(
+            workflow_node_id, step_name, previous_step, next_step
+        ):
+            self.execute_query("g." + traversal)
+
+    def _step_edge_traversals(
+        self, workflow_node_id, step_name, previous_step, next_step
+    ) -> list:
+        traversals = []
         if previous_step is not None:
-            previous_query = sQuery(
-                "g.V('id','%s').out().has('step_name','%s').addE('previous').from(g.V('id','%s').out().has('step_name','%s'))",
-                [workflow_node_id, step_name, workflow_node_id, previous_step],
+            traversals.append(
+                sQuery(
+                    "V('id','%s').out().has('step_name','%s').addE('previous').from(g.V('id','%s').out().has('step_name','%s'))",
+                    [workflow_node_id, step_name, workflow_node_id, previous_step],
+                )
             )
-            self.execute_query(previous_query)
 
         if next_step is not None:
-            next_query = sQuery(
-                "g.V('id','%s').out().has('step_name','%s').addE('next').to(g.V('id','%s').out().has('step_name','%s'))",
-                [workflow_node_id, step_name, workflow_node_id, next_step],
+            traversals.append(
+                sQuery(
+                    "V('id','%s').out().has('step_name','%s').addE('next').to(g.V('id','%s').out().has('step_name','%s'))",
+                    [workflow_node_id, step_name, workflow_node_id, next_step],
+                )
+            )
+        return traversals
+
+    def execute_batch(self, traversals: list, batch_size: int = None) -> list:
+        """ Executes traversals written without the leading 'g.' (e.g. "addV('id','x')"),
+        batch_size at a time (GREMLIN_BATCH_SIZE by default). Each batch is one request,
+        with each traversal as a branch of a union, so one not matching anything
+        doesn't stop the others. Returns the results of all batches, and raises the
+        ValueError execute_query would if any traversal matched nothing."""
+        collected_result = []
+        for batch in self._batches(traversals, batch_size):
+            collected_result.extend(
+                self._batch_results(batch, self.execute_query(self._batch_query(batch)))
             )
+        return collected_result
 
-            self.execute_query(next_query)
+    @staticmethod
+    def _batches(traversals: list, batch_size: int = None) -> list:
+        if batch_size is None:
+            batch_size = GREMLIN_BATCH_SIZE
+        return [
+            traversals[start : start + batch_size]
+            for start in range(0, len(traversals), batch_size)
+        ]
+
+    @staticmethod
+    def _batch_query(batch: list) -> str:
+        # Each branch is folded, so the union answers with exactly one list for every
+        # traversal - empty if it matched nothing
+        branches = ", ".join(f"__.{traversal}.fold()" for traversal in batch)
+        return f"g.inject(0).union({branches})"
+
+    def _batch_results(self, batch: list, results: list) -> list:
+        """ Flattens the folded results of a batch, checking there is one for each
+        traversal and that none of them is empty."""
+        if len(results) != len(batch):
+            raise ValueError(
+                f"Batch of {len(batch)} traversals returned {len(results)} results."
+            )
+        for traversal, traversal_results in zip(batch, results):
+            if len(traversal_results) == 0:
+                self._rootLogger.debug(f"Matched nothing in batch: {traversal}")
+                self._check_results(traversal_results)
+        return [result for traversal_results in results for result in traversal_results]
 
     def execute_query(self, query):
         self._rootLogger.debug(f"Inside the execute query: {query}")
 
         # TODO: Need to implement much better sanitization.
         self._rootLogger.debug(f"Query: {query}")
-        callback = self._gremlin_client.submitAsync(query)
+        gremlin_client = self._gremlin_client()
+        callback = gremlin_client.submitAsync(query)
         collected_result = []
         try:
-            if callback.result() is not None:
-                while True:
-                    result_set = callback.result()
-                    for result in result_set:
-                        collected_result.extend(result)
-
-                    if callback.done():
-                        break
-
-                    loop_sleep()
+            result_set = callback.result()
+            if result_set is not None:
+                for result in result_set:
+                    collected_result.extend(result)
 
                 self._rootLogger.debug("\tExecuted:\n\t{0}\n".format(collected_result))
         except tornado.iostream.StreamClosedError as sce:
-            self._rootLogger.debug(
-                "Something went wrong with this query: {0}".format(query)
-            )
-            self._rootLogger.debug(f"Full error here: {str(sce)}")
+            self._query_failed(gremlin_client, query, sce)
+
+        return self._check_results(collected_result)
 
+    def _query_failed(self, gremlin_client, query, error):
+        self._client_pool.discard(gremlin_client)
+        self._rootLogger.debug(
+            "Something went wrong with this query: {0}".format(query)
+        )
+        self._rootLogger.debug(f"Full error here: {str(error)}")
+
+    @staticmethod
+    def _check_results(collected_result):
         if len(collected_result) == 0:
             raise ValueError("Query returned zero results.")
 
         return collected_result
 
     def get_all_runs(self, workflow_node_id, step_name, descending_order=True) -> list:
+        results = self.execute_query(
+            self._get_all_runs_query(workflow_node_id, step_name, descending_order)
+        )
+        return self._runs_by_id(results)
+
+    @staticmethod
+    def _get_all_runs_query(workflow_node_id, step_name, descending_order=True):
         order = "decr"
         if not descending_order:
             order = "incr"
 
         query = "g.V('id','%s').out().has('id', '%s').out('results').order().by('run_date', %s)"
+        return sQuery(query, [workflow_node_id, step_name, order])
 
-        results = self.execute_query(
-            sQuery(query, [workflow_node_id, step_name, order])
-        )
-
+    @staticmethod
+    def _runs_by_id(results) -> OrderedDict:
         result_dict = OrderedDict()
         for result in results:
             result_dict[result["id"]] = result
@@ -306,13 +464,59 @@ class GremlinHelpers:
         return result_dict
 
     def get_run_info(self, workflow_node_id, step_name, run_info_id) -> dict:
-        all_results = self.get_all_runs(
-            workflow_node_id=workflow_node_id, step_name=step_name
+        """ Returns the vertex for a run of step_name in the workflow, read-only (see
+        vertex_cache.freeze), or None if there isn't one."""
+        decoded_run = self.get_decoded_run_info(workflow_node_id, step_name, run_info_id)
+        return None if decoded_run is None else decoded_run.vertex
+
+    def get_decoded_run_info(
+        self, workflow_node_id, step_name, run_info_id
+    ) -> DecodedVertex:
+        """ Returns the DecodedVertex for a run of step_name in the workflow, or None if
+        there isn't one. The run is looked up by its id and checked to be a result of
+        that step, and is served from the run cache when it was loaded recently."""
+        cache_key = self._run_cache_key(workflow_node_id, step_name, run_info_id)
+        decoded_run = self._run_cache.get(cache_key)
+        if decoded_run is None:
+            try:
+                results = self.execute_query(
+                    self._get_run_info_query(workflow_node_id, step_name, run_info_id)
+                )
+            except ValueError:
+                return None
+            decoded_run = self._cache_run_info(cache_key, results)
+        return decoded_run
+
+    def _forget_run(self, workflow_node_id, step_name, run_info_id):
+        if self._run_cache is not None:
+            self._run_cache.invalidate(
+                self._run_cache_key(workflow_node_id, step_name, run_info_id)
+            )
+
+    def _run_cache_key(self, workflow_node_id, step_name, run_info_id):
+        return (
+            self._url,
+            self._database_name,
+            self._container_name,
+            workflow_node_id,
+            step_name,
+            run_info_id,
         )
-        if len(all_results) > 0:
-            return all_results[run_info_id]
-        else:
-            return None
+
+    @staticmethod
+    def _get_run_info_query(workflow_node_id, step_name, run_info_id):
+        # The same runs get_all_runs finds, starting from the run rather than the workflow
+        query = "g.V('%s').where(__.in('results').has('id', '%s').in().has('id', '%s'))"
+        return sQuery(query, [run_info_id, step_name, workflow_node_id])
+
+    def _cache_run_info(self, cache_key, results) -> DecodedVertex:
+        decoded_run = DecodedVertex(results[0])
+        self._run_cache.put(cache_key, decoded_run)
+        return decoded_run
+
+    def run_cache_stats(self) -> dict:
+        """ Hits, misses and hit_ratio (among others) of the run cache."""
+        return self._run_cache.stats()
 
     def __build_schema_name(self, workflow_step_object):
         return return_schema_name(
@@ -323,8 +527,175 @@ class GremlinHelpers:
         self.cleanup_graph()
 
 
-async def loop_sleep():
-    await asyncio.sleep(0.2)
+class AsyncGremlinHelpers(GremlinHelpers):
+    """ GremlinHelpers whose queries are awaited on the running event loop rather than
+    blocking it. At most concurrency_limit queries (GREMLIN_CONCURRENCY_LIMIT by
+    default) are in flight at once; the rest wait their turn. An instance should only
+    be used from one event loop."""
+
+    _semaphore = None
+
+    def __init__(self, *args, concurrency_limit: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._semaphore = build_semaphore(concurrency_limit)
+
+    async def cleanup_graph(self):
+        self._rootLogger.debug(
+            "\tRunning this Gremlin query:\n\t{0}".format(self._gremlin_cleanup_graph)
+        )
+        self._run_cache.clear()
+        try:
+            await self.execute_query(self._gremlin_cleanup_graph)
+        except ValueError:
+            pass
+
+    async def create_workflow_node(self, workflow_object, workflow_partition_id=None):
+        save_workflow_node_query, workflow_vertex_id = self._create_workflow_node_query(
+            workflow_object, workflow_partition_id
+        )
+        await self.execute_query(save_workflow_node_query)
+
+        return workflow_vertex_id
+
+    async def get_node(self, node_id):
+        return await self.execute_query(self._get_node_query(node_id))
+
+    async def insert_workflow_step(self, *args, **kwargs):
+        await self.execute_query(self._insert_workflow_step_query(*args, **kwargs))
+
+    async def insert_workflow_steps(self, steps: list, batch_size: int = None):
+        await self.execute_batch(
+            [self._workflow_step_traversal(**step) for step in steps], batch_size
+        )
+
+    async def attach_step_info(
+        self,
+        mlobject: MLObject,
+        workflow_version,
+        workflow_node_id,
+        step_name: str,
+        step_type: str,
+    ):
+        run_info_id, add_run_info_query, edge_queries = self._attach_step_info_queries(
+            mlobject, workflow_version, workflow_node_id, step_name, step_type
+        )
+
+        self._forget_run(workflow_node_id, step_name, run_info_id)
+        await self.execute_query(add_run_info_query)
+        await asyncio.gather(
+            *[self.execute_query(edge_query) for edge_query in edge_queries]
+        )
+
+        return run_info_id
+
+    async def connect_workflow_steps(
+        self, workflow_node_id, edges_to_submit, batch_size: int = None
+    ):
+        await self.execute_batch(
+            self._connect_workflow_steps_traversals(workflow_node_id, edges_to_submit),
+            batch_size,
+        )
+
+    async def connect_next_previous_vertices(
+        self, workflow_node_id, step_name, previous_step, next_step
+    ):
+        await asyncio.gather(
+            *[
+                self.execute_query("g." + traversal)
+                for traversal in self._step_edge_traversals(
+                    workflow_node_id, step_name, previous_step, next_step
+                )
+            ]
+        )
+
+    async def execute_batch(self, traversals: list, batch_size: int = None) -> list:
+        """ Like GremlinHelpers.execute_batch, but sends the batches concurrently."""
+        batches = self._batches(traversals, batch_size)
+        batch_results = await asyncio.gather(
+            *[self.execute_query(self._batch_query(batch)) for batch in batches]
+        )
+        return [
+            result
+            for batch, results in zip(batches, batch_results)
+            for result in self._batch_results(batch, results)
+        ]
+
+    async def execute_query(self, query):
+        self._rootLogger.debug(f"Query: {query}")
+
+        # Connecting a client, and submitAsync waiting for a free connection, block
+        # the calling thread, so both are done off the event loop
+        loop = asyncio.get_running_loop()
+        collected_result = []
+        async with self._semaphore:
+            gremlin_client = await loop.run_in_executor(None, self._gremlin_client)
+            try:
+                result_set = await asyncio.wrap_future(
+                    await loop.run_in_executor(None, gremlin_client.submitAsync, query)
+                )
+                if result_set is not None:
+                    collected_result = await asyncio.wrap_future(result_set.all())
+
+                    self._rootLogger.debug(
+                        "\tExecuted:\n\t{0}\n".format(collected_result)
+                    )
+            except tornado.iostream.StreamClosedError as sce:
+                self._query_failed(gremlin_client, query, sce)
+
+        return self._check_results(collected_result)
+
+    async def get_all_runs(
+        self, workflow_node_id, step_name, descending_order=True
+    ) -> list:
+        results = await self.execute_query(
+            self._get_all_runs_query(workflow_node_id, step_name, descending_order)
+        )
+        return self._runs_by_id(results)
+
+    async def get_run_info(self, workflow_node_id, step_name, run_info_id) -> dict:
+        decoded_run = await self.get_decoded_run_info(
+            workflow_node_id, step_name, run_info_id
+        )
+        return None if decoded_run is None else decoded_run.vertex
+
+    async def get_decoded_run_info(
+        self, workflow_node_id, step_name, run_info_id
+    ) -> DecodedVertex:
+        cache_key = self._run_cache_key(workflow_node_id, step_name, run_info_id)
+        decoded_run = self._run_cache.get(cache_key)
+        if decoded_run is None:
+            try:
+                results = await self.execute_query(
+                    self._get_run_info_query(workflow_node_id, step_name, run_info_id)
+                )
+            except ValueError:
+                return None
+            decoded_run = self._cache_run_info(cache_key, results)
+        return decoded_run
+
+    async def empty_graph(self):
+        await self.cleanup_graph()
+
+
+@functools.lru_cache(maxsize=16)
+def _unpack_credentials(credentials_packed: str):
+    return convert_yaml_to_dict(base64.urlsafe_b64decode(credentials_packed))
+
+
+def unpack_credentials(credentials_packed: str) -> dict:
+    """ Decodes the base64 yaml credentials, once per process for each credentials_packed."""
+    credential_dict = _unpack_credentials(credentials_packed)
+    return None if credential_dict is None else dict(credential_dict)
+
+
+def build_semaphore(concurrency_limit: int = None) -> asyncio.Semaphore:
+    if concurrency_limit is None:
+        concurrency_limit = GREMLIN_CONCURRENCY_LIMIT
+    if concurrency_limit < 1:
+        raise ValueError(
+            f"The concurrency limit must be at least 1, not {concurrency_limit}."
+        )
+    return asyncio.Semaphore(concurrency_limit)
 
 
 def convert_to_property_strings(this_dict: dict, prefix=None):
@@ -343,6 +714,17 @@ def convert_to_property_strings(this_dict: dict, prefix=None):
     return return_string
 
 
+def raw_content_checksum_property(mlobject, raw_content: str):
+    """ Returns the raw_content_checksum property for an object that validates, or an
+    empty string if it doesn't. Metastore loads raw_content whose checksum matches
+    without validating it again. validate() only checks what has changed since the
+    object last validated, so an object the caller has already validated isn't
+    validated again here."""
+    if len(mlobject.validate()) > 0:
+        return ""
+    return f".property('raw_content_checksum', '{checksum_raw_object(raw_content)}')"
+
+
 def sQuery(query, parameters: list = []):
     num_of_params = query.count("%s")
     if len(parameters) != num_of_params:
@@ -0,0 +1,261 @@
+"""A process-wide pool of gremlin_python clients, so that every GremlinHelpers (and
+so every Metastore) for the same endpoint, database and container shares one set of
+websocket connections instead of opening and authenticating its own."""
+
+import atexit
+import logging
+import threading
+import time
+
+from gremlin_python.driver import client, serializer
+
+# Websocket connections each pooled client keeps open
+GREMLIN_POOL_SIZE = 8
+
+# Seconds a client can go unused before it is closed
+GREMLIN_IDLE_TIMEOUT = 300.0
+
+# Seconds a client can go unused before it is checked with a query on its next use
+GREMLIN_HEALTH_CHECK_INTERVAL = 30.0
+
+GREMLIN_HEALTH_CHECK_QUERY = "g.inject(0)"
+
+
+def build_gremlin_client(url, key, database_name, container_name, pool_size):
+    return client.Client(
+        f"{url}",
+        "g",
+        username=f"/dbs/{database_name}/colls/{container_name}",
+        password=f"{key}",
+        message_serializer=serializer.GraphSONSerializersV2d0(),
+        pool_size=pool_size,
+    )
+
+
+class PooledGremlinClient:
+    """A client in the pool and when it was last handed out."""
+
+    def __init__(self, gremlin_client, now: float):
+        self.client = gremlin_client
+        self.last_used = now
+
+
+class GremlinClientSlot:
+    """Where the client for one key lives. Its lock is held while that client is
+    connected or checked, so only callers wanting the same client wait on it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pooled_client = None
+
+
+class GremlinClientPool:
+    """Gremlin clients keyed by (url, key, database_name, container_name). A client is
+    only connected the first time it is asked for, is checked with a cheap query
+    before being handed out if it has been unused for health_check_interval seconds,
+    and is closed once it has been unused for idle_timeout seconds (by a background
+    thread, which runs while the pool has clients). Connecting and checking happen
+    outside the pool's lock, so a slow server only holds up callers that want its
+    client. Safe to share across threads."""
+
+    _shared_pool = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        pool_size: int = None,
+        idle_timeout: float = None,
+        health_check_interval: float = None,
+        client_factory=None,
+    ):
+        self._pool_size = GREMLIN_POOL_SIZE if pool_size is None else pool_size
+        self._idle_timeout = (
+            GREMLIN_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        )
+        self._health_check_interval = (
+            GREMLIN_HEALTH_CHECK_INTERVAL
+            if health_check_interval is None
+            else health_check_interval
+        )
+        self._client_factory = client_factory or build_gremlin_client
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reaper = None
+        self._reaper_wakeup = threading.Event()
+        self._rootLogger = logging.getLogger()
+
+    @staticmethod
+    def shared():
+        """Returns the pool used by every GremlinHelpers not given one of its own. Its
+        clients are closed when the process exits."""
+        with GremlinClientPool._shared_lock:
+            if GremlinClientPool._shared_pool is None:
+                GremlinClientPool._shared_pool = GremlinClientPool()
+                atexit.register(GremlinClientPool._shared_pool.close)
+            return GremlinClientPool._shared_pool
+
+    @staticmethod
+    def configure_shared(**kwargs):
+        """Replaces the shared pool with one built from kwargs (see __init__), closing
+        the clients of the one it replaces."""
+        shared_pool = GremlinClientPool(**kwargs)
+        with GremlinClientPool._shared_lock:
+            previous_pool = GremlinClientPool._shared_pool
+            GremlinClientPool._shared_pool = shared_pool
+        atexit.register(shared_pool.close)
+        if previous_pool is not None:
+            atexit.unregister(previous_pool.close)
+            previous_pool.close()
+        return shared_pool
+
+    def client_for(self, url, key, database_name, container_name):
+        """Returns a connected client for the container, connecting one if there isn't
+        a healthy client for it already."""
+        pool_key = (url, key, database_name, container_name)
+        with self._lock:
+            self._raise_if_closed()
+            slot = self._slots.setdefault(pool_key, GremlinClientSlot())
+
+        with slot.lock:
+            now = time.monotonic()
+            pooled_client = slot.pooled_client
+            if pooled_client is not None and not self._is_healthy(pooled_client, now):
+                slot.pooled_client = None
+                self._close(pooled_client)
+                pooled_client = None
+
+            if pooled_client is None:
+                self._rootLogger.debug(f"Connecting to gremlin wss endpoint: {url}")
+                pooled_client = PooledGremlinClient(
+                    self._client_factory(
+                        url, key, database_name, container_name, self._pool_size
+                    ),
+                    now,
+                )
+
+            unused_client = None
+            with self._lock:
+                # While connecting, the pool may have been closed, or this slot evicted
+                # and another caller connected a client for the key in a new one
+                published_slot = self._slots.get(pool_key)
+                if self._closed:
+                    unused_client = pooled_client
+                elif (
+                    published_slot is not None
+                    and published_slot is not slot
+                    and published_slot.pooled_client is not None
+                ):
+                    unused_client, pooled_client = (
+                        pooled_client,
+                        published_slot.pooled_client,
+                    )
+                else:
+                    self._slots[pool_key] = slot
+                    slot.pooled_client = pooled_client
+                    self._start_reaper()
+                pooled_client.last_used = time.monotonic()
+
+        if unused_client is not None:
+            self._close(unused_client)
+        self._raise_if_closed()
+        return pooled_client.client
+
+    def discard(self, gremlin_client):
+        """Closes and removes a client that failed, so the next caller connects again."""
+        discarded_clients = []
+        with self._lock:
+            for pool_key, slot in list(self._slots.items()):
+                pooled_client = slot.pooled_client
+                if pooled_client is not None and pooled_client.client is gremlin_client:
+                    slot.pooled_client = None
+                    del self._slots[pool_key]
+                    discarded_clients.append(pooled_client)
+
+        for pooled_client in discarded_clients:
+            self._close(pooled_client)
+
+    def evict_idle(self):
+        """Closes the clients unused for idle_timeout seconds. Clients being connected
+        or checked are left for the next time."""
+        idle_clients = []
+        with self._lock:
+            now = time.monotonic()
+            for pool_key, slot in list(self._slots.items()):
+                if not slot.lock.acquire(blocking=False):
+                    continue
+                try:
+                    pooled_client = slot.pooled_client
+                    if pooled_client is None:
+                        del self._slots[pool_key]
+                    elif now - pooled_client.last_used >= self._idle_timeout:
+                        slot.pooled_client = None
+                        del self._slots[pool_key]
+                        idle_clients.append(pooled_client)
+                finally:
+                    slot.lock.release()
+
+        for pooled_client in idle_clients:
+            self._close(pooled_client)
+
+    def close(self):
+        """Closes every client. The pool can't be used afterwards."""
+        with self._lock:
+            self._closed = True
+            slots = list(self._slots.values())
+            self._slots.clear()
+            self._reaper_wakeup.set()
+
+        for slot in slots:
+            pooled_client, slot.pooled_client = slot.pooled_client, None
+            if pooled_client is not None:
+                self._close(pooled_client)
+
+    def __len__(self):
+        with self._lock:
+            return sum(slot.pooled_client is not None for slot in self._slots.values())
+
+    def _raise_if_closed(self):
+        if self._closed:
+            raise RuntimeError("This GremlinClientPool has been closed.")
+
+    def _start_reaper(self):
+        # Called with self._lock held
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(
+                target=self._reap, name="gremlin-pool-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap(self):
+        """Evicts idle clients until the pool is closed or has none left."""
+        interval = max(self._idle_timeout / 2, 0.01)
+        while not self._reaper_wakeup.wait(interval):
+            self.evict_idle()
+            with self._lock:
+                if not self._slots:
+                    self._reaper = None
+                    return
+
+    def _is_healthy(self, pooled_client: PooledGremlinClient, now: float) -> bool:
+        if pooled_client.client.is_closed():
+            return False
+        if now - pooled_client.last_used < self._health_check_interval:
+            return True
+
+        try:
+            result_set = pooled_client.client.submitAsync(
+                GREMLIN_HEALTH_CHECK_QUERY
+            ).result()
+            result_set.all().result()
+        except Exception as error:  # pylint: disable=broad-except
+            self._rootLogger.debug(f"Gremlin health check failed: {str(error)}")
+            return False
+
+        return True
+
+    def _close(self, pooled_client: PooledGremlinClient):
+        try:
+            pooled_client.client.close()
+        except Exception as error:  # pylint: disable=broad-except
+            self._rootLogger.debug(f"Error closing gremlin client: {str(error)}")
@@ -1,9 +1,8 @@
 
 from mlspeclib.mlobject import MLObject
-from mlspeclib.helpers import (
-    decode_raw_object_from_db,
-)
-from mlspeclib.experimental.gremlin_helpers import GremlinHelpers
+from mlspeclib.experimental.gremlin_helpers import AsyncGremlinHelpers, GremlinHelpers
+from mlspeclib.experimental.gremlin_pool import GremlinClientPool
+from mlspeclib.experimental.vertex_cache import DecodedVertex, VertexCache
 
 
 
@@ -12,8 +11,13 @@ from mlspeclib.experimental.gremlin_helpers import GremlinHelpers
 class Metastore:
     _gc = None
 
-    def __init__(self, credentials_packed):
-        self._gc = GremlinHelpers(credentials_packed=credentials_packed)
+    def __init__(self, credentials_packed, client_pool: GremlinClientPool = None, run_cache: VertexCache = None):
+        """ Connects lazily, through client_pool (GremlinClientPool.shared() by default),
+        so Metastores for the same container share their connections. Runs are loaded
+        through run_cache (VertexCache.shared() by default)."""
+        self._gc = GremlinHelpers(
+            credentials_packed=credentials_packed, client_pool=client_pool, run_cache=run_cache
+        )
 
     def attach_step_info(self, mlobject: MLObject, workflow_version, workflow_node_id, step_name, content_type):
         """ Saves an MLObject to the metastore connection. Uses the run_id from the object,
@@ -34,11 +38,21 @@ class Metastore:
     def load(self, workflow_version, step_name, run_info_id):
         return self._gc.get_run_info(workflow_version, step_name, run_info_id)
 
-    def get_workflow_object(self, workflow_node_id):
-        return self.get_object(workflow_node_id)
+    def run_cache_stats(self) -> dict:
+        """ Hits, misses and hit_ratio of the cache load and get_step_object read through."""
+        return self._gc.run_cache_stats()
+
+    def get_workflow_object(self, workflow_node_id, validate=False):
+        return self.get_object(workflow_node_id, validate)
+
+    def get_object(self, node_id, validate=False):
+        """ Returns a tuple of the MLObject stored on a node and a dict of errors, like
+        MLObject.create_object_from_string. Objects whose raw_content checksum matches
+        the one written when they were saved are loaded without validating them again,
+        unless validate is True."""
+        return self._object_from_node(self._gc.get_node(node_id), validate)
 
-    def get_object(self, node_id):
-        full_results = self._gc.get_node(node_id)
+    def _object_from_node(self, full_results, validate=False):
         if len(full_results) == 0:
             return None
         elif len(full_results) > 1:
@@ -49,30 +63,30 @@ class Metastore:
         else:
             raw_item = full_results[0]
 
-        if (
-            "properties" not in raw_item
-            or "raw_content" not in raw_item["properties"]
-            or len(raw_item["properties"]["raw_content"]) == 0
-            or "value" not in raw_item["properties"]["raw_content"][0]
-        ):
-            return None
+        return self._object_from_raw_item(raw_item, validate)
 
-        obf_string = raw_item["properties"]["raw_content"][0]["value"]
-        return MLObject.create_object_from_string(decode_raw_object_from_db(obf_string))
+    def get_step_object(self, workflow_version, step_name, run_info_id, validate=False):
+        """ Returns a tuple of the MLObject for a step run and a dict of errors, loaded
+        the same way as get_object. The run's raw_content is decoded once and kept in the
+        run cache along with the run."""
+        decoded_run = self._gc.get_decoded_run_info(workflow_version, step_name, run_info_id)
+        return self._object_from_decoded_vertex(decoded_run, validate)
 
-    def get_step_object(self, workflow_version, step_name, run_info_id):
-        raw_item = self.load(workflow_version, step_name, run_info_id)
+    @staticmethod
+    def _object_from_raw_item(raw_item, validate=False):
+        if raw_item is None:
+            return None
+        return Metastore._object_from_decoded_vertex(DecodedVertex(raw_item), validate)
 
-        if (
-            "properties" not in raw_item
-            or "raw_content" not in raw_item["properties"]
-            or len(raw_item["properties"]["raw_content"]) == 0
-            or "value" not in raw_item["properties"]["raw_content"][0]
-        ):
+    @staticmethod
+    def _object_from_decoded_vertex(decoded_vertex: DecodedVertex, validate=False):
+        if decoded_vertex is None or decoded_vertex.raw_object is None:
             return None
 
-        obf_string = raw_item["properties"]["raw_content"][0]["value"]
-        return MLObject.create_object_from_string(decode_raw_object_from_db(obf_string))
+        if not validate and decoded_vertex.trusted:
+            return (MLObject.create_trusted_object(decoded_vertex.raw_object), {})
+
+        return MLObject.create_object_from_string(decoded_vertex.raw_object)
 
     def empty_graph(self):
         return self._gc.empty_graph()
@@ -83,7 +97,19 @@ class Metastore:
         Returns unique workflow node id."""
         return self._gc.create_workflow_node(workflow_object, workflow_partition_id)
 
-    def create_workflow_steps(self, workflow_node_id, workflow_object: MLObject):
+    def create_workflow_steps(self, workflow_node_id, workflow_object: MLObject, batch_size: int = None):
+        """ Creates a vertex for each step of the workflow, connected to the workflow node and
+        to the steps before and after it. Steps are written batch_size to a request (see
+        GremlinHelpers.execute_batch)."""
+        steps_to_submit, edges_to_submit = self._steps_and_edges(workflow_node_id, workflow_object)
+        self._gc.insert_workflow_steps(steps_to_submit, batch_size)
+        self._gc.connect_workflow_steps(workflow_node_id, edges_to_submit, batch_size)
+
+    @staticmethod
+    def _steps_and_edges(workflow_node_id, workflow_object: MLObject):
+        """ Returns the steps of a workflow as arguments to GremlinHelpers.insert_workflow_step,
+        and the edges between them as arguments to GremlinHelpers.connect_workflow_steps."""
+        steps_to_submit = []
         edges_to_submit = {}
         for step_name in workflow_object.steps:
             step_contents = workflow_object.steps[step_name]
@@ -95,35 +121,84 @@ class Metastore:
             if "next" in step_contents:
                 next_step = step_contents.next
 
-            step_name = step_name
-            input_schema_version = step_contents.input.schema_version
-            input_schema_type = step_contents.input.schema_type
-            execution_schema_version = step_contents.execution.schema_version
-            execution_schema_type = step_contents.execution.schema_type
-            output_schema_version = step_contents.output.schema_version
-            output_schema_type = step_contents.output.schema_type
-
-            previous_step = previous_step
-            next_step = next_step
-
             edges_to_submit[step_name] = (previous_step, next_step)
 
-            self._gc.insert_workflow_step(
-                workflow_version=workflow_object.workflow_version,
-                step_name=step_name,
-                input_schema_version=input_schema_version,
-                input_schema_type=input_schema_type,
-                execution_schema_version=execution_schema_version,
-                execution_schema_type=execution_schema_type,
-                output_schema_version=output_schema_version,
-                output_schema_type=output_schema_type,
-                workflow_node_id=workflow_node_id,
-                previous_step=previous_step,
-                next_step=next_step,
+            steps_to_submit.append(
+                dict(
+                    workflow_version=workflow_object.workflow_version,
+                    step_name=step_name,
+                    input_schema_version=step_contents.input.schema_version,
+                    input_schema_type=step_contents.input.schema_type,
+                    execution_schema_version=step_contents.execution.schema_version,
+                    execution_schema_type=step_contents.execution.schema_type,
+                    output_schema_version=step_contents.output.schema_version,
+                    output_schema_type=step_contents.output.schema_type,
+                    workflow_node_id=workflow_node_id,
+                    previous_step=previous_step,
+                    next_step=next_step,
+                )
             )
 
-        self._gc.connect_workflow_steps(workflow_node_id, edges_to_submit)
+        return steps_to_submit, edges_to_submit
 
     def execute_query(self, query):
         """ Executes arbitrary query. Be careful. """
         return self._gc.execute_query(query)
+
+
+class AsyncMetastore(Metastore):
+    """ A Metastore whose operations are coroutines, so that many can run concurrently
+    on one event loop. At most concurrency_limit queries are sent to the database at once
+    (see AsyncGremlinHelpers)."""
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self,
+        credentials_packed,
+        concurrency_limit: int = None,
+        client_pool: GremlinClientPool = None,
+        run_cache: VertexCache = None,
+    ):
+        self._gc = AsyncGremlinHelpers(
+            credentials_packed=credentials_packed,
+            concurrency_limit=concurrency_limit,
+            client_pool=client_pool,
+            run_cache=run_cache,
+        )
+
+    async def attach_step_info(self, mlobject: MLObject, workflow_version, workflow_node_id, step_name, content_type):
+        return await self._gc.attach_step_info(
+            mlobject, workflow_version, workflow_node_id, step_name, content_type
+        )
+
+    async def get_all_runs(self, workflow_node_id, step_name):
+        return await self._gc.get_all_runs(workflow_node_id, step_name)
+
+    async def load(self, workflow_version, step_name, run_info_id):
+        return await self._gc.get_run_info(workflow_version, step_name, run_info_id)
+
+    async def get_workflow_object(self, workflow_node_id, validate=False):
+        return await self.get_object(workflow_node_id, validate)
+
+    async def get_object(self, node_id, validate=False):
+        return self._object_from_node(await self._gc.get_node(node_id), validate)
+
+    async def get_step_object(self, workflow_version, step_name, run_info_id, validate=False):
+        decoded_run = await self._gc.get_decoded_run_info(workflow_version, step_name, run_info_id)
+        return self._object_from_decoded_vertex(decoded_run, validate)
+
+    async def empty_graph(self):
+        return await self._gc.empty_graph()
+
+    async def create_workflow_node(self, workflow_object: MLObject, workflow_partition_id=None) -> str:
+        return await self._gc.create_workflow_node(workflow_object, workflow_partition_id)
+
+    async def create_workflow_steps(self, workflow_node_id, workflow_object: MLObject, batch_size: int = None):
+        """ Like Metastore.create_workflow_steps, with the batches of steps, and then of
+        edges between them, sent concurrently."""
+        steps_to_submit, edges_to_submit = self._steps_and_edges(workflow_node_id, workflow_object)
+        await self._gc.insert_workflow_steps(steps_to_submit, batch_size)
+        await self._gc.connect_workflow_steps(workflow_node_id, edges_to_submit, batch_size)
+
+    async def execute_query(self, query):
+        """ Executes arbitrary query. Be careful. """
+        return await self._gc.execute_query(query)
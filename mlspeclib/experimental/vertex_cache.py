@@ -0,0 +1,149 @@
+"""A bounded cache of vertices fetched from the metastore, which GremlinHelpers reads
+through so that loading the same run again doesn't go back to the database or decode
+its raw_content again. Entries expire after a time to live, and the least recently used
+entry is dropped when the cache is full."""
+
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+from mlspeclib.helpers import checksum_raw_object, decode_raw_object_from_db
+
+# Vertices kept by each cache, unless given another size
+VERTEX_CACHE_SIZE = 1024
+
+# Seconds a vertex is served from the cache before it is fetched again
+VERTEX_CACHE_TTL = 300.0
+
+
+def freeze(value):
+    """Returns value with its dicts as read-only mappings and its lists as tuples, at
+    every level."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class DecodedVertex:
+    """A vertex as read from the metastore, frozen (see freeze), with its raw_content
+    decoded once. raw_object is None if the vertex has no raw_content, and trusted is
+    True if raw_content matches the checksum saved with it. Cached decoded vertices are
+    shared by every reader, so raw_object must only be read - MLObject copies it into
+    an object of its own."""
+
+    __slots__ = ("vertex", "raw_object", "trusted")
+
+    def __init__(self, vertex):
+        self.vertex = freeze(vertex)
+        self.raw_object = None
+        self.trusted = False
+
+        raw_content = DecodedVertex._raw_content(vertex)
+        if raw_content is not None:
+            self.raw_object = decode_raw_object_from_db(raw_content)
+            stored_checksum = vertex["properties"].get("raw_content_checksum") or [{}]
+            self.trusted = stored_checksum[0].get("value") == checksum_raw_object(
+                raw_content
+            )
+
+    @staticmethod
+    def _raw_content(vertex):
+        properties = vertex.get("properties") or {}
+        raw_content = properties.get("raw_content") or [{}]
+        return raw_content[0].get("value")
+
+
+class VertexCache:
+    """Vertices keyed by whatever identifies them (GremlinHelpers uses the container,
+    workflow, step and vertex id), with hit and miss counts. Every caller gets the same
+    cached value, so only immutable values (e.g. DecodedVertex) should be put in. A
+    maxsize of 0 caches nothing. Safe to share across threads."""
+
+    _shared_cache = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        self._maxsize = VERTEX_CACHE_SIZE if maxsize is None else maxsize
+        self._ttl = VERTEX_CACHE_TTL if ttl is None else ttl
+        # key -> (expires_at, vertex), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def shared():
+        """Returns the cache used by every GremlinHelpers not given one of its own."""
+        with VertexCache._shared_lock:
+            if VertexCache._shared_cache is None:
+                VertexCache._shared_cache = VertexCache()
+            return VertexCache._shared_cache
+
+    @staticmethod
+    def configure_shared(**kwargs):
+        """Replaces the shared cache with one built from kwargs (see __init__)."""
+        with VertexCache._shared_lock:
+            VertexCache._shared_cache = VertexCache(**kwargs)
+            return VertexCache._shared_cache
+
+    def get(self, key):
+        """Returns the cached vertex for key, or None if it isn't cached or has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vertex = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vertex
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, vertex):
+        if self._maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, vertex)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        with self._lock:
+            return self._hit_ratio()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self._hit_ratio(),
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _hit_ratio(self) -> float:
+        # Called with self._lock held
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
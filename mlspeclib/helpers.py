@@ -2,31 +2,138 @@
 
 import ast
 import base64
+import datetime
+import functools
+import hashlib
 import json as JSON
 import logging
+import lzma
+import re
 import sys
 import uuid
+import zlib
+from collections.abc import Mapping
 from io import StringIO
 
 import marshmallow
+import msgpack
 import yaml as YAML
+from box import Box, BoxList
 from marshmallow.fields import ValidationError
 
+try:
+    import numpy
+except ImportError:  # numpy is optional - only vectorized constraints need it
+    numpy = None
+
 ALLOWED_OPERATORS = ["<", "<=", ">", ">=", "==", "%", "<>", "!="]
 
+# constraint text -> compiled constraint, shared by every field using it
+COMPILED_CONSTRAINTS = {}
+
 
 def repr_uuid(dumper, uuid_obj):
     return YAML.ScalarNode("tag:yaml.org,2002:str", str(uuid_obj))
 
 
+def _dumper_with_representers(dumper):
+    """Returns a subclass of dumper with our representers, leaving dumper itself (and
+    so every other yaml.safe_dump in the process) alone."""
+    dumper = type(f"MLSpec{dumper.__name__}", (dumper,), {})
+    dumper.add_representer(uuid.UUID, repr_uuid)
+    # Boxes and read-only mappings (e.g. MLObjectView) are dumped as the plain dicts
+    # and lists they hold, so objects can be dumped without converting them first.
+    dumper.add_multi_representer(Mapping, YAML.SafeDumper.represent_dict)
+    dumper.add_multi_representer(Box, YAML.SafeDumper.represent_dict)
+    dumper.add_multi_representer(BoxList, YAML.SafeDumper.represent_list)
+    return dumper
+
+
+# The same representers are registered on the pure python and libyaml dumpers, so
+# both backends produce byte for byte identical yaml.
+YAML_BACKENDS = {
+    "python": (YAML.SafeLoader, _dumper_with_representers(YAML.SafeDumper))
+}
+if YAML.__with_libyaml__:
+    YAML_BACKENDS["libyaml"] = (
+        YAML.CSafeLoader,
+        _dumper_with_representers(YAML.CSafeDumper),
+    )
+
+_yaml_backend = None
+_yaml_loader = None
+_yaml_dumper = None
+
+
+def set_yaml_backend(backend: str = None) -> str:
+    """Chooses the yaml implementation used by every helper below. Defaults to the
+    libyaml C bindings when PyYAML was built with them, falling back to the pure
+    python implementation. Returns the name of the backend now in use."""
+    global _yaml_backend, _yaml_loader, _yaml_dumper
+
+    if backend is None:
+        backend = "libyaml" if "libyaml" in YAML_BACKENDS else "python"
+
+    if backend not in YAML_BACKENDS:
+        raise ValueError(
+            f"'{backend}' is not an available yaml backend. Available backends: {', '.join(YAML_BACKENDS)}"
+        )
+
+    _yaml_backend = backend
+    _yaml_loader, _yaml_dumper = YAML_BACKENDS[backend]
+    return _yaml_backend
+
+
+def get_yaml_backend() -> str:
+    return _yaml_backend
+
+
+set_yaml_backend()
+
+
+# A json number yaml also reads as a float - yaml needs a '.', and a sign on the exponent
+_YAML_JSON_FLOAT = re.compile(r"-?[0-9]+\.[0-9]*(?:[eE][-+][0-9]+)?")
+
+
+def _yaml_float(literal: str) -> float:
+    if _YAML_JSON_FLOAT.fullmatch(literal) is None:
+        # e.g. 1e5, which yaml reads as the string '1e5'
+        raise ValueError(f"yaml does not read {literal} as a float.")
+    return float(literal)
+
+
+def _yaml_constant(literal: str):
+    # NaN and Infinity are strings to yaml
+    raise ValueError(f"yaml does not read {literal} as a number.")
+
+
+def _looks_like_json(value) -> bool:
+    """JSON documents start with '{' or '[' - flow style yaml can too, so callers
+    still fall back to yaml if the json parser rejects it."""
+    stripped = value.lstrip()
+    if isinstance(stripped, bytes):
+        return stripped[:1] in (b"{", b"[")
+    return stripped[:1] in ("{", "[")
+
+
 def convert_yaml_to_dict(value):
     """Converts raw text to yaml using ruamel (put into a helper to ease
-    converting to other libraries in the future)"""
+    converting to other libraries in the future). JSON input is parsed with the
+    json module, which is much faster than any yaml parser, unless yaml would read
+    it differently (e.g. 1e5 or NaN, which yaml reads as strings)."""
 
-    if isinstance(value, dict):
+    if isinstance(value, Mapping):
         return value
-    else:
-        return YAML.safe_load(value)
+
+    if isinstance(value, (str, bytes)) and _looks_like_json(value):
+        try:
+            return JSON.loads(
+                value, parse_float=_yaml_float, parse_constant=_yaml_constant
+            )
+        except ValueError:
+            pass
+
+    return YAML.load(value, Loader=_yaml_loader)
 
 
 def convert_dict_to_yaml(value):
@@ -37,8 +144,7 @@ def convert_dict_to_yaml(value):
 
     # pylint: disable=line-too-long
     string_io_handle = StringIO()
-    YAML.SafeDumper.add_representer(uuid.UUID, repr_uuid)
-    YAML.safe_dump(value, string_io_handle)
+    YAML.dump(value, string_io_handle, Dumper=_yaml_dumper)
     return string_io_handle.getvalue()
 
 
@@ -111,6 +217,15 @@ def valid_comparison_operator(val):
 
 
 def generate_lambda(user_submitted_string):
+    """Compiles a constraint such as 'x % 8192 == 0' into a function of x. Each
+    expression is parsed, checked and compiled once, and the function is shared by
+    every field that uses it. The function's 'vectorized' attribute checks a whole
+    numpy array of values at once (see _vectorize_constraint)."""
+    try:
+        return COMPILED_CONSTRAINTS[user_submitted_string]
+    except (KeyError, TypeError):
+        pass
+
     # make a list of safe functions
     safe_list = ["math", "lambda"]
 
@@ -158,9 +273,242 @@ def generate_lambda(user_submitted_string):
             str(safe_dict),
         )
     else:
+        return_lambda.vectorized = _vectorize_constraint(node, return_lambda)
+        COMPILED_CONSTRAINTS[user_submitted_string] = return_lambda
         return return_lambda
 
 
+VECTOR_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+VECTOR_COMPARISONS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+def _vectorize_constraint(node, constraint):
+    """Returns a function that takes a 1-d array of values and returns a bool array
+    of which pass the constraint - those for which constraint(value) is not False, as
+    marshmallow decides. Expressions of x, numbers, arithmetic, comparisons and
+    and/or/not are evaluated as a single numpy expression over int and float arrays.
+    Int arrays are evaluated as int64, and only when every step of the expression is
+    exact for the array's range of values (see _exact_range) - Python's ints don't
+    overflow. Anything else, or a division by zero, falls back to calling the
+    constraint on each value."""
+    vector_code = None
+    vector_body = _vector_node(node.body)
+    if vector_body is not None:
+        vector_code = compile(
+            ast.fix_missing_locations(ast.Expression(body=vector_body)),
+            "<constraint>",
+            "eval",
+        )
+
+    def vectorized(values):
+        if numpy is None:
+            raise ImportError("numpy is required to check constraints vectorized.")
+        values = original_values = numpy.asarray(values)
+        if (
+            vector_code is not None
+            and values.dtype.kind in "iu"
+            and len(values) > 0
+            and _exact_range(vector_body, int(values.min()), int(values.max()))
+        ):
+            values = values.astype(numpy.int64)
+        elif vector_code is None or values.dtype.kind != "f":
+            values = None
+
+        if values is not None:
+            vector_functions = {
+                "__builtins__": None,
+                "_and": lambda *operands: functools.reduce(numpy.logical_and, operands),
+                "_or": lambda *operands: functools.reduce(numpy.logical_or, operands),
+                "_not": numpy.logical_not,
+            }
+            try:
+                with numpy.errstate(all="raise"):
+                    result = numpy.asarray(
+                        eval(vector_code, vector_functions, {"x": values})
+                    )
+            except (FloatingPointError, ZeroDivisionError, OverflowError):
+                pass
+            else:
+                if result.dtype != bool:
+                    # Only False fails a constraint, and a number is never False
+                    return numpy.ones(values.shape, dtype=bool)
+                return numpy.broadcast_to(result, values.shape).copy()
+
+        return numpy.fromiter(
+            (constraint(value) is not False for value in original_values.tolist()),
+            dtype=bool,
+            count=len(original_values),
+        )
+
+    return vectorized
+
+
+INT64_RANGE = (-(2**63), 2**63 - 1)
+
+# Integers up to this size convert to float64 exactly
+EXACT_FLOAT_INT = 2**53
+
+
+def _exact_range(node, low: int, high: int):
+    """Follows a vectorized constraint (from _vector_node) over int64 values of x from
+    low to high, tracking the range of every integer it computes. Returns what the
+    expression evaluates to - ('int', low, high), ('float',) or ('bool',) - or None if
+    numpy's result could differ from Python's: an integer outside int64, or one too
+    big to convert to float exactly where it meets a float."""
+
+    def checked(low, high):
+        if low < INT64_RANGE[0] or high > INT64_RANGE[1]:
+            return None
+        return ("int", low, high)
+
+    def as_float(result):
+        # Converting (or comparing) an int to a float is exact below 2**53
+        if result[0] == "int" and max(-result[1], result[2]) > EXACT_FLOAT_INT:
+            return None
+        return ("float",)
+
+    if isinstance(node, ast.Name):
+        return checked(low, high)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, float):
+            return ("float",)
+        return checked(int(node.value), int(node.value))
+
+    if isinstance(node, ast.Call):
+        if any(_exact_range(argument, low, high) is None for argument in node.args):
+            return None
+        return ("bool",)
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _exact_range(node.operand, low, high)
+        if operand is None or operand[0] != "int":
+            return operand
+        if isinstance(node.op, ast.USub):
+            return checked(-operand[2], -operand[1])
+        return operand
+
+    operands = [
+        _exact_range(operand, low, high)
+        for operand in (
+            [node.left, node.right]
+            if isinstance(node, ast.BinOp)
+            else [node.left] + node.comparators
+        )
+    ]
+    if any(operand is None for operand in operands):
+        return None
+    # numpy does arithmetic on bools (the results of comparisons) as 0 and 1
+    operands = [
+        ("int", 0, 1) if operand[0] == "bool" else operand for operand in operands
+    ]
+
+    if isinstance(node, ast.Compare):
+        if any(operand[0] == "float" for operand in operands):
+            if any(as_float(operand) is None for operand in operands):
+                return None
+        return ("bool",)
+
+    left, right = operands
+    if left[0] == "float" or right[0] == "float" or isinstance(node.op, ast.Div):
+        if as_float(left) is None or as_float(right) is None:
+            return None
+        return ("float",)
+
+    (_, left_low, left_high), (_, right_low, right_high) = left, right
+    if isinstance(node.op, ast.Add):
+        return checked(left_low + right_low, left_high + right_high)
+    if isinstance(node.op, ast.Sub):
+        return checked(left_low - right_high, left_high - right_low)
+    if isinstance(node.op, ast.Mult):
+        corners = [
+            left_bound * right_bound
+            for left_bound in (left_low, left_high)
+            for right_bound in (right_low, right_high)
+        ]
+        return checked(min(corners), max(corners))
+    if isinstance(node.op, ast.FloorDiv):
+        # Never bigger than the dividend, except for dividing by -1 (and by 0, which
+        # raises)
+        largest = max(-left_low, left_high)
+        return checked(-largest, largest)
+    # Mod - smaller than the divisor
+    largest = max(-right_low, right_high)
+    return checked(-largest, largest)
+
+
+def _vector_node(node):
+    """Rewrites a constraint's expression to run over an array x, or returns None if
+    it uses anything whose numpy result could differ from Python's."""
+    if isinstance(node, ast.Name):
+        return node if node.id == "x" else None
+
+    if isinstance(node, ast.Constant):
+        return node if type(node.value) in (int, float, bool) else None
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _vector_node(node.operand)
+        if operand is None:
+            return None
+        if isinstance(node.op, ast.Not):
+            return _vector_call("_not", [operand])
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(op=node.op, operand=operand)
+        return None
+
+    if isinstance(node, ast.BinOp):
+        left = _vector_node(node.left)
+        right = _vector_node(node.right)
+        if (
+            left is None
+            or right is None
+            or not isinstance(node.op, VECTOR_BINARY_OPERATORS)
+        ):
+            return None
+        return ast.BinOp(left=left, op=node.op, right=right)
+
+    if isinstance(node, ast.Compare):
+        operands = [_vector_node(operand) for operand in [node.left] + node.comparators]
+        if any(operand is None for operand in operands) or not all(
+            isinstance(op, VECTOR_COMPARISONS) for op in node.ops
+        ):
+            return None
+        # 'a < x < b' is 'a < x and x < b'
+        comparisons = [
+            ast.Compare(left=left, ops=[op], comparators=[right])
+            for left, op, right in zip(operands, node.ops, operands[1:])
+        ]
+        if len(comparisons) == 1:
+            return comparisons[0]
+        return _vector_call("_and", comparisons)
+
+    if isinstance(node, ast.BoolOp):
+        # 'and'/'or' return one of their operands, which are only elementwise the
+        # same as logical_and/logical_or when every operand is a bool
+        if not all(_is_boolean_node(value) for value in node.values):
+            return None
+        values = [_vector_node(value) for value in node.values]
+        if any(value is None for value in values):
+            return None
+        return _vector_call("_and" if isinstance(node.op, ast.And) else "_or", values)
+
+    return None
+
+
+def _is_boolean_node(node):
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, bool)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, ast.Not)
+    return isinstance(node, (ast.Compare, ast.BoolOp))
+
+
+def _vector_call(function_name, arguments):
+    return ast.Call(
+        func=ast.Name(id=function_name, ctx=ast.Load()), args=arguments, keywords=[]
+    )
+
+
 # Functions below here are just helper functions for building names.
 def build_schema_name_for_schema(
     mlspec_schema_version: str, mlspec_schema_type: str, schema_prefix: str = None
@@ -252,6 +600,17 @@ def schema_in_registry(schema_name):
     return True
 
 
+def schema_type_in_registry(schema_type) -> bool:
+    """True if schema_type's schema_name is in the registry or, for a nested schema class
+    shared between schemas, any of the names it was registered under still holds it."""
+    registry = marshmallow.class_registry._registry
+    for schema_name in getattr(schema_type, "schema_aliases", ()):
+        if schema_type in dict.get(registry, schema_name, ()):
+            return True
+    schema_name = getattr(schema_type, "schema_name", None)
+    return schema_name is not None and schema_in_registry(schema_name)
+
+
 def get_schema_from_registry(schema_name):
     rootLogger = logging.getLogger()
     handler = logging.StreamHandler(sys.stdout)
@@ -269,32 +628,161 @@ def get_schema_from_registry(schema_name):
     exit(1)
 
 
-def encode_raw_object_for_db(mlobject):
-    # Converts object -> dict -> yaml -> base64
-    dict_conversion = mlobject.dict_without_internal_variables()
-    yaml_conversion = convert_dict_to_yaml(dict_conversion)
-    encode_to_utf8_bytes = yaml_conversion.encode("utf-8")
-    base64_encode = base64.urlsafe_b64encode(encode_to_utf8_bytes)
-    final_encode_to_utf8 = str(base64_encode, "utf-8")
-    return final_encode_to_utf8
+# raw_content is urlsafe base64 of either yaml (everything written before the codec
+# header) or the header - magic, format version and compression - then the msgpack
+# encoded object. Control characters can't start a yaml document, so the two never mix.
+RAW_CONTENT_MAGIC = b"MLSP"
+RAW_CONTENT_VERSION = 1
+RAW_CONTENT_CODECS = ["msgpack", "yaml"]
+RAW_CONTENT_CODEC = "msgpack"
+RAW_CONTENT_COMPRESSIONS = {"none": 0, "zlib": 1, "lzma": 2}
+RAW_CONTENT_COMPRESSION = "zlib"
+
+# Encoded objects smaller than this (in bytes) are not worth compressing
+RAW_CONTENT_COMPRESSION_THRESHOLD = 256
+
+# msgpack extension types for values yaml also keeps the type of
+_MSGPACK_UUID = 1
+_MSGPACK_DATETIME = 2
+_MSGPACK_DATE = 3
+
+
+def encode_raw_object_for_db(mlobject, codec: str = None, compression: str = None):
+    """Encodes an object for storing as raw_content. codec is 'msgpack' (the default,
+    RAW_CONTENT_CODEC) or 'yaml', which is readable by versions of this library
+    from before the codec header. msgpack payloads of RAW_CONTENT_COMPRESSION_THRESHOLD
+    bytes or more are compressed with compression - 'zlib' (the default,
+    RAW_CONTENT_COMPRESSION), 'lzma' or 'none'. Objects msgpack can't hold (e.g.
+    integers over 64 bits) are written as yaml."""
+    codec = RAW_CONTENT_CODEC if codec is None else codec
+    compression = RAW_CONTENT_COMPRESSION if compression is None else compression
+    if codec not in RAW_CONTENT_CODECS:
+        raise ValueError(
+            f"'{codec}' is not a raw_content codec. Available codecs: {', '.join(RAW_CONTENT_CODECS)}"
+        )
+    if compression not in RAW_CONTENT_COMPRESSIONS:
+        raise ValueError(
+            f"'{compression}' is not a raw_content compression. Available compressions: {', '.join(RAW_CONTENT_COMPRESSIONS)}"
+        )
+
+    view = mlobject.view_without_internal_variables()
+    if codec == "msgpack":
+        try:
+            payload = msgpack.packb(view, default=_msgpack_default)
+        except (TypeError, ValueError, OverflowError):
+            payload = None
+        if payload is not None:
+            return _base64_string(_raw_content_header(payload, compression))
+
+    # Converts object -> yaml -> base64
+    yaml_conversion = convert_dict_to_yaml(view)
+    return _base64_string(yaml_conversion.encode("utf-8"))
+
+
+def decode_raw_object_from_db(s: str) -> dict:
+    """Decodes raw_content written by encode_raw_object_for_db, in any of its formats,
+    back to a dict."""
+    raw_bytes = base64.urlsafe_b64decode(s)
+    version, compression_id = _read_raw_content_header(raw_bytes)
+    if RAW_CONTENT_VERSION < version < 0x20 and version not in b"\t\n\r":
+        # Versions are control bytes, which yaml can't hold (other than tab, line
+        # feed and carriage return), so this can't be a legacy yaml document
+        raise ValueError(
+            f"raw_content format version {version} is newer than this library reads ({RAW_CONTENT_VERSION})."
+        )
+    if not (
+        1 <= version <= RAW_CONTENT_VERSION
+        and compression_id in RAW_CONTENT_COMPRESSIONS.values()
+    ):
+        # Not a codec header (even if it starts with the magic) - converts base64 -> yaml
+        return convert_yaml_to_dict(raw_bytes)
+
+    payload = raw_bytes[len(RAW_CONTENT_MAGIC) + 2 :]
+    if compression_id == RAW_CONTENT_COMPRESSIONS["zlib"]:
+        payload = zlib.decompress(payload)
+    elif compression_id == RAW_CONTENT_COMPRESSIONS["lzma"]:
+        payload = lzma.decompress(payload)
+
+    return msgpack.unpackb(payload, ext_hook=_msgpack_ext_hook, strict_map_key=False)
+
+
+def _raw_content_header(payload: bytes, compression: str) -> bytes:
+    if len(payload) < RAW_CONTENT_COMPRESSION_THRESHOLD:
+        compression = "none"
+    if compression == "zlib":
+        compressed = zlib.compress(payload)
+    elif compression == "lzma":
+        compressed = lzma.compress(payload)
+    else:
+        compressed = payload
+
+    # Keep whichever is smaller - compressing small or random payloads can grow them
+    if len(compressed) >= len(payload):
+        compression, compressed = "none", payload
+
+    header = bytes([RAW_CONTENT_VERSION, RAW_CONTENT_COMPRESSIONS[compression]])
+    return RAW_CONTENT_MAGIC + header + compressed
+
 
+def _read_raw_content_header(raw_bytes: bytes) -> tuple:
+    """Returns the (version, compression id) of the codec header raw_bytes starts
+    with, or (0, None) if it doesn't start with the magic and two header bytes."""
+    header = raw_bytes[len(RAW_CONTENT_MAGIC) : len(RAW_CONTENT_MAGIC) + 2]
+    if not raw_bytes.startswith(RAW_CONTENT_MAGIC) or len(header) < 2:
+        return 0, None
+    return header[0], header[1]
 
-def decode_raw_object_from_db(s: str):
-    # Converts base64 -> yaml
-    base64_decode = base64.urlsafe_b64decode(s)
-    return base64_decode
+
+def _base64_string(raw_bytes: bytes) -> str:
+    return str(base64.urlsafe_b64encode(raw_bytes), "utf-8")
+
+
+def _msgpack_default(value):
+    if isinstance(value, uuid.UUID):
+        return msgpack.ExtType(_MSGPACK_UUID, value.bytes)
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(_MSGPACK_DATETIME, value.isoformat().encode("utf-8"))
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(_MSGPACK_DATE, value.isoformat().encode("utf-8"))
+    # msgpack packs dicts and lists (including Boxes) itself - other mappings (e.g.
+    # MLObjectView) come here
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} can't be packed")
+
+
+def _msgpack_ext_hook(code: int, data: bytes):
+    if code == _MSGPACK_UUID:
+        return uuid.UUID(bytes=data)
+    if code == _MSGPACK_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode("utf-8"))
+    if code == _MSGPACK_DATE:
+        return datetime.date.fromisoformat(data.decode("utf-8"))
+    return msgpack.ExtType(code, data)
+
+
+def checksum_raw_object(raw_content: str):
+    # Checksum stored alongside raw_content for objects that were valid when saved
+    return hashlib.sha256(raw_content.encode("utf-8")).hexdigest()
 
 
 def to_yaml(this_dict: dict):
-    return YAML.safe_dump(this_dict)
+    return YAML.dump(this_dict, Dumper=_yaml_dumper)
 
 
 def to_json(this_dict: dict):
     out_string_io = StringIO()
-    JSON.dump(this_dict, out_string_io)
+    JSON.dump(this_dict, out_string_io, default=_json_mapping)
     return out_string_io.getvalue()
 
 
+def _json_mapping(value):
+    # json only writes dicts as objects - other mappings (e.g. MLObjectView) come here
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 # def convert_marshmallow_field_to_primitive(marshmallow_field: Field):
 #     field_name = type(marshmallow_field).__name__
 #     try:
@@ -1,4 +1,5 @@
 """ Functions for loading and saving files to disk. """
+from collections.abc import Mapping
 from pathlib import Path
 
 from mlspeclib.helpers import convert_dict_to_yaml
@@ -14,7 +15,7 @@ class IO:
     @staticmethod
     def write_content_to_path(filepath: str, content):
         """ Takes a string, converts to a pathlib Path and writes the file as text. """
-        if isinstance(content, dict):
+        if isinstance(content, Mapping):
             content_as_string = convert_dict_to_yaml(content)
         else:
             content_as_string = content
@@ -3,12 +3,15 @@
 import semver
 from box import Box
 import datetime
+from collections.abc import Mapping
 from pathlib import Path
+from types import SimpleNamespace
 
 import marshmallow.class_registry
 
 from mlspeclib.io import IO
 from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
 from mlspeclib.mlschemaenums import MLSchemaTypes
 from mlspeclib.helpers import (
     check_and_return_schema_type_by_string,
@@ -41,10 +44,41 @@ class Printable_Field:
         self.constraint = constraint
 
 
+class MLObjectView(Mapping):
+    """ Read-only view of an MLObject's fields, without its internal variables. Nothing
+    is copied - values are the object's own, so nested fields are MLObjects and lists
+    are BoxLists (still dicts and lists), and changes to the object show through. The
+    validator and the yaml/json helpers read it directly."""
+
+    __slots__ = ("_ml_object",)
+
+    def __init__(self, ml_object):
+        self._ml_object = ml_object
+
+    def __getitem__(self, key):
+        if isinstance(key, str) and key.startswith("_MLObject"):
+            raise KeyError(key)
+        return dict.__getitem__(self._ml_object, key)
+
+    def __iter__(self):
+        for key in dict.__iter__(self._ml_object):
+            if not (isinstance(key, str) and key.startswith("_MLObject")):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"MLObjectView({dict(self)!r})"
+
+
 class MLObject(Box):
     """ Contains all the fields loaded from an MLSpec, and validated against the MLSchema. Also
     provides load and save functions."""
 
+    # schema_name -> (schema class, schema instance, stub dict), see _stub_prototype
+    _stub_prototypes = {}
+
     def set_type(self, schema_version, schema_type, schema=None, schema_object=None):
         """ Used primarily after MLObject instantiation to set the schema_version and
         schema_type. Does verification of both fields and then loads a stub object
@@ -111,19 +145,167 @@ class MLObject(Box):
         self.__schema_name = return_schema_name(
             version_number, self.get_schema_type().name
         )
-        object_schema = marshmallow.class_registry.get_class(self.get_schema_name())
-        self.__schema = object_schema()
+        self.__schema, stub_dict = MLObject._stub_prototype(self.get_schema_name())
         self.__schema_object = None
-        these_fields = object_schema().fields
-        this_key_dict = recursive_fromkeys(these_fields)
-        self.merge_update(this_key_dict)
+        # A new schema, so the next validation checks everything
+        self._box_config["__changed_fields"] = None
+        if any(key in self for key in stub_dict):
+            # set_type on an object that already has content - merge into it
+            self.merge_update(MLObject._clone_stub(stub_dict))
+        else:
+            MLObject._fill_from_stub(self, stub_dict)
+
+    @staticmethod
+    def _stub_prototype(schema_name: str):
+        """ Returns the schema instance and stub dict for a schema name. Both are built
+        once per schema and shared by every object of that type - the stub is never
+        handed out directly, only cloned. A schema registered again under the same name
+        (e.g. after refresh_registry) gets a new prototype."""
+        object_schema = marshmallow.class_registry.get_class(schema_name)
+        prototype = MLObject._stub_prototypes.get(schema_name)
+        if prototype is None or prototype[0] is not object_schema:
+            schema = object_schema()
+            prototype = (object_schema, schema, recursive_fromkeys(schema.fields))
+            MLObject._stub_prototypes[schema_name] = prototype
+        return prototype[1], prototype[2]
+
+    @staticmethod
+    def _clone_stub(stub_dict: dict) -> dict:
+        """ Copies a stub dict. Stubs only hold None and nested stub dicts, so this is
+        much cheaper than copy.deepcopy."""
+        return {
+            key: MLObject._clone_stub(value) if isinstance(value, dict) else value
+            for key, value in stub_dict.items()
+        }
+
+    @staticmethod
+    def _fill_from_stub(target, stub_dict: dict):
+        """ Copies a stub into an MLObject that does not have any of its keys yet, with
+        a new MLObject for each nested level. This is what merge_update would produce,
+        but writes to the underlying dict directly rather than going through Box's
+        per-key conversion."""
+        dict.update(target, stub_dict)
+        for key, value in stub_dict.items():
+            if isinstance(value, dict):
+                nested_object = MLObject._fill_from_stub(MLObject(), value)
+                nested_object._box_config["__parent"] = (target, key)
+                dict.__setitem__(target, key, nested_object)
+        return target
 
     def validate(self):
         """ Returns an array of errors after validating against the assigned
-        schema. Each error is an array with the message at the 0-th index."""
+        schema. Each error is an array with the message at the 0-th index.
+
+        After the object has validated without errors, later calls only validate the
+        fields that have changed since (and fields holding lists, which can change in
+        place), as long as the schema can be compiled - see
+        MLSchemaCompiler.change_validator_for. Otherwise the whole object is validated.
+        An object that hasn't changed since it validated (and holds no lists) isn't
+        checked again at all."""
+        changes = self._box_config.get("__changed_fields")
+        if changes == {} and not self._box_config.get("__list_fields"):
+            return {}
+
         schema = self.get_schema()
-        content_to_validate = self.dict_without_internal_variables()
-        return schema.validate(content_to_validate)
+        validate_changes = None
+        if changes is not None:
+            validate_changes = MLSchemaCompiler.change_validator_for(schema)
+
+        if validate_changes is None:
+            changes = None
+            content_to_validate = self.view_without_internal_variables()
+            errors = schema.validate(content_to_validate)
+        else:
+            for field_name in self._box_config["__list_fields"]:
+                changes[field_name] = True
+            content_to_validate = {
+                field_name: self[field_name] for field_name in changes if field_name in self
+            }
+            errors = validate_changes(content_to_validate, changes)
+
+        if len(errors) == 0:
+            self._track_changes_from(content_to_validate, changes)
+        return errors
+
+    # Functions below here track which fields have changed since the object last
+    # validated. The state lives in _box_config under keys starting with '__', which
+    # Box neither stores as items nor passes on to nested objects.
+
+    def _track_changes_from(self, validated_content: dict, changes=None):
+        """ Marks the object as valid as of validated_content - nothing has changed
+        since - and notes which of its fields hold lists."""
+        list_fields = set(self._box_config.get("__list_fields", ()))
+        if changes is None:
+            list_fields.clear()
+        else:
+            list_fields.difference_update(changes)
+        list_fields.update(
+            field_name
+            for field_name, value in validated_content.items()
+            if MLObject._holds_list(value)
+        )
+        self._box_config["__list_fields"] = list_fields
+        self._box_config["__changed_fields"] = {}
+
+    def _field_changed(self, field_name):
+        """ Records a changed field on the object at the top of this object's tree, as
+        a path of nested dicts ending in True: {'connection': {'endpoint': True}}."""
+        path = [field_name]
+        top_object = self
+        parent = top_object._box_config.get("__parent")
+        while parent is not None:
+            parent_object, key = parent
+            if dict.get(parent_object, key) is not top_object:
+                # No longer part of that tree
+                return
+            path.append(key)
+            top_object = parent_object
+            parent = top_object._box_config.get("__parent")
+
+        changes = top_object._box_config.get("__changed_fields")
+        if changes is None:
+            # Not validated yet, so everything will be
+            return
+        for key in reversed(path[1:]):
+            nested_changes = changes.get(key)
+            if nested_changes is True:
+                return
+            if nested_changes is None:
+                nested_changes = changes[key] = {}
+            changes = nested_changes
+        changes[field_name] = True
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if isinstance(key, str) and key.startswith("_MLObject"):
+            return
+        stored_value = dict.get(self, key)
+        if isinstance(stored_value, MLObject):
+            stored_value._box_config["__parent"] = (self, key)
+        self._field_changed(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._field_changed(key)
+
+    def update(self, *args, **kwargs):
+        # Box's update stores values without going through __setitem__
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        field_names = list(self.keys())
+        super().clear()
+        for field_name in field_names:
+            self._field_changed(field_name)
+
+    @staticmethod
+    def _holds_list(value) -> bool:
+        if isinstance(value, list):
+            return True
+        if isinstance(value, dict):
+            return any(MLObject._holds_list(nested) for nested in value.values())
+        return False
 
     def save(self, save_path: Path, export_json=False):
         """ Copies all internal data to an MLSchema, which it then
@@ -140,11 +322,11 @@ class MLObject(Box):
                 + ".yaml"
             )
 
-            export_dict = self.dict_without_internal_variables()
+            export_view = self.view_without_internal_variables()
             if not export_json:
-                IO.write_content_to_path(file_path, export_dict)
+                IO.write_content_to_path(file_path, export_view)
             else:
-                IO.write_content_to_path(file_path, export_dict)
+                IO.write_content_to_path(file_path, export_view)
 
             # Expecting the file system to throw an error if something went wrong above.
             # By this point, the file system has written and so recording the filename.
@@ -153,10 +335,10 @@ class MLObject(Box):
         return (file_write_success, errors)
 
     def to_yaml(self):
-        return helpers_to_yaml(self.dict_without_internal_variables())
+        return helpers_to_yaml(self.view_without_internal_variables())
 
     def to_json(self):
-        return helpers_to_json(self.dict_without_internal_variables())
+        return helpers_to_json(self.view_without_internal_variables())
 
     @staticmethod
     def code_gen(
@@ -309,6 +491,46 @@ class MLObject(Box):
         else:
             return (ml_object, {})
 
+    @staticmethod
+    def create_trusted_object(contents_as_dict: dict):
+        """ Creates an MLObject from content that was already validated before it was
+        stored (e.g. read back from the metastore with a matching checksum). Builds the
+        same object as create_object_from_string without validating it again, and
+        overlays the content on the stub before converting it rather than merging it
+        in afterwards. The object counts as validated, so its next validate only checks
+        what changes. Returns the MLObject."""
+        MLSchema.populate_registry()
+        ml_object = MLObject()
+        ml_object.__schema_version = contents_as_dict["schema_version"]
+        ml_object.__schema_type = check_and_return_schema_type_by_string(
+            contents_as_dict["schema_type"]
+        )
+        ml_object.__schema = None
+        ml_object.__schema_object = None
+        ml_object.__schema_name = return_schema_name(
+            ml_object.get_schema_version(), ml_object.get_schema_type().name
+        )
+        ml_object.__schema, stub_dict = MLObject._stub_prototype(
+            ml_object.get_schema_name()
+        )
+
+        for key, value in MLObject._overlay_stub(stub_dict, contents_as_dict).items():
+            ml_object[key] = value
+        ml_object._track_changes_from(contents_as_dict)
+        return ml_object
+
+    @staticmethod
+    def _overlay_stub(stub_dict: dict, content: dict) -> dict:
+        """ Returns the content with every field it is missing filled in from the stub,
+        at every nested level - what update_tree produces on a fresh stub."""
+        overlaid = dict(stub_dict)
+        for key, value in content.items():
+            stub_value = stub_dict.get(key)
+            if isinstance(stub_value, dict) and isinstance(value, dict):
+                value = MLObject._overlay_stub(stub_value, value)
+            overlaid[key] = value
+        return overlaid
+
     @staticmethod
     def update_tree(object_to_update, content):
         """ Updates the box tree to the content provided, and does a validation at the end. """
@@ -326,6 +548,12 @@ class MLObject(Box):
             k: v for k, v in self.to_dict().items() if not k.startswith("_MLObject")
         }
 
+    def view_without_internal_variables(self):
+        """ Returns a read-only MLObjectView of the same fields as
+        dict_without_internal_variables, without copying anything. Use it to read or
+        serialize an object; use dict_without_internal_variables for a copy."""
+        return MLObjectView(self)
+
     # Simple getter functions with a prefix so that it's unlikely to be hidden
     # by values in the schema.
 
@@ -340,13 +568,9 @@ class MLObject(Box):
         else:
             # TODO: The below grossness is because I don't feel like going around and removing all the
             # places where get_schema_type().name is used. If I did, I could remove almost everything
-            # here.
-            class Object(object):
-                pass
-
-            a = Object()
-            a.name = self.__schema_type
-            return a
+            # here. (SimpleNamespace rather than a class defined on every call, which was
+            # a large part of the cost of set_type.)
+            return SimpleNamespace(name=self.__schema_type)
 
     # pylint: disable=missing-function-docstring
     def get_schema(self):
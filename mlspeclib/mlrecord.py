@@ -0,0 +1,263 @@
+"""Compact, slots-based alternative to MLObject for holding many records in memory."""
+
+import keyword
+import typing
+
+import marshmallow.class_registry
+
+from mlspeclib.helpers import (
+    convert_yaml_to_dict,
+    return_schema_name,
+    to_json as helpers_to_json,
+    to_yaml as helpers_to_yaml,
+)
+from mlspeclib.io import IO
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
+from mlspeclib.mlschemaenums import MLSchemaTypes
+from mlspeclib.mlschemafields import MLSchemaFields
+
+
+class MLRecord:
+    """Base class for the record classes generated per schema. A record keeps each
+    field in a __slots__ attribute instead of a Box's dict, and nested fields in
+    records of their own generated class, so it takes a fraction of the memory of an
+    MLObject. It has the same attribute access (record.connection.endpoint), and
+    validate, to_yaml and to_json work as they do on MLObject. Fields whose names are
+    not valid attributes (e.g. 'agent-pool') are read and written as record['agent-pool'].
+
+    Unlike an MLObject, a record cannot be given fields that are not in its schema.
+
+        (record, errors) = MLRecord.create_object_from_string(submission_text)
+        record = MLRecord.create_stub("0.0.1", "datapath")
+        DatapathRecord = MLRecord.type_for("0.0.1", "datapath")
+    """
+
+    __slots__ = ()
+
+    # Set on each generated class
+    _schema_name = None
+    _schema_class = None
+    # (field name, slot name, nested record class or None) for every field
+    _fields = ()
+    _field_slots = {}
+
+    # schema_name -> generated class
+    _generated_types = {}
+
+    def __init__(self):
+        """Creates a stub record, with every field None and every nested field a stub
+        record, like MLObject.set_type does."""
+        for _, slot_name, nested_type in self._fields:
+            setattr(self, slot_name, None if nested_type is None else nested_type())
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Creates a record from a dict, such as a loaded submission. Nested dicts
+        become nested records; fields missing from data are stubbed."""
+        unknown_fields = data.keys() - cls._field_slots.keys()
+        if len(unknown_fields) > 0:
+            raise KeyError(
+                f"{sorted(unknown_fields, key=str)} are not fields of '{cls._schema_name}'."
+            )
+
+        record = cls.__new__(cls)
+        for field_name, slot_name, nested_type in cls._fields:
+            value = data.get(field_name)
+            if nested_type is not None:
+                if field_name not in data:
+                    value = nested_type()
+                elif isinstance(value, dict):
+                    value = nested_type.from_dict(value)
+            setattr(record, slot_name, value)
+        return record
+
+    def to_dict(self) -> dict:
+        return_dict = {}
+        for field_name, slot_name, _ in self._fields:
+            value = getattr(self, slot_name)
+            if isinstance(value, MLRecord):
+                value = value.to_dict()
+            return_dict[field_name] = value
+        return return_dict
+
+    def validate(self):
+        """Returns the same errors as MLObject.validate, using the schema's compiled
+        validator."""
+        if self._schema_name is None:
+            return MLSchemaCompiler.compile(self._schema_class)(self.to_dict())
+        return MLSchemaCompiler.validator_for(self._schema_name)(self.to_dict())
+
+    def to_yaml(self):
+        return helpers_to_yaml(self.to_dict())
+
+    def to_json(self):
+        return helpers_to_json(self.to_dict())
+
+    # pylint: disable=missing-function-docstring
+    def get_schema_name(self):
+        return self._schema_name
+
+    # pylint: disable=missing-function-docstring
+    def get_schema(self):
+        return self._schema_class()
+
+    def __getitem__(self, field_name):
+        try:
+            return getattr(self, self._field_slots[field_name])
+        except KeyError:
+            raise KeyError(field_name)
+
+    def __setitem__(self, field_name, value):
+        try:
+            slot_name = self._field_slots[field_name]
+        except KeyError:
+            raise KeyError(f"'{field_name}' is not a field of '{self._schema_name}'.")
+        setattr(self, slot_name, value)
+
+    def __contains__(self, field_name):
+        return field_name in self._field_slots
+
+    def __iter__(self):
+        return iter(self._field_slots)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, MLRecord):
+            return NotImplemented
+        return self._schema_class is other._schema_class and (
+            self.to_dict() == other.to_dict()
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Generated classes can't be pickled by reference, so rebuild from the dict
+        return (MLRecord._rebuild, (self._schema_name, self.to_dict()))
+
+    @staticmethod
+    def _rebuild(schema_name: str, data: dict):
+        MLSchema.populate_registry()
+        return MLRecord.type_for_schema(schema_name).from_dict(data)
+
+    # Functions below here generate the record classes.
+
+    @staticmethod
+    def type_for(schema_version: str, schema_type):
+        """Returns the record class for a schema version and type."""
+        MLSchema.populate_registry()
+        if isinstance(schema_type, MLSchemaTypes):
+            schema_type = schema_type.name
+        return MLRecord.type_for_schema(return_schema_name(schema_version, schema_type))
+
+    @staticmethod
+    def type_for_schema(schema_name: str):
+        """Returns the record class for a registered schema, generating it the first
+        time. A schema registered again under the same name gets a new class."""
+        schema_class = marshmallow.class_registry.get_class(schema_name)
+        record_type = MLRecord._generated_types.get(schema_name)
+        if record_type is None or record_type._schema_class is not schema_class:
+            record_type = MLRecord._generate_type(schema_name, schema_class)
+            MLRecord._generated_types[schema_name] = record_type
+        return record_type
+
+    @staticmethod
+    def _generate_type(schema_name: str, schema_class):
+        """Builds a record class with a slot for each of the schema's fields, walking
+        its fields the same way as MLObject._build_all_printable_objects."""
+        reserved_names = set(dir(MLRecord))
+        record_fields = []
+        annotations = {}
+
+        for index, (field_name, field) in enumerate(
+            schema_class._declared_fields.items()
+        ):
+            slot_name = field_name
+            if (
+                not field_name.isidentifier()
+                or keyword.iskeyword(field_name)
+                or field_name in reserved_names
+            ):
+                slot_name = f"_field_{index}"
+
+            nested_type = None
+            if hasattr(field, "nested"):
+                nested_type = MLRecord._nested_type(field)
+                annotations[slot_name] = typing.Optional[nested_type]
+            else:
+                python_type = MLSchemaFields.ALL_FIELD_TYPES.get(type(field).__name__)
+                if isinstance(python_type, type):
+                    annotations[slot_name] = typing.Optional[python_type]
+                else:
+                    annotations[slot_name] = typing.Any
+
+            record_fields.append((field_name, slot_name, nested_type))
+
+        namespace = {
+            "__slots__": tuple(slot_name for _, slot_name, _ in record_fields),
+            "__annotations__": annotations,
+            "__module__": __name__,
+            "_schema_name": schema_name,
+            "_schema_class": schema_class,
+            "_fields": tuple(record_fields),
+            "_field_slots": {
+                field_name: slot_name for field_name, slot_name, _ in record_fields
+            },
+        }
+        return type(f"MLRecord_{schema_name}", (MLRecord,), namespace)
+
+    @staticmethod
+    def _nested_type(field):
+        """Nested schemas are registered under their own names, so their record
+        classes are generated and cached like any other."""
+        nested_class = type(field.schema)
+        nested_name = getattr(nested_class, "schema_name", None)
+        if nested_name is not None:
+            try:
+                if marshmallow.class_registry.get_class(nested_name) is nested_class:
+                    return MLRecord.type_for_schema(nested_name)
+            except marshmallow.class_registry.RegistryError:
+                pass
+        return MLRecord._generate_type(None, nested_class)
+
+    # Functions below here load records.
+
+    @staticmethod
+    def create_stub(schema_version: str, schema_type):
+        """Creates a stub record with schema_version and schema_type filled in, the
+        equivalent of MLObject().set_type(schema_version, schema_type)."""
+        record = MLRecord.type_for(schema_version, schema_type)()
+        if isinstance(schema_type, MLSchemaTypes):
+            schema_type = schema_type.name
+        record["schema_version"] = schema_version
+        record["schema_type"] = schema_type.lower()
+        return record
+
+    @staticmethod
+    def create_object_from_file(file_path: str):
+        """Creates a record from a yaml file. Returns a tuple of the record (or None)
+        and a dict of errors, like MLObject.create_object_from_file."""
+        ml_content_from_disk = IO.get_content_from_path(file_path)
+        return MLRecord.create_object_from_string(ml_content_from_disk)
+
+    @staticmethod
+    def create_object_from_string(file_contents):
+        """Creates a record from a yaml/json string or a dict. Returns a tuple of the
+        record (or None) and a dict of errors, like MLObject.create_object_from_string.
+        """
+        contents_as_dict = convert_yaml_to_dict(file_contents)
+        record_type = MLRecord.type_for(
+            contents_as_dict["schema_version"], contents_as_dict["schema_type"]
+        )
+
+        errors = MLSchemaCompiler.validator_for(record_type._schema_name)(
+            contents_as_dict
+        )
+        if len(errors) > 0:
+            return (None, errors)
+        return (record_type.from_dict(contents_as_dict), {})
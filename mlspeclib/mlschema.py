@@ -1,13 +1,18 @@
 """MLSchema object which converts yaml into objects and applies validation rules."""
 
+import copy
+import hashlib
+import json
 import logging
 import os
 import re
 from pathlib import Path
+from types import MappingProxyType
 
 import marshmallow.class_registry
 from marshmallow import RAISE, Schema, fields, pre_load, validate
 from marshmallow.class_registry import RegistryError
+from yaml import YAMLError
 from yaml.scanner import ScannerError
 
 import mlspeclib
@@ -18,8 +23,11 @@ from mlspeclib.helpers import (
     convert_yaml_to_dict,
     generate_lambda,
     merge_two_dicts,
+    schema_type_in_registry,
 )
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
 from mlspeclib.mlschemafields import MLSchemaFields
+from mlspeclib.mlschemaregistry import MLSchemaRegistry
 from mlspeclib.mlschemavalidators import MLSchemaValidators
 
 from . import util
@@ -32,6 +40,48 @@ class MLSchema(Schema):
 
     schema_name = None
 
+    # Every field of a compiled schema, including inherited ones, as an immutable map.
+    # Schemas that inherit from it start from this map (see _augment_with_base_schema).
+    merged_fields = None
+
+    # Field type (the 'type:' of a field in a schema file) -> function returning a
+    # new marshmallow field of that type. Add types with register_field_type.
+    FIELD_FACTORIES = {
+        "string": fields.Str,
+        "uuid": fields.UUID,
+        "uri": lambda: fields.Str(validate=MLSchemaValidators.validate_type_URI),
+        "datetime": MLSchemaFields.DateTime,
+        "semver": lambda: fields.Str(validate=MLSchemaValidators.validate_type_semver),
+        "allowed_schema_types": fields.Str,
+        "boolean": fields.Boolean,
+        "list": lambda: fields.List(fields.Raw()),
+        "list_strings": lambda: fields.List(
+            fields.Str(validate=MLSchemaValidators.validate_type_string_cast)
+        ),
+        "list_of_tensor_shapes": lambda: fields.List(
+            fields.Tuple([fields.Str(), fields.List(fields.Int)])
+        ),
+        "list_interfaces": lambda: fields.List(
+            fields.Dict(validate=MLSchemaValidators.validate_type_interfaces)
+        ),
+        "workflow_steps": lambda: fields.Dict(
+            validate=MLSchemaValidators.validate_type_workflow_steps
+        ),
+        "tags": lambda: fields.List(fields.Tuple([fields.Str(), fields.Str()])),
+        "path": lambda: fields.Str(validate=MLSchemaValidators.validate_type_path),
+        "dict": fields.Dict,
+        "float": fields.Float,
+        "email": fields.Email,
+        "bucket": lambda: fields.Str(validate=MLSchemaValidators.validate_type_bucket),
+        "int": fields.Int,
+    }
+
+    # Field spec -> field built from it, see _field_method_from_dict
+    _field_cache = {}
+
+    # Structure hash -> class compiled for a nested schema, see _nested_schema_type
+    _nested_schema_types = {}
+
     # pylint: disable=too-few-public-methods
     class Meta:
         """Meta options for MLSchema."""
@@ -93,10 +143,11 @@ class MLSchema(Schema):
                 "type" in schema_as_dict[field]
                 and schema_as_dict[field]["type"].lower() == "nested"
             ):
-                nested_schema_type = MLSchema.create_schema_type(
+                nested_schema_type = MLSchema._nested_schema_type(
                     schema_as_dict[field]["schema"], schema_name + "_" + field.lower()
                 )
-                nested_schema_type.name = field
+                if not hasattr(nested_schema_type, "name"):
+                    nested_schema_type.name = field
                 fields_dict[field] = fields.Nested(nested_schema_type)
             else:
                 field_method = MLSchema._field_method_from_dict(
@@ -105,59 +156,102 @@ class MLSchema(Schema):
                 if field_method:
                     fields_dict[field] = field_method
 
+        # Fields with the same spec share an instance, as do inherited fields, but two
+        # fields of one schema must not - marshmallow would bind them as a single field.
+        field_ids = set()
+        for field, field_method in fields_dict.items():
+            if id(field_method) in field_ids:
+                fields_dict[field] = copy.copy(field_method)
+            field_ids.add(id(field_method))
+
         abstract_schema = MLSchema.from_dict(fields_dict)
+        abstract_schema.merged_fields = MappingProxyType(dict(fields_dict))
         if schema_name:
             marshmallow.class_registry.register(schema_name, abstract_schema)
             abstract_schema.schema_name = schema_name
         return abstract_schema
 
+    @staticmethod
+    def _nested_schema_type(nested_schema, schema_name: str):
+        """Compiles a nested schema block, or reuses the class compiled for an identical
+        block elsewhere (e.g. the metadata block repeated in every schema). A reused
+        class is registered under schema_name as well, with its own nested schemas
+        under schema_name_<field>, so name-based lookups work as if it had been
+        compiled again. The class stays usable while any of those names holds it."""
+        nested_schema = convert_yaml_to_dict(nested_schema)
+        structure_key = MLSchema._structure_key(nested_schema)
+
+        nested_schema_type = MLSchema._nested_schema_types.get(structure_key)
+        if nested_schema_type is not None and schema_type_in_registry(
+            nested_schema_type
+        ):
+            MLSchema._register_nested_aliases(schema_name, nested_schema_type)
+            return nested_schema_type
+
+        nested_schema_type = MLSchema.create_schema_type(nested_schema, schema_name)
+        nested_schema_type.schema_aliases = {schema_name}
+        if structure_key is not None:
+            MLSchema._nested_schema_types[structure_key] = nested_schema_type
+        return nested_schema_type
+
+    @staticmethod
+    def _structure_key(nested_schema: dict):
+        """sha256 of the canonical (sorted key) JSON form of a nested schema block, or
+        None if it should not be shared - it can't be serialised, or it names a base
+        schema, which depends on what is in the registry at the time."""
+        if any(str(key).startswith("mlspec_") for key in nested_schema):
+            return None
+        try:
+            canonical_form = json.dumps(nested_schema, sort_keys=True, default=repr)
+        except TypeError:
+            return None
+        return hashlib.sha256(canonical_form.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _register_nested_aliases(schema_name: str, schema_type):
+        marshmallow.class_registry.register(schema_name, schema_type)
+        schema_type.schema_aliases.add(schema_name)
+        for field_name, field in schema_type._declared_fields.items():
+            if isinstance(field, fields.Nested) and isinstance(field.nested, type):
+                MLSchema._register_nested_aliases(
+                    schema_name + "_" + field_name.lower(), field.nested
+                )
+
+    @staticmethod
+    def register_field_type(field_type: str, field_factory):
+        """Adds (or replaces) a field type that schema files can use, e.g.
+
+        MLSchema.register_field_type("port", lambda: fields.Int(validate=validate.Range(1, 65535)))
+
+        field_factory is called with no arguments and must return a new marshmallow
+        field. Register types before compiling the schemas that use them."""
+        MLSchema.FIELD_FACTORIES[field_type.lower()] = field_factory
+        MLSchema._field_cache.clear()
+        MLSchema._nested_schema_types.clear()
+
     @staticmethod
     def _field_method_from_dict(name: str, field_dict: dict):
-        """Takes the dict from a yaml schema and creates a field appropriate for Marshmallow."""
-        field_types = {
-            "string": fields.Str(),
-            "uuid": fields.UUID(),
-            "uri": fields.Str(validate=MLSchemaValidators.validate_type_URI),
-            "datetime": MLSchemaFields.DateTime(),
-            "semver": fields.Str(validate=MLSchemaValidators.validate_type_semver),
-            "allowed_schema_types": fields.Str(),
-            "boolean": fields.Boolean(),
-            "list": fields.List(fields.Raw()),
-            "list_strings": fields.List(
-                fields.Str(validate=MLSchemaValidators.validate_type_string_cast)
-            ),
-            "list_of_tensor_shapes": fields.List(
-                fields.Tuple([fields.Str(), fields.List(fields.Int)])
-            ),
-            "list_interfaces": fields.List(
-                fields.Dict(validate=MLSchemaValidators.validate_type_interfaces)
-            ),
-            "workflow_steps": fields.Dict(
-                validate=MLSchemaValidators.validate_type_workflow_steps
-            ),
-            "tags": fields.List(fields.Tuple([fields.Str(), fields.Str()])),
-            "path": fields.Str(validate=MLSchemaValidators.validate_type_path),
-            "dict": fields.Dict(),
-            "float": fields.Float(),
-            "email": fields.Email(),
-            "bucket": fields.Str(validate=MLSchemaValidators.validate_type_bucket),
-            "int": fields.Int(),
-        }
+        """Takes the dict from a yaml schema and creates a field appropriate for Marshmallow.
 
+        Fields are built once per distinct spec - type, regex, allowed, constraint,
+        required and empty - and the same instance is returned for every field with that
+        spec. Sharing is safe because schemas deep copy their declared fields when they
+        are instantiated."""
         try:
             if "meta" in field_dict:
                 # The field is a meta field about the schema, so skip adding a method
                 return None
             field_type = field_dict["type"].lower()
-            field_declaration = field_types[field_type]
+            field_factory = MLSchema.FIELD_FACTORIES[field_type]
         except KeyError:
             raise AttributeError(
                 f"MLSchema Library has no field type named '{field_type}''"
             )
 
-        # Need to put this first so that we can redeclare the field function. Tried
-        # attaching the regex without using the fields.Str(validate=) format,
-        # and it didn't seem to work.
+        cache_key = MLSchema._field_cache_key(name, field_type, field_dict)
+        if cache_key is not None and cache_key in MLSchema._field_cache:
+            return MLSchema._field_cache[cache_key]
+
         if "regex" in field_dict:
             try:
                 re.compile(field_dict["regex"])
@@ -166,38 +260,36 @@ class MLSchema(Schema):
                     f"The regex ('{field_dict['regex']}') does not appear to be a valid regex."
                 )
 
-            field_declaration = fields.Str(
-                validate=validate.Regexp(
-                    field_dict["regex"], error=f"No match for in field: {name}"
-                )
+        # TODO: There's probably a better place for this - it's validating
+        # the constraint on an int or float that it's actually in the correct form but
+        # isn't changing anything else.
+        if "constraint" in field_dict and field_type not in ["int", "float"]:
+            raise ValueError(
+                "Attempting to add a 'constraint' to a field that does not appear to be a 'float' or 'int'."
             )
 
-        if "allowed" in field_dict:
-            # TODO: This may be a bug in waiting - would prefer not to overwrite, but instead
-            # just to add. Filed a bug with marshmallow to see.
-            # TODO: Bug - cannot currently support with "list"
+        # A constraint takes precedence over allowed, and allowed over regex. Only the
+        # field that is used gets built.
+        # TODO: This may be a bug in waiting - would prefer not to overwrite, but instead
+        # just to add. Filed a bug with marshmallow to see.
+        # TODO: Bug - cannot currently support "allowed" with "list"
+        if "constraint" in field_dict:
+            number_field = fields.Int if field_type == "int" else fields.Float
+            field_declaration = number_field(
+                validate=generate_lambda(field_dict["constraint"])
+            )
+        elif "allowed" in field_dict:
             field_declaration = fields.Str(
                 validate=validate.OneOf(field_dict["allowed"])
             )
-
-        if "constraint" in field_dict:
-            # TODO: There's probably a better place for this - it's validating
-            # the constraint on an int or float that it's actually in the correct form but
-            # isn't changing anything else.
-            if field_type not in ["int", "float"]:
-                raise ValueError(
-                    "Attempting to add a 'constraint' to a field that does not appear to be a 'float' or 'int'."
-                )
-            if field_type == "int":
-                field_declaration = fields.Int(
-                    validate=generate_lambda(field_dict["constraint"])
-                )
-            elif field_type == "float":
-                field_declaration = fields.Float(
-                    validate=generate_lambda(field_dict["constraint"])
+        elif "regex" in field_dict:
+            field_declaration = fields.Str(
+                validate=validate.Regexp(
+                    field_dict["regex"], error=f"No match for in field: {name}"
                 )
-            else:
-                raise ValueError("Don't know how you got here.")
+            )
+        else:
+            field_declaration = field_factory()
 
         if "required" in field_dict and util.strtobool(
             MLSchemaValidators.validate_bool_and_return_string(field_dict["required"])
@@ -211,15 +303,40 @@ class MLSchema(Schema):
         ):
             field_declaration.allow_none = True
 
+        if cache_key is not None:
+            MLSchema._field_cache[cache_key] = field_declaration
         return field_declaration
 
     @staticmethod
-    def _augment_with_base_schema(schema_dict: dict):
-        # The below is incredibly gross code smell - ideally, there'd
-        # be a much better way to merge the base schema with the derivative ones
-        # and that allowed for multiple layers of inheritance. Oh well.
-        # TODO: Support multiple layer of inheritance
+    def _field_cache_key(name: str, field_type: str, field_dict: dict):
+        """The parts of a field spec that affect the field built from it, or None if
+        they can't be hashed. The name is only part of it for regex fields, whose error
+        message includes it."""
+        allowed = field_dict.get("allowed")
+        if isinstance(allowed, list):
+            allowed = tuple(allowed)
+
+        cache_key = (
+            field_type,
+            name if "regex" in field_dict else None,
+            field_dict.get("regex"),
+            allowed,
+            field_dict.get("constraint"),
+            field_dict.get("required"),
+            field_dict.get("empty"),
+        )
+        try:
+            hash(cache_key)
+        except TypeError:
+            return None
+        return cache_key
 
+    @staticmethod
+    def _augment_with_base_schema(schema_dict: dict):
+        """Adds the fields of the schema's base (mlspec_base_type) to schema_dict. The
+        base's merged_fields already hold everything it inherits, so chains of any
+        depth are flattened by a single merge, without instantiating the base.
+        Where both define a field, the base's definition is used."""
         base_name = None
         base_version = None
 
@@ -254,11 +371,12 @@ class MLSchema(Schema):
         schema_version = '{base_version}'"""
             )
 
-        base_dict = base_schema().fields
-
-        schema_dict = merge_two_dicts(schema_dict, base_dict)
+        base_fields = getattr(base_schema, "merged_fields", None)
+        if base_fields is None:
+            # The base was not compiled by create_schema_type
+            base_fields = base_schema._declared_fields
 
-        return schema_dict
+        return merge_two_dicts(schema_dict, base_fields)
 
     # Functions below here are used for loading objects
 
@@ -287,10 +405,14 @@ class MLSchema(Schema):
         data = convert_yaml_to_dict(data)
         schema_name = build_schema_name_for_object(self, data)
 
-        try:
-            marshmallow.class_registry.get_class(schema_name)
-        except AttributeError:
-            raise AttributeError(f"{schema_name} is not a valid schema type.")
+        # A nested class shared between schemas is valid while any of its names is
+        if not (
+            hasattr(type(self), "schema_aliases") and schema_type_in_registry(type(self))
+        ):
+            try:
+                marshmallow.class_registry.get_class(schema_name)
+            except AttributeError:
+                raise AttributeError(f"{schema_name} is not a valid schema type.")
 
         return data
 
@@ -309,50 +431,197 @@ class MLSchema(Schema):
         schema_name = build_schema_name_for_object(submission_data=data)
         return marshmallow.class_registry.get_class(schema_name)
 
+    @staticmethod
+    def validate_batch(documents, compiled: bool = True):
+        """Validates a stream of submissions, which can be dicts or yaml/json strings
+        and can mix schema types. Each document's schema is resolved from its
+        schema_version and schema_type, and each schema is validated by its
+        MLSchemaCompiler function, which returns the same errors as schema().validate()
+        much faster (schemas that can't be compiled fall back to validate). With
+        compiled=False a single schema instance is created per schema and its validate
+        is used for every document of that type.
+
+        This is a generator - it yields (index, schema_name, errors) for each document
+        in input order, where errors is {} for a valid document and otherwise the same
+        dict schema().validate() returns. Documents that cannot be parsed, or whose
+        schema cannot be found, yield errors under '_schema' (schema_name may be None).
+        """
+        MLSchema.populate_registry()
+
+        schema_validators = {}
+        for index, document in enumerate(documents):
+            schema_name = None
+            try:
+                submission_dict = convert_yaml_to_dict(document)
+                schema_name = build_schema_name_for_object(
+                    submission_data=submission_dict
+                )
+                validate_document = schema_validators.get(schema_name)
+                if validate_document is None:
+                    if compiled:
+                        validate_document = MLSchemaCompiler.validator_for(schema_name)
+                    else:
+                        validate_document = marshmallow.class_registry.get_class(
+                            schema_name
+                        )().validate
+                    schema_validators[schema_name] = validate_document
+            except (
+                YAMLError,
+                KeyError,
+                TypeError,
+                AttributeError,
+                RegistryError,
+            ) as error:
+                message = error.args[0] if len(error.args) > 0 else str(error)
+                yield (index, schema_name, {"_schema": [str(message)]})
+                continue
+
+            yield (index, schema_name, validate_document(submission_dict))
+
     # Functions below here are for filling out the registry
     @staticmethod
-    def populate_registry():
-        """Loads all the base schemas for the schema registry."""
+    def default_schema_root() -> Path:
+        """Returns the directory holding the schemas that ship with mlspeclib."""
+        return Path(os.path.dirname(mlspeclib.__file__)) / "schemas"
+
+    @staticmethod
+    def populate_registry(force_refresh: bool = False, lazy: bool = False):
+        """Loads all the base schemas for the schema registry.
+
+        The schema files are only scanned the first time this is called in a process;
+        after that it returns without touching the disk as long as the schemas are still
+        in the registry. Use force_refresh (or refresh_registry) to scan again.
+
+        With lazy=True the schemas are only indexed, and each one is compiled the
+        first time it is looked up (see index_registry)."""
 
         rootLogger = logging.getLogger()
 
-        schemas_to_process = []
-        no_base = []
-        has_base = []
-        last = []
+        load_root = MLSchema.default_schema_root()
+        if not force_refresh and MLSchemaRegistry.is_loaded(load_root):
+            return
+
+        if lazy:
+            MLSchema.index_registry(load_root)
+            return
 
-        load_root = os.path.dirname(mlspeclib.__file__)
         rootLogger.debug(f"Registry load root: {load_root}")
-        load_path = Path(load_root).glob("schemas/**/*.yaml")
-        rootLogger.debug(f"Registry load path: {load_path}")
-        load_list = list(load_path)
-        rootLogger.debug(f"Registry load list: {load_list}")
-
-        for schema_file in load_list:
-            schema_text = schema_file.read_text("utf-8")
-            schema_dict = convert_yaml_to_dict(schema_text)
-
-            if "last" in schema_dict["mlspec_schema_type"]:
-                last.append(schema_dict)
-            elif "mlspec_base_type" not in schema_dict:
-                no_base.append(schema_dict)
-            else:
-                has_base.append(schema_dict)
+        fingerprint = MLSchemaRegistry.fingerprint_tree(load_root)
+        cache_key = MLSchemaRegistry.cache_key(fingerprint)
+
+        # A warm cache holds the parsed schemas already in load order, so the
+        # yaml does not need to be read or parsed at all.
+        schemas_to_process = MLSchemaRegistry.read_cache(load_root, cache_key)
+        if schemas_to_process is None:
+            load_list = list(fingerprint.keys())
+            rootLogger.debug(f"Registry load list: {load_list}")
+
+            schemas_to_process = []
+            for schema_path, schema_dict, error in MLSchemaRegistry.parse_schema_files(
+                load_list
+            ):
+                if error is not None:
+                    raise ValueError(f"{schema_path}: {error}")
+                schemas_to_process.append(schema_dict)
+
+            schemas_to_process = [
+                schema_dict
+                for wave in MLSchemaRegistry.dependency_waves(schemas_to_process)
+                for schema_dict in wave
+            ]
+            MLSchemaRegistry.write_cache(load_root, cache_key, schemas_to_process)
+
+        registry_before = set(marshmallow.class_registry._registry.keys())
+        schema_names = MLSchema._compile_schemas(schemas_to_process)
+
+        MLSchemaRegistry.record_load(
+            load_root,
+            fingerprint,
+            schema_names,
+            marshmallow.class_registry._registry.keys() - registry_before,
+        )
 
-        schemas_to_process = no_base + has_base + last
+    @staticmethod
+    def refresh_registry() -> bool:
+        """Checks the built-in schema files against the fingerprint taken when they were
+        loaded and, if any were added, removed or edited, recompiles them. Returns True
+        if the registry was rebuilt."""
+        load_root = MLSchema.default_schema_root()
+        if MLSchemaRegistry.is_loaded(load_root) and not MLSchemaRegistry.is_stale(
+            load_root
+        ):
+            return False
 
-        for loaded_schema in schemas_to_process:
-            loaded_schema_name = build_schema_name_for_schema(
-                mlspec_schema_type=loaded_schema["mlspec_schema_type"],
-                mlspec_schema_version=loaded_schema["mlspec_schema_version"],
-            )
+        tree = MLSchemaRegistry.get_tree(load_root)
+        MLSchemaRegistry.forget(load_root, unregister=True)
+        MLSchema.populate_registry(
+            force_refresh=True, lazy=tree is not None and tree.lazy
+        )
+        return True
+
+    @staticmethod
+    def index_registry(load_path: Path) -> bool:
+        """Lazy alternative to compiling every schema under load_path. Only the
+        mlspec_* header of each file is read, to build an index of schema name ->
+        file. A schema (and its chain of base schemas) is compiled the first time it
+        is looked up through marshmallow.class_registry.get_class or
+        load_schema_from_registry. Returns False if any header could not be read."""
+        load_path = Path(load_path)
+        fingerprint = MLSchemaRegistry.fingerprint_tree(load_path)
+
+        index = {}
+        files_with_errors = []
+        for schema_path in fingerprint:
             try:
-                marshmallow.class_registry.get_class(loaded_schema_name)
-            except RegistryError:
-                MLSchema.create_schema(loaded_schema)
+                entry = MLSchemaRegistry.index_entry_for_file(schema_path)
+            except ScannerError as se:
+                files_with_errors.append(
+                    (
+                        Path(schema_path).name,
+                        f"Yaml could not be parsed. Error details: \n{str(se)}",
+                    )
+                )
+                continue
+
+            if entry is None:
+                files_with_errors.append(
+                    (
+                        Path(schema_path).name,
+                        "Does not contain mlspec_schema_version.meta and mlspec_schema_type.meta as top level fields.",
+                    )
+                )
+                continue
+
+            index.setdefault(entry.schema_name, entry)
+
+        if len(files_with_errors) > 0:
+            error_string = ""
+            for err in files_with_errors:
+                error_string += f"::CRITICAL - {err[0]}: {err[1]}\n"
+            logging.getLogger().critical(error_string)
+            return False
+
+        registry = MLSchemaRegistry.install_lazy_registry(MLSchema._compile_index_entry)
+        registry.add_index(index)
+        MLSchemaRegistry.record_load(
+            load_path, fingerprint, set(index), set(), lazy=True
+        )
+        return True
 
     @staticmethod
-    def append_schema_to_registry(load_path: Path) -> bool:
+    def _compile_index_entry(entry):
+        """Resolver for the lazy registry - compiles a single indexed schema file."""
+        schema_dict = convert_yaml_to_dict(entry.schema_path.read_text("utf-8"))
+        MLSchema.create_schema_type(schema_dict, entry.schema_name)
+
+    @staticmethod
+    def append_schema_to_registry(
+        load_path: Path, lazy: bool = False, workers: int = None
+    ) -> bool:
+        """Compiles every schema under load_path into the registry, or with lazy=True
+        only indexes them (see index_registry). Schemas are compiled in dependency
+        order, so inheritance can be any number of levels deep. Large trees are parsed
+        with a pool of 'workers' processes (default: one per cpu)."""
         if isinstance(load_path, str):
             load_path = Path(load_path)
 
@@ -366,24 +635,18 @@ class MLSchema(Schema):
                 f"No files ending in '.yaml' were found in the path '{load_path}'"
             )
 
-        all_schemas = []
-        files_with_errors = []
+        if lazy:
+            return MLSchema.index_registry(load_path)
 
-        no_base_schemas = []
-        schemas_with_base = []
-        last_schemas = []
+        files_with_errors = []
+        parsed_schemas = []
 
-        for putative_schema_file in all_found_files:
-            this_text = putative_schema_file.read_text("utf-8")
-            try:
-                this_dict = convert_yaml_to_dict(this_text)
-            except ScannerError as se:
-                files_with_errors.append(
-                    (
-                        putative_schema_file.name,
-                        f"Yaml could not be parsed. Error details: \n{str(se)}",
-                    )
-                )
+        for schema_path, this_dict, error in MLSchemaRegistry.parse_schema_files(
+            sorted(all_found_files), workers=workers
+        ):
+            putative_schema_file = Path(schema_path)
+            if error is not None:
+                files_with_errors.append((putative_schema_file.name, error))
                 continue
 
             if not contains_minimum_fields_for_schema(this_dict):
@@ -395,14 +658,7 @@ class MLSchema(Schema):
                 )
                 continue
 
-            if "last" in this_dict["mlspec_schema_type"]:
-                last_schemas.append(this_dict)
-            elif "mlspec_base_type" in this_dict:
-                schemas_with_base.append(this_dict)
-            else:
-                no_base_schemas.append(this_dict)
-
-        all_schemas = no_base_schemas + schemas_with_base + last_schemas
+            parsed_schemas.append(this_dict)
 
         if len(files_with_errors) > 0:
             rootLogger = logging.getLogger()
@@ -414,12 +670,38 @@ class MLSchema(Schema):
             rootLogger.critical(error_string)
             return False
 
-        for schema_dict in all_schemas:
+        registry_before = set(marshmallow.class_registry._registry.keys())
+        schema_names = set()
+        for wave in MLSchemaRegistry.dependency_waves(parsed_schemas):
+            schema_names |= MLSchema._compile_schemas(wave)
+
+        # Recorded so that worker processes can be warmed with the same trees
+        MLSchemaRegistry.record_load(
+            load_path,
+            MLSchemaRegistry.fingerprint_tree(load_path),
+            schema_names,
+            marshmallow.class_registry._registry.keys() - registry_before,
+        )
+        return True
+
+    @staticmethod
+    def _compile_schemas(schema_dicts: list) -> set:
+        """Compiles schema dicts in the order given, skipping any that are already in
+        the registry, and returns the names of all of them. Callers order the dicts
+        with MLSchemaRegistry.dependency_waves so bases are compiled first.
+
+        Compiling stays in this process even for large trees - the classes have to be
+        registered here, and building them holds the GIL, so only parsing is spread
+        across processes."""
+        schema_names = set()
+        for schema_dict in schema_dicts:
             schema_name = build_schema_name_for_schema(
                 mlspec_schema_type=schema_dict["mlspec_schema_type"],
                 mlspec_schema_version=schema_dict["mlspec_schema_version"],
             )
+            schema_names.add(schema_name)
             try:
                 marshmallow.class_registry.get_class(schema_name)
             except RegistryError:
-                MLSchema.create_schema(schema_dict)
+                MLSchema.create_schema_type(schema_dict)
+        return schema_names
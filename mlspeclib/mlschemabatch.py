@@ -0,0 +1,165 @@
+"""Validates large numbers of submissions across a pool of worker processes."""
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemaregistry import MLSchemaRegistry
+
+
+def _initialize_worker(loaded_trees: list):
+    """Runs once in each worker. With the 'fork' start method the registry is
+    inherited from the parent and every tree is already loaded, so this is a no-op;
+    with 'spawn' it loads the built-in schemas and every appended tree again."""
+    default_root = os.path.abspath(MLSchema.default_schema_root())
+    for root, lazy in loaded_trees:
+        if MLSchemaRegistry.is_loaded(root):
+            continue
+        if root == default_root:
+            MLSchema.populate_registry(lazy=lazy)
+            continue
+        try:
+            MLSchema.append_schema_to_registry(Path(root), lazy=lazy)
+        except FileNotFoundError as fnfe:
+            # Documents using these schemas will report them as unknown
+            logging.getLogger().critical(
+                f"Could not load schemas from '{root}' in worker: {str(fnfe)}"
+            )
+
+
+def _validate_chunk(start_index: int, documents: list, compiled: bool) -> list:
+    return [
+        (start_index + index, schema_name, errors)
+        for index, schema_name, errors in MLSchema.validate_batch(
+            documents, compiled=compiled
+        )
+    ]
+
+
+def _validate_file_chunk(start_index: int, file_paths: list, compiled: bool) -> list:
+    results = [None] * len(file_paths)
+    readable_offsets = []
+    documents = []
+    for offset, file_path in enumerate(file_paths):
+        try:
+            documents.append(Path(file_path).read_text(encoding="utf-8"))
+            readable_offsets.append(offset)
+        except (OSError, UnicodeDecodeError) as error:
+            results[offset] = (
+                start_index + offset,
+                None,
+                {"_schema": [f"Could not read file: {str(error)}"]},
+            )
+
+    for index, schema_name, errors in MLSchema.validate_batch(
+        documents, compiled=compiled
+    ):
+        offset = readable_offsets[index]
+        results[offset] = (start_index + offset, schema_name, errors)
+    return results
+
+
+class MLSchemaBatchValidator:
+    """Process pool version of MLSchema.validate_batch, for streams too large for one
+    core. Workers are warmed once with the schema registry - the built-in schemas and
+    every tree added with append_schema_to_registry - and then validate documents in
+    chunks so that the cost of sending work to a process is spread over many
+    documents. Results come back in input order. Workers validate with
+    MLSchemaCompiler functions unless compiled is False (see MLSchema.validate_batch).
+
+        with MLSchemaBatchValidator(workers=8) as validator:
+            for index, schema_name, errors in validator.validate_files(paths):
+                ...
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        chunk_size: int = 500,
+        start_method=None,
+        compiled: bool = True,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.compiled = compiled
+
+        # Chunks in flight per worker - enough to keep every worker busy while we
+        # wait on the oldest chunk, without reading the whole input into memory.
+        self.chunks_per_worker = 2
+
+        if start_method is None:
+            start_method = (
+                "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            )
+        self.start_method = start_method
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Starts the worker pool. Called automatically on first use; call it early
+        to pay for warming the workers up front."""
+        if self._executor is None:
+            MLSchema.populate_registry()
+            loaded_trees = [
+                (str(tree.root), tree.lazy)
+                for tree in MLSchemaRegistry.loaded_trees()
+                if MLSchemaRegistry.is_loaded(tree.root)
+            ]
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_initialize_worker,
+                initargs=(loaded_trees,),
+            )
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def validate(self, documents):
+        """Validates dicts or yaml/json strings. Yields (index, schema_name, errors)
+        in input order, exactly as MLSchema.validate_batch does."""
+        return self._run(_validate_chunk, documents)
+
+    def validate_files(self, file_paths):
+        """Validates yaml/json files, which are read by the workers so that only the
+        paths and results cross between processes. Yields (index, schema_name, errors)
+        in input order; unreadable files report under '_schema'."""
+        return self._run(_validate_file_chunk, (str(path) for path in file_paths))
+
+    def _run(self, chunk_function, items):
+        self.start()
+        items = iter(items)
+        in_flight = deque()
+        max_in_flight = self.workers * self.chunks_per_worker
+        start_index = 0
+
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = list(islice(items, self.chunk_size))
+                if len(chunk) == 0:
+                    break
+                in_flight.append(
+                    self._executor.submit(
+                        chunk_function, start_index, chunk, self.compiled
+                    )
+                )
+                start_index += len(chunk)
+
+            if len(in_flight) == 0:
+                return
+
+            for result in in_flight.popleft().result():
+                yield result
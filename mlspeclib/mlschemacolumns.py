@@ -0,0 +1,544 @@
+"""Validates column-oriented batches of submissions against a registered schema, and
+packs validated objects into numpy record arrays."""
+
+import re
+from datetime import datetime, timezone
+from uuid import UUID
+
+import marshmallow.class_registry
+from marshmallow import RAISE, fields, validate
+
+from mlspeclib.helpers import EXACT_FLOAT_INT
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
+from mlspeclib.mlschemafields import MLSchemaFields
+
+try:
+    import numpy
+except ImportError:  # numpy is optional - only column validation needs it
+    numpy = None
+
+# numpy dtype kinds whose values a field of each native type takes as they are
+NATIVE_KINDS = {str: "U", int: "iu", float: "iuf", bool: "b"}
+
+# Python type of a field -> numpy dtype of its column in a record array. Strings are
+# 'U<string_width>' and anything else is an object column.
+RECORD_DTYPES = {
+    int: "int64",
+    float: "float64",
+    bool: "bool",
+    UUID: "U36",
+    datetime: "datetime64[us]",
+}
+
+DEFAULT_STRING_WIDTH = 64
+
+CANONICAL_UUID = re.compile(
+    "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE
+)
+
+# Objects are packed this many at a time, a column at a time
+PACK_CHUNK_SIZE = 4096
+
+
+class MLSchemaColumns:
+    """Validates a table of submissions of one schema, given as columns - a dict of
+    field name to a numpy array or list holding that field's value for every row -
+    without building a dict or MLObject per row.
+
+        error_mask, errors = MLSchemaColumns.validate("0_0_1_train_results", columns)
+
+    error_mask is a bool array that is True for each row with errors, and errors maps
+    the index of each of those rows to exactly what schema().validate() returns for
+    the row as a dict. Fields of nested schemas are given as columns with dotted names
+    ('connection.endpoint'). A column that is left out is missing from every row, and
+    None in a list or object array is a null.
+
+    Each column is checked against the field MLSchema built for it. Numeric, bool and
+    string arrays of the field's own type are checked with numpy - nan/inf for floats,
+    constraints through their vectorized form - and anything else with the field's
+    compiled check, once per distinct value of an array and once per value of a list.
+    Only failing rows are put together as dicts, to get their errors from the
+    schema's compiled validator.
+
+    Going the other way, dtype_for gives a numpy structured dtype for a schema, and
+    pack fills a record array of it from a stream of validated objects:
+
+        records = MLSchemaColumns.pack("0_0_1_train_results", ml_objects)
+
+    Needs numpy.
+    """
+
+    # schema_name -> (schema class, compiled column validator)
+    _column_validators = {}
+
+    @staticmethod
+    def validate(schema_name: str, columns: dict):
+        """Returns (error_mask, errors) for columns of the registered schema."""
+        return MLSchemaColumns.validator_for(schema_name)(columns)
+
+    @staticmethod
+    def validator_for(schema_name: str):
+        """Returns the column validator for a registered schema, compiling it the first
+        time, like MLSchemaCompiler.validator_for."""
+        schema_type = marshmallow.class_registry.get_class(schema_name)
+        cached = MLSchemaColumns._column_validators.get(schema_name)
+        if cached is not None and cached[0] is schema_type:
+            return cached[1]
+
+        column_validator = MLSchemaColumns.compile(schema_type)
+        MLSchemaColumns._column_validators[schema_name] = (
+            schema_type,
+            column_validator,
+        )
+        return column_validator
+
+    @staticmethod
+    def clear_cache():
+        MLSchemaColumns._column_validators.clear()
+
+    @staticmethod
+    def compile(schema):
+        """Compiles a schema class or instance, without caching. The function takes a
+        dict of columns and returns (error_mask, errors)."""
+        if numpy is None:
+            raise ImportError("numpy is required to validate columns.")
+        if isinstance(schema, type):
+            schema = schema()
+
+        layout, check_columns = MLSchemaColumns._compile_columns(schema)
+        validate_row = MLSchemaCompiler.compile(schema)
+
+        def validate_columns(columns):
+            row_count = MLSchemaColumns._row_count(columns)
+            routed = MLSchemaColumns._route_columns(columns, layout)
+            error_mask = ~check_columns(routed, row_count)
+
+            errors = {}
+            for index in numpy.flatnonzero(error_mask).tolist():
+                row_errors = validate_row(MLSchemaColumns._build_row(routed, index))
+                if row_errors:
+                    errors[index] = row_errors
+                else:
+                    # Columns that can't be checked exactly fail every row; the
+                    # row's own validation has the final say
+                    error_mask[index] = False
+            return error_mask, errors
+
+        return validate_columns
+
+    @staticmethod
+    def _compile_columns(schema):
+        """Returns the schema's layout - field name to the layout of its nested schema,
+        or None for other fields - and a function of routed columns and the row count
+        that returns a bool array of the rows that are valid."""
+        layout = {}
+        if not MLSchemaCompiler.is_compilable(schema):
+            return layout, lambda routed, row_count: numpy.zeros(row_count, bool)
+
+        field_checks = []
+        for attr_name, field in schema.load_fields.items():
+            field_name = field.data_key if field.data_key is not None else attr_name
+            check_nested = None
+            if MLSchemaCompiler.is_plain_nested(field):
+                layout[field_name], check_nested = MLSchemaColumns._compile_columns(
+                    field.schema
+                )
+            else:
+                layout[field_name] = None
+            field_checks.append(
+                (
+                    field_name,
+                    field.required,
+                    MLSchemaColumns._compile_column(field_name, field),
+                    check_nested,
+                )
+            )
+
+        known_fields = frozenset(layout)
+        raise_unknown = schema.unknown == RAISE
+
+        def check_columns(routed, row_count):
+            valid = numpy.ones(row_count, bool)
+            for field_name, required, check_column, check_nested in field_checks:
+                column = routed.get(field_name)
+                if column is None:
+                    if required:
+                        valid[:] = False
+                elif isinstance(column, dict):
+                    valid &= check_nested(column, row_count)
+                else:
+                    valid &= check_column(column)
+
+            if raise_unknown and not known_fields.issuperset(routed):
+                valid[:] = False
+            return valid
+
+        return layout, check_columns
+
+    @staticmethod
+    def _compile_column(field_name: str, field):
+        """Returns a function of a column that returns a bool array of which of its
+        values are valid for the field."""
+        check = MLSchemaCompiler._compile_field(field_name, field)
+        native_type = MLSchemaCompiler.native_type(field)
+        native_kinds = NATIVE_KINDS.get(native_type, "")
+        check_special = native_type is float and field.allow_nan is False
+        vectorized_validators = [
+            getattr(validator, "vectorized", None) for validator in field.validators
+        ]
+        if None in vectorized_validators:
+            vectorized_validators = None
+        check_uuids = (
+            type(field)._deserialize is fields.UUID._deserialize
+            and len(field.validators) == 0
+        )
+
+        def check_values(values):
+            # Each distinct value is checked once. Values are keyed with their type,
+            # as 1, 1.0 and True are equal but not equally valid.
+            results = {}
+            valid = numpy.empty(len(values), bool)
+            for index, value in enumerate(values):
+                key = (type(value), value)
+                try:
+                    valid[index] = results[key]
+                except KeyError:
+                    valid[index] = results[key] = check(value, {}) is None
+                except TypeError:
+                    # Unhashable, like a dict
+                    valid[index] = check(value, {}) is None
+            return valid
+
+        def check_unique_values(column):
+            unique_values, inverse = numpy.unique(column, return_inverse=True)
+            return check_values(unique_values.tolist())[inverse.reshape(-1)]
+
+        def check_column(column):
+            if not isinstance(column, numpy.ndarray) or column.dtype == object:
+                return check_values(column)
+
+            kind = column.dtype.kind
+            if kind in native_kinds and vectorized_validators is not None:
+                valid = numpy.ones(len(column), bool)
+                values = column
+                if kind == "f" and check_special:
+                    valid &= numpy.isfinite(column)
+                if kind in "iu" and native_kinds == "iuf":
+                    # A float field passes its validators float(value)
+                    values = column.astype(float)
+                for vectorized in vectorized_validators:
+                    valid &= vectorized(values)
+
+                # The vectorized validators only find the rows to look at - the rows
+                # they fail, and integers too big to be exact as floats, are checked
+                # one by one like any other value
+                uncertain = ~valid
+                if kind in "iu":
+                    uncertain |= (column > EXACT_FLOAT_INT) | (
+                        column < -EXACT_FLOAT_INT
+                    )
+                if uncertain.any():
+                    valid[uncertain] = check_values(column[uncertain].tolist())
+                return valid
+
+            if kind == "U" and check_uuids:
+                valid = MLSchemaColumns._canonical_uuids(column)
+                if not valid.all():
+                    valid[~valid] = check_unique_values(column[~valid])
+                return valid
+
+            return check_unique_values(column)
+
+        return check_column
+
+    @staticmethod
+    def _canonical_uuids(column):
+        """Returns a bool array of which strings are UUIDs in the canonical 36
+        character form, which are always valid. Others may be valid too, in forms
+        uuid.UUID also takes, and are for the field to check."""
+        width = column.dtype.itemsize // 4
+        if width < 36:
+            return numpy.zeros(len(column), bool)
+
+        characters = numpy.ascontiguousarray(column).view(numpy.uint32)
+        characters = characters.reshape(len(column), width)
+        hyphens = numpy.zeros(36, bool)
+        hyphens[[8, 13, 18, 23]] = True
+
+        uuid_characters = characters[:, :36]
+        is_hex = (
+            ((uuid_characters >= ord("0")) & (uuid_characters <= ord("9")))
+            | ((uuid_characters >= ord("a")) & (uuid_characters <= ord("f")))
+            | ((uuid_characters >= ord("A")) & (uuid_characters <= ord("F")))
+        )
+        valid = numpy.where(hyphens, uuid_characters == ord("-"), is_hex).all(axis=1)
+        if width > 36:
+            # Shorter strings are padded with zeros
+            valid &= (characters[:, 36:] == 0).all(axis=1)
+        return valid
+
+    # Functions below here pack validated objects into record arrays.
+
+    @staticmethod
+    def dtype_for(schema_name: str, string_width: int = DEFAULT_STRING_WIDTH):
+        """Returns a numpy structured dtype for a registered schema, with a field per
+        schema field - int64, float64 and bool for numbers and booleans, U36 for
+        UUIDs, datetime64[us] for datetimes, 'U<string_width>' for strings (or as
+        wide as the longest allowed value) and object for anything else. Nested
+        fields are flattened into dotted names ('connection.endpoint')."""
+        if numpy is None:
+            raise ImportError("numpy is required to build record dtypes.")
+        schema = marshmallow.class_registry.get_class(schema_name)()
+        return numpy.dtype(
+            [
+                (column_name, column_dtype)
+                for column_name, _, column_dtype, _ in MLSchemaColumns._record_columns(
+                    schema, string_width
+                )
+            ]
+        )
+
+    @staticmethod
+    def pack(
+        schema_name: str,
+        objects,
+        count: int = None,
+        string_width: int = DEFAULT_STRING_WIDTH,
+    ):
+        """Packs a stream of validated objects of a registered schema - MLObjects,
+        MLRecords or dicts - into a numpy masked array of dtype_for(schema_name).
+        Missing and None values are masked. Values are read straight from each object
+        and written into one preallocated buffer a column and a chunk of objects at a
+        time. count is how many objects to allocate for (by default len(objects) if
+        it has one); the buffer grows if there are more.
+
+        Values that are not yet of the field's type (e.g. a datetime still in its
+        submitted string form) are deserialized by the field. A string longer than
+        its column raises ValueError rather than being truncated."""
+        if numpy is None:
+            raise ImportError("numpy is required to pack records.")
+        schema = marshmallow.class_registry.get_class(schema_name)()
+        record_columns = MLSchemaColumns._record_columns(schema, string_width)
+        record_dtype = numpy.dtype(
+            [
+                (column_name, column_dtype)
+                for column_name, _, column_dtype, _ in record_columns
+            ]
+        )
+
+        if count is None:
+            count = len(objects) if hasattr(objects, "__len__") else PACK_CHUNK_SIZE
+        records = numpy.zeros(count, record_dtype)
+        nulls = numpy.zeros(count, numpy.ma.make_mask_descr(record_dtype))
+
+        # Per column: the list of its values in the current chunk, and the offsets in
+        # the chunk of those that are null
+        packers = []
+        for column_name, path, column_dtype, field in record_columns:
+            packers.append(
+                (
+                    column_name,
+                    path[0],
+                    path[1:],
+                    MLSchemaColumns._record_converter(column_name, column_dtype, field),
+                    None if column_dtype == "O" else numpy.zeros(1, column_dtype)[0],
+                    [],
+                    [],
+                )
+            )
+
+        def write_chunk(start, size):
+            if start + size > len(records):
+                capacity = max(start + size, 2 * len(records))
+                records.resize(capacity, refcheck=False)
+                nulls.resize(capacity, refcheck=False)
+            for column_name, _, _, _, _, values, null_offsets in packers:
+                records[column_name][start : start + size] = values
+                if null_offsets:
+                    nulls[column_name][numpy.add(null_offsets, start)] = True
+                values.clear()
+                null_offsets.clear()
+
+        written = 0
+        chunk_start = 0
+        for ml_object in objects:
+            offset = written - chunk_start
+            for (
+                _,
+                key,
+                nested_keys,
+                convert,
+                fill_value,
+                values,
+                null_offsets,
+            ) in packers:
+                try:
+                    value = ml_object[key]
+                    for nested_key in nested_keys:
+                        value = value[nested_key]
+                except (KeyError, TypeError):
+                    value = None
+                if value is None:
+                    values.append(fill_value)
+                    null_offsets.append(offset)
+                else:
+                    values.append(convert(value))
+            written += 1
+
+            if written - chunk_start == PACK_CHUNK_SIZE:
+                write_chunk(chunk_start, PACK_CHUNK_SIZE)
+                chunk_start = written
+
+        write_chunk(chunk_start, written - chunk_start)
+        records.resize(written, refcheck=False)
+        nulls.resize(written, refcheck=False)
+        return numpy.ma.MaskedArray(records, mask=nulls)
+
+    @staticmethod
+    def _record_columns(schema, string_width: int, path: tuple = ()) -> list:
+        """Returns (column name, path of keys, numpy dtype, field) for every column of
+        a schema's record arrays, with nested schemas flattened."""
+        record_columns = []
+        for attr_name, field in schema.load_fields.items():
+            field_name = field.data_key if field.data_key is not None else attr_name
+            field_path = path + (field_name,)
+            if MLSchemaCompiler.is_plain_nested(field):
+                record_columns.extend(
+                    MLSchemaColumns._record_columns(
+                        field.schema, string_width, field_path
+                    )
+                )
+                continue
+
+            python_type = MLSchemaCompiler.native_type(field)
+            if python_type is None:
+                python_type = MLSchemaFields.ALL_FIELD_TYPES.get(type(field).__name__)
+            if python_type is str:
+                column_dtype = f"U{MLSchemaColumns._string_width(field, string_width)}"
+            else:
+                column_dtype = RECORD_DTYPES.get(python_type, "O")
+            record_columns.append(
+                (".".join(field_path), field_path, column_dtype, field)
+            )
+        return record_columns
+
+    @staticmethod
+    def _string_width(field, string_width: int) -> int:
+        for validator in field.validators:
+            if isinstance(validator, validate.OneOf) and all(
+                isinstance(choice, str) for choice in validator.choices
+            ):
+                return max([len(choice) for choice in validator.choices] + [1])
+        return string_width
+
+    @staticmethod
+    def _record_converter(column_name: str, column_dtype, field):
+        """Returns a function that turns a field's value into what is written to its
+        column."""
+        column_dtype = numpy.dtype(column_dtype)
+        if column_dtype.kind == "O":
+            return lambda value: value
+
+        if isinstance(field, fields.UUID):
+
+            def convert_uuid(value):
+                if isinstance(value, str) and CANONICAL_UUID.fullmatch(value):
+                    return value.lower()
+                if not isinstance(value, UUID):
+                    value = field.deserialize(value)
+                return str(value)
+
+            return convert_uuid
+
+        if column_dtype.kind == "U":
+            width = column_dtype.itemsize // 4
+
+            def convert_string(value):
+                if not isinstance(value, str):
+                    value = field.deserialize(value)
+                if len(value) > width:
+                    raise ValueError(
+                        f"'{value}' is longer than the {width} characters of column "
+                        f"'{column_name}'."
+                    )
+                return value
+
+            return convert_string
+
+        python_type = {"i": int, "f": float, "b": bool}.get(column_dtype.kind)
+        if python_type is not None:
+
+            def convert(value):
+                # Exact types: bool isn't an int here, and numpy scalars go through the
+                # field like any other value
+                if type(value) is python_type:  # noqa: E721
+                    return value
+                if python_type is float and type(value) is int:  # noqa: E721
+                    return float(value)
+                return field.deserialize(value)
+
+            return convert
+
+        def convert_datetime(value):
+            if not isinstance(value, datetime):
+                value = field.deserialize(value)
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value
+
+        return convert_datetime
+
+    @staticmethod
+    def _row_count(columns: dict) -> int:
+        row_counts = set()
+        for column_name, column in columns.items():
+            if isinstance(column, numpy.ndarray) and column.ndim != 1:
+                raise ValueError(f"Column '{column_name}' is not one dimensional.")
+            if not isinstance(column, (numpy.ndarray, list, tuple)):
+                raise ValueError(f"Column '{column_name}' is not an array or list.")
+            row_counts.add(len(column))
+        if len(row_counts) > 1:
+            raise ValueError(
+                f"Columns have different numbers of rows: {sorted(row_counts)}."
+            )
+        return row_counts.pop() if row_counts else 0
+
+    @staticmethod
+    def _route_columns(columns: dict, layout: dict) -> dict:
+        """Groups dotted columns of nested fields into dicts under the nested field's
+        name, at every level. Other columns are kept by name."""
+        routed = {}
+        nested_columns = {}
+        for column_name, column in columns.items():
+            field_name, _, nested_name = column_name.partition(".")
+            if (
+                column_name not in layout
+                and nested_name
+                and layout.get(field_name) is not None
+            ):
+                nested_columns.setdefault(field_name, {})[nested_name] = column
+            else:
+                routed[column_name] = column
+
+        for field_name, field_columns in nested_columns.items():
+            if field_name in routed:
+                raise ValueError(
+                    f"'{field_name}' is given both as a column and as nested columns."
+                )
+            routed[field_name] = MLSchemaColumns._route_columns(
+                field_columns, layout[field_name]
+            )
+        return routed
+
+    @staticmethod
+    def _build_row(routed: dict, index: int) -> dict:
+        row = {}
+        for field_name, column in routed.items():
+            if isinstance(column, dict):
+                row[field_name] = MLSchemaColumns._build_row(column, index)
+                continue
+            value = column[index]
+            if isinstance(value, numpy.generic):
+                value = value.item()
+            row[field_name] = value
+        return row
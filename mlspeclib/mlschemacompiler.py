@@ -0,0 +1,413 @@
+"""Compiles registered schemas into plain Python validation functions."""
+
+import math
+import uuid
+from datetime import datetime
+
+import marshmallow.class_registry
+from marshmallow import RAISE, ValidationError, fields, validate
+from marshmallow.utils import missing
+
+from mlspeclib.helpers import convert_yaml_to_dict, schema_type_in_registry
+
+
+class MLSchemaCompiler:
+    """Turns an MLSchema into a function that returns exactly what
+    schema().validate(data) returns, without going through marshmallow's generic
+    load machinery (pre_load processors, error stores, getter closures and an
+    And() validator built on every call).
+
+    Each field becomes a closure with its required/allow_none checks and
+    validators bound in, and a fast path for values already of the field's type -
+    str for String, int for Integer, dict for Nested and so on. Any other value is
+    handed to the field's own _deserialize, so type errors are marshmallow's own.
+    Schemas with hooks other than MLSchema's pre_load are not compiled; their
+    function is simply schema().validate.
+
+        validator = MLSchemaCompiler.validator_for("0_0_1_datapath")
+        errors = validator(submission_dict)
+    """
+
+    # schema_name -> (schema class, compiled function)
+    _compiled_validators = {}
+    # schema class -> compiled function, see change_validator_for
+    _compiled_change_validators = {}
+
+    @staticmethod
+    def validator_for(schema_name: str):
+        """Returns the compiled validator for a registered schema, compiling it the
+        first time. A schema that has been re-registered under the same name (e.g.
+        after refresh_registry) is compiled again."""
+        schema_type = marshmallow.class_registry.get_class(schema_name)
+        cached = MLSchemaCompiler._compiled_validators.get(schema_name)
+        if cached is not None and cached[0] is schema_type:
+            return cached[1]
+
+        compiled_validator = MLSchemaCompiler.compile(schema_type)
+        MLSchemaCompiler._compiled_validators[schema_name] = (
+            schema_type,
+            compiled_validator,
+        )
+        return compiled_validator
+
+    @staticmethod
+    def clear_cache():
+        MLSchemaCompiler._compiled_validators.clear()
+        MLSchemaCompiler._compiled_change_validators.clear()
+
+    @staticmethod
+    def change_validator_for(schema):
+        """Returns a function validate_changes(data, changes) that only checks the
+        fields named in changes, and returns the errors schema.validate(data) would
+        return for them, assuming every other field is still valid. changes maps a
+        field name to True, or for a nested field to the changes within it. Returns
+        None if the schema cannot be compiled (e.g. it has a validates_schema hook,
+        which needs the whole document)."""
+        schema_type = schema if isinstance(schema, type) else type(schema)
+        cache = MLSchemaCompiler._compiled_change_validators
+        if schema_type not in cache:
+            cache[schema_type] = MLSchemaCompiler._compile_changes(schema_type())
+        return cache[schema_type]
+
+    @staticmethod
+    def compile(schema):
+        """Compiles a schema class or instance, without caching. The function takes a
+        dict or a yaml/json string and returns a dict of errors ({} when valid)."""
+        if isinstance(schema, type):
+            schema = schema()
+
+        validate_fields = MLSchemaCompiler._compile_fields(schema)
+        if validate_fields is None:
+            return schema.validate
+
+        def validate_document(data):
+            submission_dict = data
+            if isinstance(data, (str, bytes)):
+                submission_dict = convert_yaml_to_dict(data)
+            if not isinstance(submission_dict, dict):
+                return schema.validate(data)
+            return validate_fields(submission_dict)
+
+        return validate_document
+
+    @staticmethod
+    def is_compilable(schema) -> bool:
+        """A schema can be compiled if its only hook is MLSchema's pre_load, which just
+        parses yaml input and checks the schema is still registered."""
+        hooks = {tag: names for tag, names in schema._hooks.items() if names}
+        if len(hooks) == 0:
+            return True
+        if hooks != {("pre_load", False): ["pre_load_data"]}:
+            return False
+
+        pre_load_data = getattr(type(schema), "pre_load_data")
+        if (
+            pre_load_data.__module__ != "mlspeclib.mlschema"
+            or pre_load_data.__qualname__ != "MLSchema.pre_load_data"
+        ):
+            return False
+
+        # pre_load fails if the schema is no longer registered, and so must we
+        if schema.schema_name is not None:
+            return schema_type_in_registry(type(schema))
+        return True
+
+    @staticmethod
+    def _compile_fields(schema):
+        """Returns a function of a dict that returns its errors, or None if the schema
+        cannot be compiled."""
+        if not MLSchemaCompiler.is_compilable(schema):
+            return None
+
+        field_checks = tuple(
+            (field_name, MLSchemaCompiler._compile_field(field_name, field))
+            for field_name, field in MLSchemaCompiler._load_fields(schema)
+        )
+
+        known_fields = frozenset(field_name for field_name, _ in field_checks)
+        raise_unknown = schema.unknown == RAISE
+        unknown_message = schema.error_messages["unknown"]
+
+        def validate_fields(data):
+            errors = {}
+            get = data.get
+            for field_name, check in field_checks:
+                messages = check(get(field_name, missing), data)
+                if messages is not None:
+                    errors[field_name] = messages
+
+            if raise_unknown and not known_fields.issuperset(data):
+                for key in data.keys() - known_fields:
+                    errors[key] = [unknown_message]
+            return errors
+
+        return validate_fields
+
+    @staticmethod
+    def _load_fields(schema):
+        """(field name in the data, field) for each field the schema loads."""
+        for attr_name, field in schema.load_fields.items():
+            yield (field.data_key if field.data_key is not None else attr_name, field)
+
+    @staticmethod
+    def _compile_changes(schema):
+        """Returns the function for change_validator_for, or None if the schema cannot
+        be compiled."""
+        if not MLSchemaCompiler.is_compilable(schema):
+            return None
+
+        field_checks = {}
+        nested_checks = {}
+        for field_name, field in MLSchemaCompiler._load_fields(schema):
+            field_checks[field_name] = MLSchemaCompiler._compile_field(
+                field_name, field
+            )
+            # Changes within a plain nested field only need the changed nested fields
+            # checked; anything else is checked whole.
+            if MLSchemaCompiler.is_plain_nested(field) and len(field.validators) == 0:
+                nested_check = MLSchemaCompiler._compile_changes(field.schema)
+                if nested_check is not None:
+                    nested_checks[field_name] = nested_check
+
+        raise_unknown = schema.unknown == RAISE
+        unknown_message = schema.error_messages["unknown"]
+
+        def validate_changes(data, changes):
+            errors = {}
+            for field_name, change in changes.items():
+                check = field_checks.get(field_name)
+                if check is None:
+                    if raise_unknown and field_name in data:
+                        errors[field_name] = [unknown_message]
+                    continue
+
+                value = data.get(field_name, missing)
+                nested_check = nested_checks.get(field_name)
+                if (
+                    change is not True
+                    and nested_check is not None
+                    and isinstance(value, dict)
+                ):
+                    messages = nested_check(value, change) or None
+                else:
+                    messages = check(value, data)
+                if messages is not None:
+                    errors[field_name] = messages
+            return errors
+
+        return validate_changes
+
+    @staticmethod
+    def is_plain_nested(field) -> bool:
+        """A single Nested field with no options that change how it loads."""
+        return (
+            isinstance(field, fields.Nested)
+            and type(field)._deserialize is fields.Nested._deserialize
+            and not field.many
+            and field.only is None
+            and not field.exclude
+            and field.unknown is None
+        )
+
+    @staticmethod
+    def _compile_field(field_name: str, field):
+        """Mirrors Field.deserialize - returns None if the value is valid, otherwise
+        the error messages marshmallow would store for the field."""
+        required = field.required
+        allow_none = field.allow_none
+        required_messages = field.make_error("required").messages
+        null_messages = field.make_error("null").messages
+        convert = MLSchemaCompiler._compile_conversion(field_name, field)
+        run_validators = MLSchemaCompiler._compile_validators(field)
+
+        def check(value, data):
+            if value is missing:
+                return list(required_messages) if required else None
+            if value is None:
+                return None if allow_none else list(null_messages)
+            try:
+                output = convert(value, data)
+            except ValidationError as error:
+                return error.messages
+            if run_validators is None:
+                return None
+            return run_validators(output)
+
+        return check
+
+    @staticmethod
+    def _compile_conversion(field_name: str, field):
+        """Returns the field's _deserialize, with a shortcut in front of it for values
+        that are already of the type it deserializes to."""
+        field_type = type(field)
+
+        def deserialize(value, data):
+            return field._deserialize(value, field_name, data)
+
+        native_type = MLSchemaCompiler.native_type(field)
+        if native_type is str:
+
+            def convert_string(value, data):
+                # Exact type: subclasses go through the field, which converts them
+                if type(value) is str:  # noqa: E721
+                    return value
+                return deserialize(value, data)
+
+            return convert_string
+
+        if native_type is int:
+
+            def convert_integer(value, data):
+                # Exact type: bool (and other subclasses) go through the field
+                if type(value) is int:  # noqa: E721
+                    return value
+                return deserialize(value, data)
+
+            return convert_integer
+
+        if native_type is float:
+            allow_special = field.allow_nan is not False
+
+            def convert_float(value, data):
+                # Exact type: subclasses (e.g. numpy.float64) go through the field,
+                # which returns a plain float
+                if type(value) is float and (  # noqa: E721
+                    allow_special or math.isfinite(value)
+                ):
+                    return value
+                return deserialize(value, data)
+
+            return convert_float
+
+        if native_type is bool:
+
+            def convert_boolean(value, data):
+                if value is True or value is False:
+                    return value
+                return deserialize(value, data)
+
+            return convert_boolean
+
+        if field_type._deserialize is fields.UUID._deserialize:
+
+            def convert_uuid(value, data):
+                if isinstance(value, uuid.UUID):
+                    return value
+                return deserialize(value, data)
+
+            return convert_uuid
+
+        if getattr(field_type, "identity_type", None) is datetime:
+
+            def convert_datetime(value, data):
+                if isinstance(value, datetime):
+                    return value
+                return deserialize(value, data)
+
+            return convert_datetime
+
+        if MLSchemaCompiler.is_plain_nested(field):
+            validate_nested = MLSchemaCompiler._compile_fields(field.schema)
+            if validate_nested is not None:
+
+                def convert_nested(value, data):
+                    if isinstance(value, dict):
+                        errors = validate_nested(value)
+                        if errors:
+                            raise ValidationError(errors)
+                        return value
+                    return deserialize(value, data)
+
+                return convert_nested
+
+        return deserialize
+
+    @staticmethod
+    def native_type(field):
+        """Returns str, int, float or bool if the field is a plain String, Integer,
+        Float or Boolean field, which takes values of that type as they are (floats
+        only if finite, unless the field allows nan), otherwise None."""
+        field_type = type(field)
+        if field_type._deserialize is fields.String._deserialize:
+            return str
+        if (
+            field_type._deserialize is fields.Number._deserialize
+            and field_type._format_num is fields.Number._format_num
+        ):
+            if field_type._validated is fields.Integer._validated:
+                return int
+            if field_type._validated is fields.Float._validated:
+                return float
+        if (
+            field_type._deserialize is fields.Boolean._deserialize
+            and field.truthy is fields.Boolean.truthy
+            and field.falsy is fields.Boolean.falsy
+        ):
+            return bool
+        return None
+
+    @staticmethod
+    def _compile_validators(field):
+        """Mirrors the And() marshmallow wraps around a field's validators: every
+        validator runs, and their messages are collected in order."""
+        if len(field.validators) == 0:
+            return None
+
+        failed_message = field.error_messages["validator_failed"]
+        checks = tuple(
+            MLSchemaCompiler._compile_validator(validator, failed_message)
+            for validator in field.validators
+        )
+
+        def run_validators(value):
+            errors = []
+            for check in checks:
+                try:
+                    check(value)
+                except ValidationError as error:
+                    if isinstance(error.messages, dict):
+                        errors.append(error.messages)
+                    else:
+                        errors.extend(error.messages)
+            return errors or None
+
+        return run_validators
+
+    @staticmethod
+    def _compile_validator(validator, failed_message: str):
+        """Returns a function that raises ValidationError if the value is invalid."""
+        if isinstance(validator, validate.Regexp):
+            match = validator.regex.match
+
+            def check_regex(value):
+                if match(value) is None:
+                    raise ValidationError(validator._format_error(value))
+
+            return check_regex
+
+        if isinstance(validator, validate.OneOf):
+            try:
+                choices = frozenset(validator.choices)
+            except TypeError:
+                return validator
+
+            def check_choices(value):
+                try:
+                    if value in choices:
+                        return
+                except TypeError:
+                    pass
+                raise ValidationError(validator._format_error(value))
+
+            return check_choices
+
+        if isinstance(validator, validate.Validator):
+            return validator
+
+        # Plain functions (constraint lambdas, MLSchemaValidators) fail by returning
+        # False or raising ValidationError
+        def check_function(value):
+            if validator(value) is False:
+                raise ValidationError(failed_message)
+
+        return check_function
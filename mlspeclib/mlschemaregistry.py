@@ -0,0 +1,549 @@
+"""Bookkeeping for schema trees loaded into marshmallow.class_registry, so that a
+tree is only scanned and compiled again when the files on disk change, plus the
+lazy registry that compiles indexed schemas the first time they are looked up."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import marshmallow.class_registry
+import yaml as YAML
+
+import mlspeclib
+from mlspeclib._version import __version__
+from mlspeclib.helpers import (
+    build_schema_name_for_schema,
+    convert_yaml_to_dict,
+    return_schema_name,
+)
+
+
+def _parse_schema_file(schema_path: str):
+    """Reads and parses a single schema file. Module level so that it can be sent to
+    a process pool; errors are returned rather than raised so one bad file does not
+    lose the results for the rest of the tree. Returns (path, schema_dict, error)."""
+    try:
+        schema_text = Path(schema_path).read_text("utf-8")
+        return (schema_path, convert_yaml_to_dict(schema_text), None)
+    except YAML.YAMLError as ye:
+        return (
+            schema_path,
+            None,
+            f"Yaml could not be parsed. Error details: \n{str(ye)}",
+        )
+
+
+class SchemaTreeLoad:
+    """Records a single load of a schema tree - the fingerprint of the files that
+    were read and the registry names that were created from them."""
+
+    def __init__(
+        self,
+        root: Path,
+        fingerprint: dict,
+        schema_names: set,
+        registered_names: set,
+        lazy: bool = False,
+    ):
+        self.root = root
+        self.fingerprint = fingerprint
+        self.schema_names = frozenset(schema_names)
+        self.registered_names = frozenset(registered_names)
+        self.lazy = lazy
+        # The registry (and its generation) the tree was last seen complete in
+        self.registry = None
+        self.registry_generation = None
+
+
+class SchemaIndexEntry:
+    """Where to find a schema that has been indexed but not yet compiled."""
+
+    def __init__(self, schema_name: str, schema_path: Path, base_name: str = None):
+        self.schema_name = schema_name
+        self.schema_path = schema_path
+        self.base_name = base_name
+
+
+class TrackedSchemaRegistry(dict):
+    """Drop-in replacement for marshmallow.class_registry._registry that bumps its
+    generation whenever a name is removed. Adding a schema never unloads a tree, so
+    a tree seen complete at the current generation is still complete."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generation = 0
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.generation += 1
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            self.generation += 1
+        return super().pop(key, *default)
+
+    def popitem(self):
+        self.generation += 1
+        return super().popitem()
+
+    def clear(self):
+        self.generation += 1
+        super().clear()
+
+
+class LazySchemaRegistry(TrackedSchemaRegistry):
+    """Drop-in replacement for marshmallow.class_registry._registry. Lookups for a
+    name that has been indexed but not compiled call the resolver to compile it
+    (which in turn looks up, and so compiles, its base schema) before returning."""
+
+    def __init__(self, *args, resolver=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resolver = resolver
+        self.index = {}
+        self.compiled_names = {}
+        self._lock = threading.RLock()
+
+    def __missing__(self, key):
+        entry = self.index.get(key)
+        if entry is None or self.resolver is None:
+            raise KeyError(key)
+
+        with self._lock:
+            # Another thread may have compiled it while we waited for the lock
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+
+            registry_before = set(self.keys())
+            self.resolver(entry)
+            self.compiled_names[key] = self.keys() - registry_before
+
+            if not dict.__contains__(self, key):
+                raise KeyError(key)
+            return dict.__getitem__(self, key)
+
+    def add_index(self, index: dict):
+        """Adds {schema_name: SchemaIndexEntry}. Names already indexed keep their
+        original entry, matching the eager loaders where the first schema wins."""
+        for schema_name, entry in index.items():
+            self.index.setdefault(schema_name, entry)
+
+    def drop(self, schema_name: str, unregister: bool = True):
+        """Removes a schema from the index and, if unregister is True, removes
+        anything that was compiled for it from the registry."""
+        if self.index.pop(schema_name, None) is not None:
+            self.generation += 1
+        compiled_names = self.compiled_names.pop(schema_name, set())
+        if unregister:
+            for name in compiled_names:
+                self.pop(name, None)
+
+
+class MLSchemaRegistry:
+    """Keeps track of every schema tree that has been loaded in this process. Each
+    tree is fingerprinted (path, mtime, size and content hash for every file) when
+    it is loaded, which lets us answer 'is this tree already loaded' without
+    touching the disk and 'has this tree changed' without re-parsing any yaml."""
+
+    SCHEMA_GLOB = "**/*.yaml"
+
+    # Trees smaller than this are parsed in process - starting a pool costs more
+    # than parsing a few hundred small files.
+    PARALLEL_PARSE_THRESHOLD = 256
+
+    # Bump when the layout of the on-disk cache changes.
+    CACHE_FORMAT_VERSION = 1
+    CACHE_DIR_ENV = "MLSPECLIB_CACHE_DIR"
+
+    _loaded_trees = {}
+    _library_fingerprint = None
+
+    @staticmethod
+    def schema_files(root: Path) -> list:
+        """Returns every schema file under root in a stable order."""
+        return sorted(Path(root).glob(MLSchemaRegistry.SCHEMA_GLOB))
+
+    @staticmethod
+    def hash_file(file_path: Path) -> str:
+        return hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+
+    @staticmethod
+    def fingerprint_tree(root: Path, previous: dict = None) -> dict:
+        """Returns {path: (mtime_ns, size, sha256)} for every schema file under root.
+        If a previous fingerprint is provided, files whose mtime and size have not
+        changed reuse the previous hash instead of being read again."""
+        previous = previous or {}
+        fingerprint = {}
+        for schema_file in MLSchemaRegistry.schema_files(root):
+            stat = schema_file.stat()
+            key = str(schema_file)
+            old = previous.get(key)
+            if (
+                old is not None
+                and old[0] == stat.st_mtime_ns
+                and old[1] == stat.st_size
+            ):
+                content_hash = old[2]
+            else:
+                content_hash = MLSchemaRegistry.hash_file(schema_file)
+            fingerprint[key] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return fingerprint
+
+    @staticmethod
+    def fingerprint_changed(old: dict, new: dict) -> bool:
+        """Compares two fingerprints on paths and content hashes only - touching a
+        file without changing it does not count as a change."""
+        if old.keys() != new.keys():
+            return True
+        return any(old[key][2] != new[key][2] for key in old)
+
+    @staticmethod
+    def loaded_trees() -> list:
+        return list(MLSchemaRegistry._loaded_trees.values())
+
+    @staticmethod
+    def get_tree(root: Path) -> SchemaTreeLoad:
+        return MLSchemaRegistry._loaded_trees.get(os.path.abspath(root))
+
+    @staticmethod
+    def is_loaded(root: Path) -> bool:
+        """True if the tree has been loaded and every schema it produced is still in
+        marshmallow.class_registry. Does not touch the file system, and only checks
+        the names again if something was removed from the registry since the tree was
+        last found complete."""
+        tree = MLSchemaRegistry.get_tree(root)
+        if tree is None:
+            return False
+
+        registry = marshmallow.class_registry._registry
+        if (
+            registry is tree.registry
+            and registry.generation == tree.registry_generation
+        ):
+            return True
+
+        # Replaced wholesale (e.g. with a plain copy) - tracked from here on
+        registry = MLSchemaRegistry.install_tracked_registry()
+        if tree.lazy:
+            loaded = isinstance(registry, LazySchemaRegistry) and tree.schema_names <= (
+                registry.keys() | registry.index.keys()
+            )
+        else:
+            loaded = tree.schema_names <= registry.keys()
+
+        if loaded:
+            tree.registry, tree.registry_generation = registry, registry.generation
+        return loaded
+
+    @staticmethod
+    def is_stale(root: Path) -> bool:
+        """True if the files under root no longer match the fingerprint recorded
+        when the tree was loaded (or if the tree was never loaded)."""
+        tree = MLSchemaRegistry.get_tree(root)
+        if tree is None:
+            return True
+        new_fingerprint = MLSchemaRegistry.fingerprint_tree(root, tree.fingerprint)
+        return MLSchemaRegistry.fingerprint_changed(tree.fingerprint, new_fingerprint)
+
+    @staticmethod
+    def record_load(
+        root: Path,
+        fingerprint: dict,
+        schema_names: set,
+        registered_names: set,
+        lazy: bool = False,
+    ) -> SchemaTreeLoad:
+        tree = SchemaTreeLoad(
+            Path(os.path.abspath(root)),
+            fingerprint,
+            schema_names,
+            registered_names,
+            lazy=lazy,
+        )
+        MLSchemaRegistry._loaded_trees[str(tree.root)] = tree
+        MLSchemaRegistry.install_tracked_registry()
+        return tree
+
+    @staticmethod
+    def forget(root: Path = None, unregister: bool = False):
+        """Drops the record for root (or for every tree if root is None). If
+        unregister is True, the schemas that were created by the load are also
+        removed from marshmallow.class_registry so they can be compiled again."""
+        if root is None:
+            trees = list(MLSchemaRegistry._loaded_trees.values())
+        else:
+            tree = MLSchemaRegistry.get_tree(root)
+            trees = [] if tree is None else [tree]
+
+        registry = marshmallow.class_registry._registry
+        for tree in trees:
+            MLSchemaRegistry._loaded_trees.pop(str(tree.root), None)
+            if tree.lazy and isinstance(registry, LazySchemaRegistry):
+                for name in tree.schema_names:
+                    registry.drop(name, unregister=unregister)
+            if unregister:
+                for name in tree.schema_names | tree.registered_names:
+                    registry.pop(name, None)
+
+    # Functions below here are for lazy loading, where a tree is indexed by reading
+    # only the mlspec_* header of each file, and schemas are compiled the first time
+    # they are looked up in marshmallow.class_registry.
+
+    HEADER_FIELDS = ("mlspec_schema_version", "mlspec_schema_type", "mlspec_base_type")
+
+    @staticmethod
+    def read_schema_header(schema_text: str) -> dict:
+        """Parses only the top level mlspec_* blocks of a schema, which is a small
+        fraction of the file. Returns {} if there is no header."""
+        header_lines = []
+        in_header = False
+        for line in schema_text.splitlines():
+            if line and not line[0].isspace() and not line.startswith("#"):
+                key = line.split(":", 1)[0].strip()
+                in_header = key in MLSchemaRegistry.HEADER_FIELDS
+            if in_header:
+                header_lines.append(line)
+
+        header = convert_yaml_to_dict("\n".join(header_lines))
+        return header if isinstance(header, dict) else {}
+
+    @staticmethod
+    def index_entry_for_file(schema_path: Path) -> SchemaIndexEntry:
+        """Builds the index entry for a schema file from its header. Returns None if
+        the header does not name a schema version and type."""
+        header = MLSchemaRegistry.read_schema_header(
+            Path(schema_path).read_text("utf-8")
+        )
+        try:
+            schema_name = build_schema_name_for_schema(
+                mlspec_schema_version=header["mlspec_schema_version"],
+                mlspec_schema_type=header["mlspec_schema_type"],
+            )
+        except (KeyError, TypeError):
+            return None
+
+        base_name = None
+        base_type = header.get("mlspec_base_type")
+        if isinstance(base_type, dict) and base_type.get("meta") is not None:
+            base_name = return_schema_name(
+                str(header["mlspec_schema_version"]["meta"]), str(base_type["meta"])
+            )
+
+        return SchemaIndexEntry(schema_name, Path(schema_path), base_name)
+
+    @staticmethod
+    def install_tracked_registry() -> TrackedSchemaRegistry:
+        """Swaps marshmallow.class_registry._registry for a TrackedSchemaRegistry
+        holding the same entries (if it is not one already) and returns it."""
+        registry = marshmallow.class_registry._registry
+        if not isinstance(registry, TrackedSchemaRegistry):
+            registry = TrackedSchemaRegistry(registry)
+            marshmallow.class_registry._registry = registry
+        return registry
+
+    @staticmethod
+    def install_lazy_registry(resolver) -> LazySchemaRegistry:
+        """Swaps marshmallow.class_registry._registry for a LazySchemaRegistry holding
+        the same entries (if it is not one already) and returns it."""
+        registry = marshmallow.class_registry._registry
+        if not isinstance(registry, LazySchemaRegistry):
+            registry = LazySchemaRegistry(registry, resolver=resolver)
+            marshmallow.class_registry._registry = registry
+        registry.resolver = resolver
+        return registry
+
+    # Functions below here are for reading a tree and ordering it for compilation.
+
+    @staticmethod
+    def parse_schema_files(schema_paths: list, workers: int = None) -> list:
+        """Parses schema files and returns [(path, schema_dict, error)] in the order
+        given. Large trees are spread across a process pool with 'workers' processes
+        (default: one per cpu)."""
+        schema_paths = [str(schema_path) for schema_path in schema_paths]
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if (
+            workers > 1
+            and len(schema_paths) >= MLSchemaRegistry.PARALLEL_PARSE_THRESHOLD
+        ):
+            # Large chunks keep the pickling overhead small relative to the parsing
+            chunksize = max(1, len(schema_paths) // (workers * 4))
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    return list(
+                        executor.map(
+                            _parse_schema_file, schema_paths, chunksize=chunksize
+                        )
+                    )
+            except (OSError, NotImplementedError, BrokenProcessPool) as pe:
+                logging.getLogger().debug(
+                    f"Could not parse schemas in a process pool, parsing serially: {str(pe)}"
+                )
+
+        return [_parse_schema_file(schema_path) for schema_path in schema_paths]
+
+    @staticmethod
+    def base_schema_name(schema_dict: dict) -> str:
+        """Returns the registry name of the schema's mlspec_base_type, or None."""
+        base_type = schema_dict.get("mlspec_base_type")
+        if not isinstance(base_type, dict) or base_type.get("meta") is None:
+            return None
+        return return_schema_name(
+            str(schema_dict["mlspec_schema_version"]["meta"]), str(base_type["meta"])
+        )
+
+    @staticmethod
+    def dependency_waves(schema_dicts: list) -> list:
+        """Topologically sorts schema dicts on mlspec_base_type into waves. Every schema
+        in a wave only depends on schemas in earlier waves, or on schemas outside of
+        this list (which must already be registered). Inheritance can be any number of
+        levels deep. If two dicts have the same name the first one wins, matching the
+        registry. Raises ValueError if the inheritance contains a cycle."""
+        schemas_by_name = {}
+        for schema_dict in schema_dicts:
+            schema_name = build_schema_name_for_schema(
+                mlspec_schema_version=schema_dict["mlspec_schema_version"],
+                mlspec_schema_type=schema_dict["mlspec_schema_type"],
+            )
+            schemas_by_name.setdefault(schema_name, schema_dict)
+
+        derived_schemas = {}
+        waiting_on_base = set()
+        current_wave = []
+        for schema_name, schema_dict in schemas_by_name.items():
+            base_name = MLSchemaRegistry.base_schema_name(schema_dict)
+            if base_name is not None and base_name in schemas_by_name:
+                derived_schemas.setdefault(base_name, []).append(schema_name)
+                waiting_on_base.add(schema_name)
+            else:
+                current_wave.append(schema_name)
+
+        waves = []
+        while len(current_wave) > 0:
+            waves.append([schemas_by_name[name] for name in current_wave])
+            next_wave = []
+            for schema_name in current_wave:
+                for derived_name in derived_schemas.get(schema_name, []):
+                    waiting_on_base.discard(derived_name)
+                    next_wave.append(derived_name)
+            current_wave = next_wave
+
+        if len(waiting_on_base) > 0:
+            raise ValueError(
+                f"Schema inheritance contains a cycle, could not order: {', '.join(sorted(waiting_on_base))}"
+            )
+
+        return waves
+
+    # Functions below here are for the on-disk cache of parsed schemas. The cache
+    # lets a new process skip yaml parsing entirely - it is keyed on the content
+    # hashes of every schema file plus the version and source of mlspeclib, so
+    # editing a schema or upgrading the library invalidates it automatically.
+
+    @staticmethod
+    def cache_dir() -> Path:
+        """Returns the directory for the schema cache, or None if caching is disabled.
+        Set MLSPECLIB_CACHE_DIR to move the cache, or to an empty string to disable it.
+        """
+        configured = os.environ.get(MLSchemaRegistry.CACHE_DIR_ENV)
+        if configured is not None:
+            return Path(configured) if configured.strip() else None
+
+        cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return Path(cache_home) / "mlspeclib"
+
+    @staticmethod
+    def library_fingerprint() -> str:
+        """Hash of the mlspeclib version and python source, computed once per process."""
+        if MLSchemaRegistry._library_fingerprint is None:
+            library_hash = hashlib.sha256(__version__.encode("utf-8"))
+            library_root = Path(os.path.dirname(mlspeclib.__file__))
+            for source_file in sorted(library_root.glob("**/*.py")):
+                library_hash.update(source_file.read_bytes())
+            MLSchemaRegistry._library_fingerprint = library_hash.hexdigest()
+        return MLSchemaRegistry._library_fingerprint
+
+    @staticmethod
+    def cache_key(fingerprint: dict) -> str:
+        """Builds the cache key for a tree from the content hashes of its files."""
+        key_hash = hashlib.sha256(
+            f"{MLSchemaRegistry.CACHE_FORMAT_VERSION}|{MLSchemaRegistry.library_fingerprint()}".encode(
+                "utf-8"
+            )
+        )
+        for path in sorted(fingerprint):
+            key_hash.update(f"|{path}|{fingerprint[path][2]}".encode("utf-8"))
+        return key_hash.hexdigest()
+
+    @staticmethod
+    def cache_path(root: Path) -> Path:
+        """Each schema tree has a single cache file, overwritten when the key changes."""
+        cache_dir = MLSchemaRegistry.cache_dir()
+        if cache_dir is None:
+            return None
+        root_hash = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()
+        return cache_dir / f"schemas-{root_hash[:16]}.json"
+
+    @staticmethod
+    def read_cache(root: Path, key: str) -> list:
+        """Returns the cached list of parsed schema dicts for root, or None if there is
+        no cache or it was written for a different key."""
+        cache_path = MLSchemaRegistry.cache_path(root)
+        if cache_path is None or not cache_path.exists():
+            return None
+
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logging.getLogger().debug(f"Ignoring unreadable schema cache: {cache_path}")
+            return None
+
+        if not isinstance(cached, dict) or cached.get("key") != key:
+            return None
+
+        return cached.get("schemas")
+
+    @staticmethod
+    def write_cache(root: Path, key: str, schema_dicts: list) -> bool:
+        """Writes the parsed schema dicts for root to the cache. Schemas that do not
+        survive a round trip through json (e.g. yaml dates or non-string keys) are
+        never cached. Returns True if the cache was written."""
+        cache_path = MLSchemaRegistry.cache_path(root)
+        if cache_path is None:
+            return False
+
+        rootLogger = logging.getLogger()
+        try:
+            cache_text = json.dumps({"key": key, "schemas": schema_dicts})
+        except (TypeError, ValueError):
+            rootLogger.debug(f"Schemas under '{root}' cannot be cached as json.")
+            return False
+
+        if json.loads(cache_text)["schemas"] != schema_dicts:
+            rootLogger.debug(f"Schemas under '{root}' do not round trip through json.")
+            return False
+
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so concurrent processes never see
+            # a partially written cache.
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=cache_path.parent,
+                prefix=cache_path.name,
+                delete=False,
+            ) as temp_file:
+                temp_file.write(cache_text)
+            os.replace(temp_file.name, cache_path)
+        except OSError as ose:
+            rootLogger.debug(f"Could not write schema cache '{cache_path}': {str(ose)}")
+            return False
+
+        return True
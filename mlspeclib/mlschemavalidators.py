@@ -1,5 +1,6 @@
 """Functions for validating submissions"""
 
+import functools
 import re
 
 import marshmallow
@@ -11,10 +12,47 @@ from mlspeclib.helpers import return_schema_name
 
 from . import util
 
+# The same few hundred semvers, URIs, paths and buckets repeat across millions of
+# submissions, so the results of the validators of single values are memoized, up to
+# this many values per validator. See MLSchemaValidators.cache_info.
+VALIDATOR_CACHE_SIZE = 1024
+
+PATH_REGEX = re.compile(r"(^[a-z0-9\-._~%!$&'()*+,;=:@/]+$)")  # noqa
+BUCKET_REGEX = re.compile(
+    r"(?=^.{3,63}$)(?!^(\d+\.)+\d+$)(^(([a-z0-9]|[a-z0-9][a-z0-9\-]*[a-z0-9])\.)*([a-z0-9]|[a-z0-9][a-z0-9\-]*[a-z0-9])$)"
+)  # noqa
+
+
+def memoize_validator(validator):
+    """Memoizes a validator of a single value. typed=True, as 1, 1.0 and True are
+    equal but not equally valid."""
+    return functools.lru_cache(maxsize=VALIDATOR_CACHE_SIZE, typed=True)(validator)
+
 
 # pylint: disable=missing-class-docstring
 class MLSchemaValidators:
+    # Kubeflow types manually copied from here -
+    # https://github.com/kubeflow/pipelines/blob/master/sdk/python/kfp/dsl/types.py
+    # TODO: Code gen this list: https://github.com/kubeflow/pipelines/blob/master/sdk/python/kfp/components/_structures.py # noqa
+    KUBEFLOW_TYPES = {
+        "Integer": int,
+        "String": str,
+        "Float": float,
+        "Bool": bool,
+        "List": list,
+        "Dict": dict,
+        "GcsPath": None,
+        "GCPPath": None,
+        "GCRPath": None,
+        "GCPRegion": None,
+        "GCPProjectID": None,
+        "LocalPath": None,
+        "Dataset": None,
+        "AzureSku": None,
+    }
+
     @staticmethod
+    @memoize_validator
     def validate_type_semver(value):
         try:
             sv.VersionInfo.parse(value)
@@ -24,22 +62,44 @@ class MLSchemaValidators:
 
     # pylint: disable=invalid-name
     @staticmethod
+    @memoize_validator
     def validate_type_URI(value):
         return util.validate_url(value)
 
     @staticmethod
+    @memoize_validator
     def validate_type_path(value):
         """Uses regex to validate the value is a path. Returns True/False"""
-        path_regex = re.compile("(^[a-z0-9\-._~%!$&'()*+,;=:@/]+$)")  # noqa
-        return path_regex.match(value)
+        return PATH_REGEX.match(value)
 
     @staticmethod
+    @memoize_validator
     def validate_type_bucket(value):
         """Uses regex to validate the value is a path. Returns True/False"""
-        bucket_regex = re.compile(
-            r"(?=^.{3,63}$)(?!^(\d+\.)+\d+$)(^(([a-z0-9]|[a-z0-9][a-z0-9\-]*[a-z0-9])\.)*([a-z0-9]|[a-z0-9][a-z0-9\-]*[a-z0-9])$)"
-        )  # noqa
-        return bucket_regex.match(value)
+        return BUCKET_REGEX.match(value)
+
+    @staticmethod
+    def memoized_validators() -> dict:
+        return {
+            "semver": MLSchemaValidators.validate_type_semver,
+            "URI": MLSchemaValidators.validate_type_URI,
+            "path": MLSchemaValidators.validate_type_path,
+            "bucket": MLSchemaValidators.validate_type_bucket,
+        }
+
+    @staticmethod
+    def cache_info() -> dict:
+        """Returns the hits, misses, maxsize and currsize of each memoized validator,
+        for tuning VALIDATOR_CACHE_SIZE."""
+        return {
+            name: validator.cache_info()
+            for name, validator in MLSchemaValidators.memoized_validators().items()
+        }
+
+    @staticmethod
+    def clear_caches():
+        for validator in MLSchemaValidators.memoized_validators().values():
+            validator.cache_clear()
 
     @staticmethod
     def validate_type_string_cast(value):
@@ -72,25 +132,7 @@ class MLSchemaValidators:
         """Takes a Kubeflow Component interface and returns True/False if valid.
         From here: https://www.kubeflow.org/docs/pipelines/reference/component-spec/#detailed-specification-componentspec # noqa
         """
-        # Kubeflow types manually copied from here -
-        # https://github.com/kubeflow/pipelines/blob/master/sdk/python/kfp/dsl/types.py
-        # TODO: Code gen this list: https://github.com/kubeflow/pipelines/blob/master/sdk/python/kfp/components/_structures.py # noqa
-        kubeflow_types = {
-            "Integer": int,
-            "String": str,
-            "Float": float,
-            "Bool": bool,
-            "List": list,
-            "Dict": dict,
-            "GcsPath": None,
-            "GCPPath": None,
-            "GCRPath": None,
-            "GCPRegion": None,
-            "GCPProjectID": None,
-            "LocalPath": None,
-            "Dataset": None,
-            "AzureSku": None,
-        }
+        kubeflow_types = MLSchemaValidators.KUBEFLOW_TYPES
 
         # The schema gives us a list of dicts, each of which only has one entry. So we have to do
         # this - could theoretically  support multiple entries per list item if it comes to that.
@@ -105,8 +147,9 @@ class MLSchemaValidators:
             # This is for the following:
             #   input:
             #   - foo: { type: bar}
+            # (copied, so that validating does not add 'name' to the submission)
             key = next(iter(interface_object.keys()))
-            interface_dict = interface_object[key]
+            interface_dict = dict(interface_object[key])
             interface_dict["name"] = key
 
         if "type" in interface_dict:
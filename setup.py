@@ -49,6 +49,7 @@ setup(
         "pymysql",
         "gitpython",
     ],
+    extras_require={"numpy": ["numpy"]},
     packages=["mlspeclib", "mlspeclib.experimental"],
     include_package_data=True,
     package_data={"": extra_files},
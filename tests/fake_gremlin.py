@@ -0,0 +1,148 @@
+""" In-process stand-in for a Gremlin server, for exercising GremlinHelpers and Metastore
+without a database. """
+
+import base64
+import threading
+import time
+from concurrent.futures import Future
+
+import yaml
+
+from mlspeclib.experimental.gremlin_pool import GremlinClientPool
+from mlspeclib.experimental.metastore import AsyncMetastore, Metastore
+from mlspeclib.experimental.vertex_cache import VertexCache
+
+
+class FakeGremlinServer:
+    """ Records every query its clients submit, and answers each after 'latency' seconds
+    (the network round trip). results_for(query) returns the results for a query - by
+    default a single placeholder result, since GremlinHelpers treats no results as an
+    error. A batch from GremlinHelpers.execute_batch is answered like a server would,
+    with the folded results_for of each of its traversals. max_in_flight is the most queries that were waiting for an answer at once.
+    Connecting a client takes 'connect_latency' seconds (the handshake) and is counted in
+    connections. """
+
+    def __init__(self, latency: float = 0.0, results_for=None, connect_latency: float = 0.0):
+        self.latency = latency
+        self.results_for = results_for or (lambda query: [{"id": "fake"}])
+        self.connect_latency = connect_latency
+        self.connections = 0
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def client(self, *args):
+        """ Takes the arguments of gremlin_pool.build_gremlin_client, which it ignores. """
+        time.sleep(self.connect_latency)
+        with self._lock:
+            self.connections += 1
+        return FakeGremlinClient(self)
+
+    def client_pool(self, **kwargs) -> GremlinClientPool:
+        return GremlinClientPool(client_factory=self.client, **kwargs)
+
+    def submit(self, message) -> Future:
+        """ Answers from another thread once the latency has passed, like a real
+        connection, so waiting on one query doesn't hold up the others. """
+        with self._lock:
+            self.queries.append(message)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        future = Future()
+
+        def answer():
+            with self._lock:
+                self.in_flight -= 1
+            try:
+                future.set_result(FakeResultSet([self.results_of(message)]))
+            except Exception as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+
+        if self.latency > 0:
+            threading.Timer(self.latency, answer).start()
+        else:
+            answer()
+        return future
+
+    def results_of(self, query) -> list:
+        traversals = batch_traversals(query)
+        if traversals is None:
+            return self.results_for(query)
+        return [list(self.results_for("g." + traversal)) for traversal in traversals]
+
+
+def batch_traversals(query: str) -> list:
+    """ The traversals of a batch query, or None if query isn't a batch. """
+    prefix, suffix = "g.inject(0).union(__.", ".fold())"
+    if not (query.startswith(prefix) and query.endswith(suffix)):
+        return None
+    return query[len(prefix) : -len(suffix)].split(".fold(), __.")
+
+
+class FakeResultSet:
+    """ The part of gremlin_python's ResultSet that GremlinHelpers uses - iterating
+    over it gives chunks of results, all() a future of every result. """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __iter__(self):
+        return iter(self._chunks)
+
+    def all(self) -> Future:
+        future = Future()
+        future.set_result([result for chunk in self._chunks for result in chunk])
+        return future
+
+
+class FakeGremlinClient:
+    """ The part of gremlin_python's client.Client that GremlinHelpers uses. """
+
+    def __init__(self, server: FakeGremlinServer):
+        self.server = server
+        self.closed = False
+
+    def submitAsync(self, message):  # pylint: disable=invalid-name
+        return self.server.submit(message)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def fake_credentials(container_name="fake_container") -> str:
+    """ credentials_packed for a container on the fake server. """
+    return base64.urlsafe_b64encode(
+        yaml.safe_dump(
+            {
+                "url": "wss://fake-gremlin:443/",
+                "key": "fake_key",
+                "database_name": "fake_database",
+                "container_name": container_name,
+            }
+        ).encode("utf-8")
+    ).decode("utf-8")
+
+
+def fake_metastore(
+    server: FakeGremlinServer, client_pool: GremlinClientPool = None, run_cache: VertexCache = None
+):
+    """ A Metastore connected to the fake server rather than a database, with a run cache
+    of its own. """
+    if client_pool is None:
+        client_pool = server.client_pool()
+    if run_cache is None:
+        run_cache = VertexCache()
+    metastore = Metastore(fake_credentials(), client_pool, run_cache)
+    metastore._gc._workflow_partition_id = "FAKE_PARTITION_ID"
+    return metastore
+
+
+def fake_async_metastore(server: FakeGremlinServer, concurrency_limit: int = None):
+    metastore = AsyncMetastore(fake_credentials(), concurrency_limit, server.client_pool(), VertexCache())
+    metastore._gc._workflow_partition_id = "FAKE_PARTITION_ID"
+    return metastore
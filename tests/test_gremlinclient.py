@@ -1,11 +1,15 @@
 # pylint: disable=protected-access,missing-function-docstring, missing-class-docstring
 # pylint: disable=missing-module-docstring, missing-class-docstring
 # -*- coding: utf-8 -*-
+import asyncio
 import sys
+import threading
+import time
 import unittest
 from pathlib import Path
 
 import pymysql
+import tornado
 import yaml
 from mock import MagicMock, patch
 
@@ -13,8 +17,41 @@ sys.path.append(str(Path.cwd()))
 sys.path.append(str(Path.cwd().parent))
 
 from mlspeclib.experimental.gremlin_helpers import GremlinHelpers
+from mlspeclib.experimental.gremlin_pool import GremlinClientPool
 from mlspeclib.experimental.metastore import Metastore
+from mlspeclib.experimental.vertex_cache import VertexCache, freeze
+from mlspeclib.helpers import checksum_raw_object, decode_raw_object_from_db, encode_raw_object_for_db
 from mlspeclib.mlobject import MLObject
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
+from tests.fake_gremlin import FakeGremlinServer, batch_traversals, fake_async_metastore, fake_credentials, fake_metastore
+
+
+def workflow_with_steps(step_count):
+    workflow_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/workflow.yaml")
+    step_template = next(iter(workflow_object.steps.values())).to_dict()
+    steps = {}
+    for index in range(step_count):
+        step = dict(step_template)
+        step.pop("previous", None)
+        step.pop("next", None)
+        if index > 0:
+            step["previous"] = f"step_{index - 1}"
+        if index < step_count - 1:
+            step["next"] = f"step_{index + 1}"
+        steps[f"step_{index}"] = step
+    workflow_object.steps = steps
+    return workflow_object
+
+
+def union_branches(queries):
+    branches = []
+    for query in queries:
+        traversals = batch_traversals(query)
+        if traversals is not None:
+            branches.extend(traversals)
+        else:
+            branches.append(query[len("g."):])
+    return branches
 
 
 class GremlinHelpersTestSuite(unittest.TestCase):  # pylint: disable=invalid-name
@@ -37,7 +74,7 @@ class GremlinHelpersTestSuite(unittest.TestCase):  # pylint: disable=invalid-nam
         call_args = GremlinHelpers.execute_query.call_args[0][0]  # noqa # pylint: disable=no-member
         self.assertTrue(call_args == "g.V('FAKE_WORKFLOW_NODE_ID')")
 
-    @patch.object(yaml, "safe_dump", return_value=None)
+    @patch.object(yaml, "dump", return_value=None)
     @patch.object(GremlinHelpers, "__init__", return_value=None)
     @patch.object(MLObject, "create_object_from_string", return_value=None)
     @patch.object(
@@ -61,7 +98,7 @@ class GremlinHelpersTestSuite(unittest.TestCase):  # pylint: disable=invalid-nam
             return_val == "FAKE_STEP_NAME|input|FAKERUNID|1970-01-01T00:00:00|999.99.99"
         )
 
-    @patch.object(yaml, "safe_dump", return_value=None)
+    @patch.object(yaml, "dump", return_value=None)
     @patch.object(GremlinHelpers, "__init__", return_value=None)
     @patch.object(MLObject, "create_object_from_string", return_value=None)
     @patch.object(GremlinHelpers, "_rootLogger")
@@ -94,6 +131,374 @@ class GremlinHelpersTestSuite(unittest.TestCase):  # pylint: disable=invalid-nam
             == f"workflow|workflow|{workflow_object.workflow_version}|{workflow_partition_id}"
         )
 
+    @patch.object(GremlinHelpers, "__init__", return_value=None)
+    def test_trusted_load_with_matching_checksum(self, *other_mock_objects):
+        ms = Metastore({})
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        raw_content = encode_raw_object_for_db(ml_object)
+        properties = {"raw_content": [{"value": raw_content}]}
+
+        with patch.object(GremlinHelpers, "execute_query", return_value=[{"properties": properties}]), \
+                patch.object(MLObject, "create_object_from_string", wraps=MLObject.create_object_from_string) as full_load:
+            # No checksum - validated
+            loaded_object, errors = ms.get_object("FAKE_NODE_ID")
+            self.assertEqual(full_load.call_count, 1)
+
+            # Mismatched checksum - validated
+            properties["raw_content_checksum"] = [{"value": "not the checksum"}]
+            ms.get_object("FAKE_NODE_ID")
+            self.assertEqual(full_load.call_count, 2)
+
+            # Matching checksum - trusted, unless validation is asked for
+            properties["raw_content_checksum"] = [{"value": checksum_raw_object(raw_content)}]
+            trusted_object, trusted_errors = ms.get_object("FAKE_NODE_ID")
+            self.assertEqual(full_load.call_count, 2)
+            ms.get_object("FAKE_NODE_ID", validate=True)
+            self.assertEqual(full_load.call_count, 3)
+
+        self.assertEqual(trusted_errors, errors)
+        self.assertEqual(trusted_object.to_dict(), loaded_object.to_dict())
+
+    @patch.object(GremlinHelpers, "__init__", return_value=None)
+    @patch.object(GremlinHelpers, "execute_query", return_value=[])
+    def test_checksum_only_saved_for_valid_objects(self, *other_mock_objects):
+        ms = Metastore({})
+        ms._gc._workflow_partition_id = "FAKE_PARTITION_ID"
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+
+        # Already validated when it was loaded, so saving doesn't validate it again
+        with patch.object(MLSchemaCompiler, "change_validator_for") as change_validator_for:
+            with patch.object(ml_object.get_schema(), "validate") as schema_validate:
+                ms.attach_step_info(ml_object, "999.99.99", "FAKE_NODE_ID", "FAKE_STEP_NAME", "input")
+        change_validator_for.assert_not_called()
+        schema_validate.assert_not_called()
+        add_run_info_query = GremlinHelpers.execute_query.call_args_list[0][0][0]  # noqa # pylint: disable=no-member
+        checksum = checksum_raw_object(encode_raw_object_for_db(ml_object))
+        self.assertIn(f".property('raw_content_checksum', '{checksum}')", add_run_info_query)
+
+        GremlinHelpers.execute_query.reset_mock()  # noqa # pylint: disable=no-member
+        ml_object.connection.endpoint = None
+        ms.attach_step_info(ml_object, "999.99.99", "FAKE_NODE_ID", "FAKE_STEP_NAME", "input")
+        add_run_info_query = GremlinHelpers.execute_query.call_args_list[0][0][0]  # noqa # pylint: disable=no-member
+        self.assertNotIn("raw_content_checksum", add_run_info_query)
+
+    def test_create_workflow_steps_batched(self):
+        workflow_object = workflow_with_steps(200)
+
+        batched_server = FakeGremlinServer()
+        fake_metastore(batched_server).create_workflow_steps("FAKE_NODE_ID", workflow_object)
+        # 200 steps, then 398 previous/next edges, 25 to a request
+        self.assertEqual(len(batched_server.queries), 8 + 16)
+
+        # The same traversals as writing one step and one edge at a time
+        step_by_step_server = FakeGremlinServer()
+        ms = fake_metastore(step_by_step_server)
+        ms.create_workflow_steps("FAKE_NODE_ID", workflow_object, batch_size=1)
+        self.assertEqual(len(step_by_step_server.queries), 200 + 398)
+        self.assertEqual(
+            union_branches(batched_server.queries),
+            union_branches(step_by_step_server.queries),
+        )
+
+        step_vertex_id = "step_7|root|0.0.1|FAKE_PARTITION_ID"
+        step_branches = [
+            branch for branch in union_branches(batched_server.queries) if step_vertex_id in branch
+        ]
+        self.assertEqual(len(step_branches), 1)
+        self.assertIn(".addE('part_of').to(g.V().has('id', 'FAKE_NODE_ID'))", step_branches[0])
+        self.assertIn(".addE('contains').from(g.V().has('id', 'FAKE_NODE_ID'))", step_branches[0])
+
+    def test_batch_raises_when_a_traversal_matches_nothing(self):
+        traversals = ["V('a').addE('next').to(g.V('b'))", "V('missing').addE('next').to(g.V('b'))", "addV('id','c')"]
+        server = FakeGremlinServer(results_for=lambda query: [] if "'missing'" in query else [{"id": query}])
+        ms = fake_metastore(server)
+
+        self.assertEqual(
+            ms._gc._batch_query(traversals[:2]),
+            "g.inject(0).union(__.V('a').addE('next').to(g.V('b')).fold(), "
+            "__.V('missing').addE('next').to(g.V('b')).fold())",
+        )
+        self.assertEqual(
+            ms._gc.execute_batch([traversals[0], traversals[2]]),
+            [{"id": "g." + traversals[0]}, {"id": "g." + traversals[2]}],
+        )
+
+        for batch_size in [1, 2, 3]:
+            with self.assertRaisesRegex(ValueError, "zero results"):
+                ms._gc.execute_batch(traversals, batch_size)
+            with self.assertRaisesRegex(ValueError, "zero results"):
+                asyncio.run(fake_async_metastore(server)._gc.execute_batch(traversals, batch_size))
+
+        # A union that lost a branch
+        server.results_for = lambda query: [{"id": query}]
+        with patch.object(server, "results_of", return_value=[[{"id": "a"}]]):
+            with self.assertRaisesRegex(ValueError, "2 traversals returned 1 results"):
+                ms._gc.execute_batch(traversals[:2])
+
+    def test_insert_workflow_step_is_one_round_trip(self):
+        server = FakeGremlinServer()
+        ms = fake_metastore(server)
+        ms._gc.insert_workflow_step(
+            "train", "0.0.1", "data_result", "0.0.1", "training_run", "0.0.1", "model",
+            workflow_version="0.0.1", workflow_node_id="FAKE_NODE_ID",
+        )
+        self.assertEqual(len(server.queries), 1)
+        self.assertTrue(server.queries[0].startswith("g.addV('id','train|root|0.0.1|FAKE_PARTITION_ID')"))
+
+        ms._gc.connect_next_previous_vertices("FAKE_NODE_ID", "train", "process_data", None)
+        self.assertEqual(len(server.queries), 2)
+        server.results_for = lambda query: []
+        with self.assertRaises(ValueError):
+            ms._gc.connect_workflow_steps("FAKE_NODE_ID", {"train": ("process_data", "serve")})
+
+    def test_async_metastore_limits_concurrency(self):
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        raw_content = encode_raw_object_for_db(ml_object)
+        properties = {
+            "raw_content": [{"value": raw_content}],
+            "raw_content_checksum": [{"value": checksum_raw_object(raw_content)}],
+        }
+        server = FakeGremlinServer(latency=0.01, results_for=lambda query: [{"id": query, "properties": properties}])
+        ms = fake_async_metastore(server, concurrency_limit=8)
+
+        async def load_all():
+            return await asyncio.gather(
+                *[ms.get_object(f"node_{index}") for index in range(50)],
+                *[ms.get_all_runs("FAKE_NODE_ID", f"step_{index}") for index in range(50)],
+            )
+
+        results = asyncio.run(load_all())
+        self.assertEqual(len(server.queries), 100)
+        self.assertEqual(server.max_in_flight, 8)
+        for loaded_object, errors in results[:50]:
+            self.assertEqual(errors, {})
+            self.assertEqual(loaded_object.to_dict(), ml_object.to_dict())
+        self.assertEqual(list(results[50]), [server.queries[50]])
+
+        with self.assertRaises(ValueError):
+            fake_async_metastore(server, concurrency_limit=0)
+
+    def test_async_metastore_connects_off_the_event_loop(self):
+        server = FakeGremlinServer(connect_latency=0.3)
+        ms = fake_async_metastore(server)
+        ticks = []
+
+        async def tick_while_connecting():
+            load = asyncio.ensure_future(ms.get_all_runs("FAKE_NODE_ID", "step_3"))
+            while not load.done():
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+            return await load
+
+        results = asyncio.run(tick_while_connecting())
+        self.assertEqual(len(results), 1)
+        self.assertEqual(server.connections, 1)
+        # The loop kept running while the client connected
+        self.assertGreater(len(ticks), 5)
+
+    def test_async_metastore_sends_same_queries(self):
+        workflow_object = workflow_with_steps(60)
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+
+        def register(ms):
+            return [
+                ms.create_workflow_node(workflow_object, "FAKE_PARTITION_ID"),
+                ms.create_workflow_steps("FAKE_NODE_ID", workflow_object),
+                ms.attach_step_info(ml_object, "0.0.1", "FAKE_NODE_ID", "step_3", "input"),
+                ms.load("FAKE_NODE_ID", "step_3", "fake"),
+            ]
+
+        sync_server = FakeGremlinServer()
+        sync_results = register(fake_metastore(sync_server))
+
+        async def register_async(ms):
+            return await asyncio.gather(*register(ms))
+
+        async_server = FakeGremlinServer(latency=0.001)
+        async_results = asyncio.run(register_async(fake_async_metastore(async_server)))
+
+        self.assertEqual(async_results, sync_results)
+        self.assertEqual(sorted(union_branches(async_server.queries)), sorted(union_branches(sync_server.queries)))
+        self.assertGreater(async_server.max_in_flight, 1)
+
+        async_server.results_for = lambda query: []
+        with self.assertRaises(ValueError):
+            asyncio.run(fake_async_metastore(async_server).get_all_runs("FAKE_NODE_ID", "step_3"))
+
+    def test_metastores_share_pooled_client(self):
+        server = FakeGremlinServer()
+        pool = server.client_pool()
+        metastores = [fake_metastore(server, pool) for _ in range(20)]
+        # Nothing connects until the first query
+        self.assertEqual(server.connections, 0)
+
+        threads = [
+            threading.Thread(target=ms.get_all_runs, args=("FAKE_NODE_ID", "step_1")) for ms in metastores
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(server.queries), 20)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(pool), 1)
+
+        # Another container gets its own client
+        Metastore(fake_credentials("other_container"), pool).get_all_runs("FAKE_NODE_ID", "step_1")
+        self.assertEqual(server.connections, 2)
+
+        pool.close()
+        self.assertEqual(len(pool), 0)
+
+    def test_pool_evicts_idle_and_broken_clients(self):
+        server = FakeGremlinServer()
+        pool = server.client_pool(idle_timeout=60, health_check_interval=10)
+        ms = fake_metastore(server, pool)
+        with patch("mlspeclib.experimental.gremlin_pool.time.monotonic", return_value=1000):
+            ms.get_all_runs("FAKE_NODE_ID", "step_1")
+            first_client = ms._gc._gremlin_client()
+
+        # Unused for a while - checked before it is used again
+        with patch("mlspeclib.experimental.gremlin_pool.time.monotonic", return_value=1020):
+            self.assertIs(ms._gc._gremlin_client(), first_client)
+        self.assertEqual(server.queries[-1], "g.inject(0)")
+        self.assertEqual(server.connections, 1)
+
+        # Failing the check - reconnected
+        server.results_for = lambda query: 1 / 0 if query == "g.inject(0)" else [{"id": "fake"}]
+        with patch("mlspeclib.experimental.gremlin_pool.time.monotonic", return_value=1040):
+            second_client = ms._gc._gremlin_client()
+        self.assertIsNot(second_client, first_client)
+        self.assertTrue(first_client.is_closed())
+        self.assertEqual(server.connections, 2)
+
+        # Idle past the timeout - closed and reconnected
+        with patch("mlspeclib.experimental.gremlin_pool.time.monotonic", return_value=1100):
+            pool.evict_idle()
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(second_client.is_closed())
+
+        # Closed connection while querying - discarded
+        def closed_stream(query):
+            raise tornado.iostream.StreamClosedError()
+
+        server.results_for = closed_stream
+        with self.assertRaises(ValueError):
+            ms.get_all_runs("FAKE_NODE_ID", "step_1")
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(server.connections, 3)
+
+    def test_pool_connects_outside_its_lock(self):
+        server = FakeGremlinServer()
+        slow_server_answers = threading.Event()
+
+        def connect(url, key, database_name, container_name, pool_size):
+            if container_name == "slow_container":
+                slow_server_answers.wait(5)
+            return server.client()
+
+        pool = GremlinClientPool(client_factory=connect)
+        slow_thread = threading.Thread(target=pool.client_for, args=("url", "key", "db", "slow_container"))
+        slow_thread.start()
+        try:
+            # Another container doesn't wait for the slow one
+            start = time.perf_counter()
+            pool.client_for("url", "key", "db", "fast_container")
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertTrue(slow_thread.is_alive())
+        finally:
+            slow_server_answers.set()
+            slow_thread.join()
+        self.assertEqual(len(pool), 2)
+
+        pool.close()
+        self.assertEqual(len(pool), 0)
+        with self.assertRaises(RuntimeError):
+            pool.client_for("url", "key", "db", "fast_container")
+
+    def test_pool_closes_idle_clients_in_background(self):
+        server = FakeGremlinServer()
+        pool = server.client_pool(idle_timeout=0.05)
+        gremlin_client = fake_metastore(server, pool)._gc._gremlin_client()
+
+        deadline = time.monotonic() + 5
+        while len(pool) > 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(gremlin_client.is_closed())
+
+    def test_load_run_by_id_through_cache(self):
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        run_info = {"id": "RUN_ID", "properties": {"raw_content": [{"value": encode_raw_object_for_db(ml_object)}]}}
+        run_query = "g.V('RUN_ID').where(__.in('results').has('id', 'step_1').in().has('id', 'FAKE_NODE_ID'))"
+        server = FakeGremlinServer(results_for=lambda query: [run_info] if query == run_query else [])
+        ms = fake_metastore(server)
+
+        with patch("mlspeclib.experimental.vertex_cache.decode_raw_object_from_db", wraps=decode_raw_object_from_db) as decode:
+            loaded_object, errors = ms.get_step_object("FAKE_NODE_ID", "step_1", "RUN_ID")
+            self.assertEqual(errors, {})
+            self.assertEqual(loaded_object.to_dict(), ml_object.to_dict())
+            self.assertEqual(ms.load("FAKE_NODE_ID", "step_1", "RUN_ID"), freeze(run_info))
+            self.assertEqual(server.queries, [run_query])
+            self.assertEqual(ms.run_cache_stats()["hit_ratio"], 0.5)
+
+            # Cache hits don't decode the run again, and objects built from them don't share state
+            loaded_object.run_date = "changed"
+            cached_object, errors = ms.get_step_object("FAKE_NODE_ID", "step_1", "RUN_ID")
+            self.assertEqual(decode.call_count, 1)
+        self.assertEqual(errors, {})
+        self.assertEqual(cached_object.to_dict(), ml_object.to_dict())
+        self.assertEqual(
+            ms._gc.get_decoded_run_info("FAKE_NODE_ID", "step_1", "RUN_ID").raw_object,
+            decode_raw_object_from_db(run_info["properties"]["raw_content"][0]["value"]),
+        )
+
+        # Loaded runs are read-only, so they can't change the cached one
+        with self.assertRaises(TypeError):
+            ms.load("FAKE_NODE_ID", "step_1", "RUN_ID")["properties"]["raw_content"] = []
+        self.assertEqual(ms.load("FAKE_NODE_ID", "step_1", "RUN_ID"), freeze(run_info))
+
+        # A run isn't loaded for a step it doesn't belong to, even once it is cached
+        self.assertIsNone(ms.load("FAKE_NODE_ID", "step_2", "RUN_ID"))
+        self.assertIsNone(ms.load("OTHER_NODE_ID", "step_1", "RUN_ID"))
+        server.queries.clear()
+
+        # Runs that don't exist aren't cached
+        self.assertIsNone(ms.load("FAKE_NODE_ID", "step_1", "MISSING_RUN_ID"))
+        self.assertIsNone(ms.get_step_object("FAKE_NODE_ID", "step_1", "MISSING_RUN_ID"))
+        self.assertEqual(len(server.queries), 2)
+
+        async_ms = fake_async_metastore(server)
+        self.assertEqual(asyncio.run(async_ms.load("FAKE_NODE_ID", "step_1", "RUN_ID")), freeze(run_info))
+        async_object, errors = asyncio.run(async_ms.get_step_object("FAKE_NODE_ID", "step_1", "RUN_ID"))
+        self.assertEqual(async_object.to_dict(), ml_object.to_dict())
+        self.assertEqual(async_ms.run_cache_stats()["hits"], 1)
+
+    def test_vertex_cache_expires_and_evicts(self):
+        cache = VertexCache(maxsize=2, ttl=10)
+        with patch("mlspeclib.experimental.vertex_cache.time.monotonic", return_value=100):
+            cache.put("a", {"id": "a"})
+            cache.put("b", {"id": "b"})
+            self.assertEqual(cache.get("a"), {"id": "a"})
+            # b is the least recently used
+            cache.put("c", {"id": "c"})
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(len(cache), 2)
+
+        with patch("mlspeclib.experimental.vertex_cache.time.monotonic", return_value=110):
+            self.assertIsNone(cache.get("a"))
+
+        cache.invalidate("c")
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(
+            cache.stats(),
+            {"hits": 1, "misses": 3, "hit_ratio": 0.25, "size": 0, "maxsize": 2, "evictions": 1, "expirations": 1},
+        )
+
+        cache = VertexCache(maxsize=0)
+        cache.put("a", {"id": "a"})
+        self.assertIsNone(cache.get("a"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,16 +1,40 @@
 # pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
 # -*- coding: utf-8 -*-
+import base64
+import datetime
 import unittest
+import uuid
+from collections.abc import Mapping
+from pathlib import Path
+from unittest.mock import patch
+
+import yaml
+from box import Box
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from mlspeclib.helpers import (
+    convert_dict_to_yaml,
     convert_yaml_to_dict,
+    decode_raw_object_from_db,
+    encode_raw_object_for_db,
+    get_yaml_backend,
     merge_two_dicts,
     recursive_fromkeys,
     generate_lambda,
-    get_schema_from_registry
+    get_schema_from_registry,
+    set_yaml_backend,
+    to_json,
+    YAML_BACKENDS,
 )
+from mlspeclib.mlobject import MLObject
+from mlspeclib.mlschema import MLSchema
 
 from tests.sample_schemas import SampleSchema
+from tests.sample_submissions import SampleSubmissions
 
 from marshmallow import ValidationError
 
@@ -18,6 +42,20 @@ from io import StringIO
 import logging
 
 
+class ReadOnlyMapping(Mapping):
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+
+    def __getitem__(self, key):
+        return self.wrapped[key]
+
+    def __iter__(self):
+        return iter(self.wrapped)
+
+    def __len__(self):
+        return len(self.wrapped)
+
+
 class HelpersTestSuite(unittest.TestCase):
     """Helpers test cases."""
 
@@ -111,6 +149,65 @@ class HelpersTestSuite(unittest.TestCase):
 
         self.assertFalse(fxn(8193))
 
+    def test_generate_lambda_compiled_once(self):
+        self.assertIs(generate_lambda("x % 8192 == 0"), generate_lambda("x % 8192 == 0"))
+
+        # Rejected constraints are rejected every time
+        for _ in range(2):
+            with self.assertRaises(ValidationError):
+                generate_lambda("y > 10")
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_generate_lambda_vectorized(self):
+        columns = [
+            numpy.arange(-20, 20),
+            numpy.linspace(-2.0, 2.0, 41),
+            numpy.array([0.5, numpy.nan, numpy.inf, -numpy.inf]),
+        ]
+        for constraint in [
+            "x % 8192 == 0",
+            "0 <= x <= 1",
+            "x > 0 and x < 1 or x == 5",
+            "not x > 1",
+            "x % 2",
+            "x ** 2 > 4",
+            "-x / 4 >= 0.25",
+        ]:
+            fxn = generate_lambda(constraint)
+            for column in columns:
+                expected = [fxn(value) is not False for value in column.tolist()]
+                self.assertEqual(fxn.vectorized(column).tolist(), expected, constraint)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_generate_lambda_vectorized_large_ints(self):
+        columns = [
+            numpy.array([2 ** 62, 2 ** 53 + 1, 1, -1, -(2 ** 63), 2 ** 63 - 1]),
+            numpy.array([2 ** 64 - 1, 2 ** 63, 7], dtype=numpy.uint64),
+            numpy.array([100, -100, 127], dtype=numpy.int8),
+        ]
+        for constraint in [
+            "x * 1000 <= 1000000",
+            "x + 100000000000000000000 > 0",
+            "x - 1 < x",
+            "-x < 0",
+            "x // -1 > 0",
+            "x % 3 == 1",
+            "x / 3 > 1",
+            "x > 0.5",
+            "(x > 1) * 2 ** 2 == 4",
+        ]:
+            fxn = generate_lambda(constraint)
+            for column in columns:
+                expected = [fxn(value) is not False for value in column.tolist()]
+                self.assertEqual(fxn.vectorized(column).tolist(), expected, constraint)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_generate_lambda_vectorized_division_by_zero(self):
+        fxn = generate_lambda("1 / x > 0")
+        self.assertEqual(fxn.vectorized(numpy.array([1, 2])).tolist(), [True, True])
+        with self.assertRaises(ZeroDivisionError):
+            fxn.vectorized(numpy.array([1, 0]))
+
     def test_get_invalid_schema_from_registry(self):
         mock_stdout = StringIO()
         rootLogger = logging.getLogger()
@@ -126,6 +223,147 @@ class HelpersTestSuite(unittest.TestCase):
         self.assertEqual(cm.exception.code, 1)
         
 
+    @unittest.skipUnless("libyaml" in YAML_BACKENDS, "PyYAML built without libyaml")
+    def test_yaml_backends_identical(self):
+        all_documents = [
+            path.read_text(encoding="utf-8")
+            for path in Path("tests").glob("data/**/*.yaml")
+        ]
+        all_documents.append(SampleSubmissions.FULL_SUBMISSIONS.COMPONENT_KERAS)
+
+        previous_backend = get_yaml_backend()
+        try:
+            for document in all_documents:
+                set_yaml_backend("python")
+                python_dict = convert_yaml_to_dict(document)
+                python_dict["extra_uuid"] = uuid.uuid4()
+                python_yaml = convert_dict_to_yaml(python_dict)
+
+                set_yaml_backend("libyaml")
+                libyaml_dict = convert_yaml_to_dict(document)
+                libyaml_dict["extra_uuid"] = python_dict["extra_uuid"]
+                self.assertEqual(python_dict, libyaml_dict)
+                self.assertEqual(python_yaml, convert_dict_to_yaml(libyaml_dict))
+        finally:
+            set_yaml_backend(previous_backend)
+
+    def test_unknown_yaml_backend(self):
+        with self.assertRaises(ValueError):
+            set_yaml_backend("not_a_backend")
+
+    def test_json_skips_yaml_parser(self):
+        with patch.object(yaml, "load", side_effect=AssertionError):
+            self.assertEqual(
+                convert_yaml_to_dict('  {"a": [1, 2.5, null], "b": {"c": "d"}}'),
+                {"a": [1, 2.5, None], "b": {"c": "d"}},
+            )
+            self.assertEqual(convert_yaml_to_dict(b'{"a": true}'), {"a": True})
+
+        # Flow style yaml is not json, but still parses
+        self.assertEqual(
+            convert_yaml_to_dict("{a: b, c: [1, 2]}"), {"a": "b", "c": [1, 2]}
+        )
+
+        # Json that yaml reads differently loads as yaml would
+        for document in [
+            '{"a": 1e5, "b": 1.5E5, "c": 0.1e5}',
+            '{"a": [NaN, Infinity, -Infinity]}',
+            '{"a": 1.0e+5, "b": -2.5, "c": 1.5e-5, "d": 10}',
+        ]:
+            self.assertEqual(
+                convert_yaml_to_dict(document), yaml.safe_load(document), document
+            )
+        self.assertEqual(convert_yaml_to_dict('{"a": 1e5}'), {"a": "1e5"})
+
+    def test_boxes_and_mappings_serialize_without_converting(self):
+        document = {"a": {"b": [1, {"c": uuid.uuid4()}]}, "d": "e"}
+        boxed = Box(document)
+        previous_backend = get_yaml_backend()
+        try:
+            for backend in YAML_BACKENDS:
+                set_yaml_backend(backend)
+                self.assertEqual(
+                    convert_dict_to_yaml(boxed), convert_dict_to_yaml(document)
+                )
+                self.assertEqual(
+                    convert_dict_to_yaml(ReadOnlyMapping(document)),
+                    convert_dict_to_yaml(document),
+                )
+        finally:
+            set_yaml_backend(previous_backend)
+
+        document["a"]["b"][1]["c"] = "f"
+        self.assertEqual(to_json(ReadOnlyMapping(Box(document))), to_json(document))
+        with self.assertRaises(TypeError):
+            to_json({"a": object()})
+
+        view = ReadOnlyMapping(document)
+        self.assertIs(convert_yaml_to_dict(view), view)
+
+        # Only our dumpers know about boxes - yaml.safe_dump is left as it was
+        with self.assertRaises(yaml.representer.RepresenterError):
+            yaml.safe_dump(boxed)
+
+    def test_raw_content_codecs_round_trip(self):
+        MLSchema.populate_registry()
+        legacy_size = encoded_size = 0
+        for path in sorted(Path("tests").glob("data/**/*.yaml")):
+            ml_object, errors = MLObject.create_object_from_file(path)
+            contents = ml_object.dict_without_internal_variables()
+            # raw_content written before the codec header
+            legacy = base64.urlsafe_b64encode(convert_dict_to_yaml(contents).encode("utf-8")).decode("utf-8")
+            self.assertEqual(encode_raw_object_for_db(ml_object, codec="yaml"), legacy)
+            self.assertEqual(decode_raw_object_from_db(legacy), contents)
+
+            for compression in ["none", "zlib", "lzma"]:
+                with patch("mlspeclib.helpers.RAW_CONTENT_COMPRESSION_THRESHOLD", 0):
+                    raw_content = encode_raw_object_for_db(ml_object, compression=compression)
+                self.assertTrue(base64.urlsafe_b64decode(raw_content).startswith(b"MLSP\x01"))
+                decoded = decode_raw_object_from_db(raw_content)
+                self.assertEqual(decoded, contents)
+                loaded_object, loaded_errors = MLObject.create_object_from_string(decoded)
+                self.assertEqual(loaded_errors, errors)
+                self.assertEqual(loaded_object.to_yaml(), ml_object.to_yaml())
+
+            legacy_size += len(legacy)
+            encoded_size += len(encode_raw_object_for_db(ml_object))
+
+        self.assertLess(encoded_size, legacy_size * 0.75)
+
+    def test_raw_content_native_types(self):
+        MLSchema.populate_registry()
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        ml_object.run_id = uuid.uuid4()
+        ml_object["extra"] = {
+            "day": datetime.date(2020, 1, 2),
+            "when": datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            "items": [1, 2.5, None, b"bytes"],
+        }
+        decoded = decode_raw_object_from_db(encode_raw_object_for_db(ml_object))
+        self.assertEqual(decoded, ml_object.dict_without_internal_variables())
+        self.assertIsInstance(decoded["run_id"], uuid.UUID)
+        self.assertIsInstance(decoded["run_date"], datetime.datetime)
+        self.assertEqual(decoded["extra"]["when"].tzinfo, datetime.timezone.utc)
+
+        # Too big for msgpack - written as yaml
+        ml_object["extra"]["items"] = [2 ** 70]
+        raw_content = encode_raw_object_for_db(ml_object)
+        self.assertFalse(base64.urlsafe_b64decode(raw_content).startswith(b"MLSP"))
+        self.assertEqual(decode_raw_object_from_db(raw_content)["extra"]["items"], [2 ** 70])
+
+        with self.assertRaises(ValueError):
+            encode_raw_object_for_db(ml_object, codec="pickle")
+        with self.assertRaises(ValueError):
+            encode_raw_object_for_db(ml_object, compression="bz2")
+        with self.assertRaises(ValueError):
+            decode_raw_object_from_db(base64.urlsafe_b64encode(b"MLSP\x02\x00").decode("utf-8"))
+
+        # Legacy yaml that happens to start with the magic is still read as yaml
+        for legacy_contents in [{"MLSPEC": 1, "name": "legacy"}, {"MLSP": {"version": 2}}]:
+            legacy = base64.urlsafe_b64encode(convert_dict_to_yaml(legacy_contents).encode("utf-8")).decode("utf-8")
+            self.assertTrue(base64.urlsafe_b64decode(legacy).startswith(b"MLSP"))
+            self.assertEqual(decode_raw_object_from_db(legacy), legacy_contents)
+
 
 if __name__ == "__main__":
     unittest.main()
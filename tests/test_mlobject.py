@@ -2,17 +2,26 @@
 # pylint: disable=missing-module-docstring, missing-class-docstring, invalid-name
 # -*- coding: utf-8 -*-
 import unittest
+from unittest.mock import patch
 
 import re
 
 from pathlib import Path
 
+from tests.sample_schemas import SampleSchema
 from tests.sample_submissions import SampleSubmissions
+from tests.test_mlschemacompiler import COMPILER_SCHEMA, VALID_DOCUMENT
 
 from mlspeclib.mlschemaenums import MLSchemaTypes
 from mlspeclib.mlobject import MLObject
 from mlspeclib.mlschema import MLSchema
+from mlspeclib.helpers import (
+    convert_yaml_to_dict,
+    to_json as helpers_to_json,
+    to_yaml as helpers_to_yaml,
+)
 
+import marshmallow.class_registry
 from marshmallow.class_registry import RegistryError
 
 
@@ -123,6 +132,148 @@ connection:
         hints_re = re.compile(r"^# prefix.", flags=re.MULTILINE | re.DOTALL)
         self.assertTrue(len(hints_re.findall(code_gen_string)) == 0)
 
+    def test_stub_prototype_is_shared_but_not_aliased(self):
+        first = MLObject()
+        first.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+        second = MLObject()
+        second.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+
+        self.assertIs(first.get_schema(), second.get_schema())
+        self.assertIsInstance(first.connection, MLObject)
+        self.assertIsNot(first.connection, second.connection)
+
+        first.connection.endpoint = "http://example.com"
+        first.data_store = "store"
+        self.assertIsNone(second.connection.endpoint)
+        self.assertIsNone(second.data_store)
+
+        third = MLObject()
+        third.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+        self.assertIsNone(third.connection.endpoint)
+        self.assertEqual(
+            third.dict_without_internal_variables(),
+            second.dict_without_internal_variables(),
+        )
+
+    def test_stub_prototype_follows_registry(self):
+        MLSchema.populate_registry()
+        ml_object = MLObject()
+        ml_object.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+        schema = ml_object.get_schema()
+
+        marshmallow.class_registry._registry["0_0_1_datapath"] = [
+            MLSchema.create_schema_type(SampleSchema.SCHEMAS.DATAPATH)
+        ]
+        try:
+            ml_object = MLObject()
+            ml_object.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+            self.assertIsNot(ml_object.get_schema(), schema)
+        finally:
+            marshmallow.class_registry._registry["0_0_1_datapath"] = [type(schema)]
+
+    def test_set_type_merges_into_existing_content(self):
+        ml_object = MLObject()
+        ml_object.connection = {"extra": "kept"}
+        ml_object.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+
+        self.assertEqual(ml_object.connection.extra, "kept")
+        self.assertIn("endpoint", ml_object.connection)
+
+    def test_validate_only_changed_fields(self):
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        schema = ml_object.get_schema()
+
+        def full_validation():
+            return type(schema)().validate(ml_object.dict_without_internal_variables())
+
+        with patch.object(schema, "validate", wraps=schema.validate) as schema_validate:
+            self.assertEqual(ml_object.validate(), {})
+            ml_object.run_id = "not a uuid"
+            self.assertEqual(ml_object.validate(), full_validation())
+            ml_object.connection.endpoint = "not a uri"
+            self.assertIn("endpoint", ml_object.validate()["connection"])
+            self.assertEqual(ml_object.validate(), full_validation())
+
+            # Still invalid until both are fixed
+            ml_object.run_id = "6a9a5931-1c1d-47cc-aaf3-ad8b03f70575"
+            self.assertEqual(ml_object.validate(), full_validation())
+            ml_object.connection = {"endpoint": "S3://mybucket/puppy.jpg"}
+            self.assertEqual(ml_object.validate(), {})
+
+            del ml_object["run_id"]
+            ml_object.update({"surprise": 1})
+            self.assertEqual(ml_object.validate(), full_validation())
+            self.assertEqual(schema_validate.call_count, 0)
+
+        ml_object.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+        with patch.object(schema, "validate", wraps=schema.validate) as schema_validate:
+            ml_object.validate()
+            self.assertEqual(schema_validate.call_count, 1)
+
+    def test_validate_lists_and_dicts_changed_in_place(self):
+        MLSchema.create_schema_type(COMPILER_SCHEMA)
+        ml_object, errors = MLObject.create_object_from_string(VALID_DOCUMENT)
+        self.assertEqual(errors, {})
+
+        ml_object.labels.append(5)
+        self.assertIn("labels", ml_object.validate())
+        ml_object.labels.pop()
+        self.assertEqual(ml_object.validate(), {})
+
+        ml_object.extra.a = {"b": [1]}
+        self.assertEqual(ml_object.validate(), {})
+        ml_object.extra.a.b.append(object())
+        self.assertEqual(
+            ml_object.validate(),
+            ml_object.get_schema().validate(ml_object.dict_without_internal_variables()),
+        )
+
+    def test_view_without_internal_variables(self):
+        ml_object, _ = MLObject.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        view = ml_object.view_without_internal_variables()
+        as_dict = ml_object.dict_without_internal_variables()
+
+        self.assertEqual(dict(view), as_dict)
+        self.assertEqual(list(view), list(as_dict))
+        self.assertEqual(len(view), len(as_dict))
+        self.assertNotIn("_MLObject__schema", view)
+        with self.assertRaises(KeyError):
+            view["_MLObject__schema"]  # pylint: disable=pointless-statement
+        with self.assertRaises(TypeError):
+            view["data_store"] = "read only"
+
+        # Nothing is copied
+        self.assertIs(view["connection"], ml_object.connection)
+        ml_object.data_store = "changed"
+        self.assertEqual(view["data_store"], "changed")
+
+        as_dict = ml_object.dict_without_internal_variables()
+        self.assertEqual(ml_object.to_yaml(), helpers_to_yaml(as_dict))
+        as_dict["run_date"] = str(as_dict["run_date"])
+        ml_object.run_date = as_dict["run_date"]
+        self.assertEqual(ml_object.to_json(), helpers_to_json(as_dict))
+        self.assertEqual(ml_object.get_schema().validate(view), {})
+
+    def test_trusted_object_same_as_validated(self):
+        for submission_path in sorted(Path("tests/data").glob("**/*.yaml")):
+            contents = submission_path.read_text()
+            ml_object, errors = MLObject.create_object_from_string(contents)
+            self.assertEqual(errors, {})
+
+            trusted_object = MLObject.create_trusted_object(
+                convert_yaml_to_dict(contents)
+            )
+            self.assertEqual(trusted_object.to_dict(), ml_object.to_dict())
+            self.assertIs(trusted_object.get_schema(), ml_object.get_schema())
+            self.assertEqual(trusted_object.get_schema_name(), ml_object.get_schema_name())
+            self.assertEqual(trusted_object.validate(), {})
+
+        trusted_object = MLObject.create_trusted_object(
+            {"schema_version": "0.0.1", "schema_type": "datapath", "connection": {}}
+        )
+        self.assertIsInstance(trusted_object.connection, MLObject)
+        self.assertIn("endpoint", trusted_object.connection)
+
 
 if __name__ == "__main__":
     unittest.main()
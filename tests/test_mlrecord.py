@@ -0,0 +1,104 @@
+# pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
+# -*- coding: utf-8 -*-
+import pickle
+import sys
+import unittest
+from pathlib import Path
+
+import marshmallow.class_registry
+
+from mlspeclib.mlobject import MLObject
+from mlspeclib.mlrecord import MLRecord
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemaenums import MLSchemaTypes
+from tests.sample_schemas import SampleSchema
+
+
+def outcome(function):
+    try:
+        return function()
+    except Exception as error:  # pylint: disable=broad-except
+        return type(error)
+
+
+class MLRecordTestSuite(unittest.TestCase):
+    """MLRecord test cases."""
+
+    def setUp(self):
+        MLSchema.populate_registry()
+
+    def test_same_as_mlobject_for_sample_data(self):
+        for submission_path in sorted(Path("tests/data").glob("**/*.yaml")):
+            record, record_errors = MLRecord.create_object_from_file(submission_path)
+            ml_object, errors = MLObject.create_object_from_file(submission_path)
+
+            self.assertEqual(record_errors, errors)
+            self.assertIsNotNone(record, submission_path)
+            self.assertEqual(
+                record.to_dict(), ml_object.dict_without_internal_variables()
+            )
+            self.assertEqual(record.validate(), {})
+            self.assertEqual(record.to_yaml(), ml_object.to_yaml())
+            self.assertEqual(outcome(record.to_json), outcome(ml_object.to_json))
+
+    def test_stub(self):
+        record = MLRecord.create_stub("0.0.1", MLSchemaTypes.DATAPATH)
+        ml_object = MLObject()
+        ml_object.set_type("0.0.1", MLSchemaTypes.DATAPATH)
+
+        self.assertEqual(record.to_dict(), ml_object.dict_without_internal_variables())
+        self.assertEqual(record.validate(), ml_object.validate())
+        self.assertIsInstance(record.connection, MLRecord)
+        self.assertEqual(record.get_schema_name(), "0_0_1_datapath")
+
+    def test_attribute_access(self):
+        record, _ = MLRecord.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        self.assertEqual(record.connection.endpoint, "S3://mybucket/puppy.jpg")
+        self.assertEqual(record["connection"]["endpoint"], record.connection.endpoint)
+
+        record.connection.endpoint = "not a uri"
+        self.assertIn("endpoint", record.validate()["connection"])
+
+        with self.assertRaises(AttributeError):
+            record.not_a_field = 1
+        with self.assertRaises(KeyError):
+            record["not_a_field"] = 1
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_field_names_that_are_not_attributes(self):
+        record = MLRecord.create_stub("0.0.1", "package_run")
+        self.assertIn("agent-pool", record)
+        record["agent-pool"] = "pool"
+        self.assertEqual(record.to_dict()["agent-pool"], "pool")
+
+    def test_smaller_than_mlobject(self):
+        path = "tests/data/0/0/1/datapath.yaml"
+        record, _ = MLRecord.create_object_from_file(path)
+        ml_object, _ = MLObject.create_object_from_file(path)
+        self.assertLess(
+            sys.getsizeof(record) + sys.getsizeof(record.connection),
+            sys.getsizeof(ml_object) + sys.getsizeof(ml_object.connection),
+        )
+
+    def test_pickle(self):
+        record, _ = MLRecord.create_object_from_file("tests/data/0/0/1/datapath.yaml")
+        copied = pickle.loads(pickle.dumps(record))
+        self.assertEqual(copied, record)
+        self.assertIs(type(copied), type(record))
+
+    def test_class_follows_registry(self):
+        record_type = MLRecord.type_for("0.0.1", "datapath")
+        self.assertIs(MLRecord.type_for("0.0.1", "datapath"), record_type)
+
+        schema_class = marshmallow.class_registry.get_class("0_0_1_datapath")
+        marshmallow.class_registry._registry["0_0_1_datapath"] = [
+            MLSchema.create_schema_type(SampleSchema.SCHEMAS.DATAPATH)
+        ]
+        try:
+            self.assertIsNot(MLRecord.type_for("0.0.1", "datapath"), record_type)
+        finally:
+            marshmallow.class_registry._registry["0_0_1_datapath"] = [schema_class]
+
+
+if __name__ == "__main__":
+    unittest.main()
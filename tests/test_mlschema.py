@@ -1,16 +1,24 @@
 # pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
 # -*- coding: utf-8 -*-
+import os
+import tempfile
 import unittest
+from pathlib import Path
+from types import MappingProxyType
+from unittest.mock import patch
 from uuid import UUID
 
+import yaml
 from yaml.scanner import ScannerError
 
 import marshmallow
-from marshmallow import fields, Schema, ValidationError
+from marshmallow import fields, Schema, validate, ValidationError
 from marshmallow.class_registry import RegistryError
 
 from mlspeclib.mlschema import MLSchema
-from mlspeclib.helpers import convert_yaml_to_dict
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
+from mlspeclib.mlschemaregistry import MLSchemaRegistry
+from mlspeclib.helpers import convert_yaml_to_dict, schema_in_registry
 from tests.sample_schemas import SampleSchema
 from tests.sample_submissions import SampleSubmissions
 
@@ -228,6 +236,47 @@ class MLSchemaTestSuite(unittest.TestCase):
             datapath_object["run_id"] == UUID(datapath_object_dict["run_id"])
         )
 
+    def test_multiple_levels_of_inheritance(self):
+        level_names = ["level_a", "level_b", "level_c", "level_d"]
+        for index, level_name in enumerate(level_names):
+            base_block = ""
+            if index > 0:
+                base_block = f"""
+                mlspec_base_type:
+                    meta: {level_names[index - 1]}"""
+            MLSchema.create_schema_type(
+                f"""
+                mlspec_schema_version:
+                    meta: 9.9.6
+                mlspec_schema_type:
+                    meta: {level_name}{base_block}
+                shared_field:
+                    type: string
+                    required: {index == 0}
+                {level_name}_field:
+                    type: int
+                """
+            )
+
+        leaf_schema = marshmallow.class_registry.get_class("9_9_6_level_d")
+        self.assertIsInstance(leaf_schema.merged_fields, MappingProxyType)
+        self.assertEqual(
+            list(leaf_schema.merged_fields),
+            ["shared_field", "level_d_field", "level_c_field"]
+            + ["level_b_field", "level_a_field"],
+        )
+        # The base's definition of a field wins, at any depth
+        self.assertTrue(leaf_schema.merged_fields["shared_field"].required)
+        self.assertIn("shared_field", leaf_schema().validate({"level_a_field": 1}))
+        self.assertIn("level_a_field", leaf_schema().validate({"level_a_field": "a"}))
+
+    def test_base_schema_not_instantiated_when_inherited(self):
+        MLSchema.create_schema_type(SampleSchema.SCHEMAS.BASE)
+        with patch.object(Schema, "__init__", side_effect=AssertionError):
+            datapath_schema = MLSchema.create_schema_type(SampleSchema.SCHEMAS.DATAPATH)
+        self.assertIn("run_id", datapath_schema.merged_fields)
+        self.assertIn("data_store", datapath_schema.merged_fields)
+
     # pylint: disable=line-too-long
     def test_return_schema_name(self):
         with self.assertRaises(KeyError):
@@ -266,6 +315,367 @@ class MLSchemaTestSuite(unittest.TestCase):
             "xxxxx_yyyyy",
         )
 
+    def test_populate_registry_only_scans_once(self):
+        MLSchema.populate_registry()
+        with patch.object(MLSchemaRegistry, "schema_files") as mock_schema_files:
+            MLSchema.populate_registry()
+            MLSchema.populate_registry()
+        mock_schema_files.assert_not_called()
+
+    def test_populate_registry_reloads_missing_schemas(self):
+        MLSchema.populate_registry()
+        marshmallow.class_registry._registry.pop("0_0_1_base")
+        self.assertFalse(MLSchemaRegistry.is_loaded(MLSchema.default_schema_root()))
+
+        MLSchema.populate_registry()
+        self.assertTrue(schema_in_registry("0_0_1_base"))
+
+    def test_is_loaded_only_checks_names_after_a_removal(self):
+        load_root = MLSchema.default_schema_root()
+        MLSchema.populate_registry()
+        self.assertTrue(MLSchemaRegistry.is_loaded(load_root))
+
+        # Nothing removed since the tree was found complete, so its names aren't checked
+        tree = MLSchemaRegistry.get_tree(load_root)
+        schema_names, tree.schema_names = tree.schema_names, None
+        self.assertTrue(MLSchemaRegistry.is_loaded(load_root))
+        # Adding schemas doesn't matter either
+        type("AddedSchema", (Schema,), {})
+        self.assertTrue(MLSchemaRegistry.is_loaded(load_root))
+        tree.schema_names = schema_names
+
+        del marshmallow.class_registry._registry["0_0_1_datapath"]
+        self.assertFalse(MLSchemaRegistry.is_loaded(load_root))
+        marshmallow.class_registry._registry = dict(marshmallow.class_registry._registry)
+        MLSchema.populate_registry()
+        self.assertTrue(schema_in_registry("0_0_1_datapath"))
+        self.assertTrue(MLSchemaRegistry.is_loaded(load_root))
+
+    def test_refresh_registry_unchanged(self):
+        MLSchema.populate_registry()
+        self.assertFalse(MLSchema.refresh_registry())
+        self.assertTrue(schema_in_registry("0_0_1_datapath"))
+
+    def test_fingerprint_tree_detects_changes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            schema_file = Path(temp_dir) / "base.yaml"
+            schema_file.write_text(SampleSchema.SCHEMAS.BASE)
+            first = MLSchemaRegistry.fingerprint_tree(temp_dir)
+            self.assertEqual(len(first), 1)
+
+            # Rewriting identical content is not a change
+            schema_file.write_text(SampleSchema.SCHEMAS.BASE)
+            second = MLSchemaRegistry.fingerprint_tree(temp_dir, first)
+            self.assertFalse(MLSchemaRegistry.fingerprint_changed(first, second))
+
+            schema_file.write_text(SampleSchema.SCHEMAS.BASE + "\n# edited\n")
+            third = MLSchemaRegistry.fingerprint_tree(temp_dir, second)
+            self.assertTrue(MLSchemaRegistry.fingerprint_changed(second, third))
+
+            (Path(temp_dir) / "datapath.yaml").write_text(SampleSchema.SCHEMAS.DATAPATH)
+            fourth = MLSchemaRegistry.fingerprint_tree(temp_dir, third)
+            self.assertTrue(MLSchemaRegistry.fingerprint_changed(third, fourth))
+
+    def test_schema_cache_skips_yaml_parsing(self):
+        with tempfile.TemporaryDirectory() as cache_dir, patch.dict(
+            os.environ, {MLSchemaRegistry.CACHE_DIR_ENV: cache_dir}
+        ):
+            MLSchemaRegistry.forget(MLSchema.default_schema_root(), unregister=True)
+            MLSchema.populate_registry()
+            self.assertEqual(len(list(Path(cache_dir).glob("schemas-*.json"))), 1)
+
+            MLSchemaRegistry.forget(MLSchema.default_schema_root(), unregister=True)
+            self.assertFalse(schema_in_registry("0_0_1_datapath"))
+            with patch.object(yaml, "load", side_effect=AssertionError):
+                MLSchema.populate_registry()
+            self.assertTrue(schema_in_registry("0_0_1_datapath"))
+
+    def test_schema_cache_invalidated_by_changes(self):
+        with tempfile.TemporaryDirectory() as cache_dir, patch.dict(
+            os.environ, {MLSchemaRegistry.CACHE_DIR_ENV: cache_dir}
+        ):
+            schema_root = Path(cache_dir) / "schemas"
+            schema_root.mkdir()
+            (schema_root / "base.yaml").write_text(SampleSchema.SCHEMAS.BASE)
+            fingerprint = MLSchemaRegistry.fingerprint_tree(schema_root)
+            key = MLSchemaRegistry.cache_key(fingerprint)
+            schemas = [convert_yaml_to_dict(SampleSchema.SCHEMAS.BASE)]
+
+            self.assertTrue(MLSchemaRegistry.write_cache(schema_root, key, schemas))
+            self.assertEqual(MLSchemaRegistry.read_cache(schema_root, key), schemas)
+
+            (schema_root / "base.yaml").write_text(SampleSchema.SCHEMAS.DATAPATH)
+            new_key = MLSchemaRegistry.cache_key(
+                MLSchemaRegistry.fingerprint_tree(schema_root, fingerprint)
+            )
+            self.assertNotEqual(key, new_key)
+            self.assertIsNone(MLSchemaRegistry.read_cache(schema_root, new_key))
+
+    def test_schema_cache_disabled(self):
+        with patch.dict(os.environ, {MLSchemaRegistry.CACHE_DIR_ENV: ""}):
+            self.assertIsNone(MLSchemaRegistry.cache_dir())
+            self.assertFalse(MLSchemaRegistry.write_cache(Path("."), "key", []))
+
+    def test_read_schema_header(self):
+        header = MLSchemaRegistry.read_schema_header(
+            Path("mlspeclib/schemas/0/0/1/datapath.yaml").read_text("utf-8")
+        )
+        self.assertEqual(
+            set(header.keys()),
+            {"mlspec_schema_version", "mlspec_schema_type", "mlspec_base_type"},
+        )
+        self.assertEqual(header["mlspec_schema_type"]["meta"], "datapath")
+        self.assertEqual(header["mlspec_base_type"]["meta"], "base")
+
+    def test_lazy_registry_compiles_on_demand(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_schema_chain(Path(temp_dir))
+            self.assertTrue(MLSchema.append_schema_to_registry(temp_dir, lazy=True))
+
+            for name in ["lazy_base", "lazy_middle", "lazy_leaf", "lazy_unused"]:
+                self.assertNotIn(f"9_9_9_{name}", marshmallow.class_registry._registry)
+
+            leaf_schema = MLSchema.load_schema_from_registry(
+                {"schema_version": "9.9.9", "schema_type": "lazy_leaf"}
+            )
+            self.assertEqual(
+                set(leaf_schema().fields.keys()),
+                {
+                    "schema_version",
+                    "schema_type",
+                    "base_field",
+                    "middle_field",
+                    "leaf_field",
+                },
+            )
+
+            # The base chain is compiled, nothing else is
+            self.assertIn("9_9_9_lazy_base", marshmallow.class_registry._registry)
+            self.assertIn("9_9_9_lazy_middle", marshmallow.class_registry._registry)
+            self.assertNotIn("9_9_9_lazy_unused", marshmallow.class_registry._registry)
+            self.assertTrue(schema_in_registry("9_9_9_lazy_unused"))
+            self.assertFalse(schema_in_registry("9_9_9_lazy_missing"))
+
+            MLSchemaRegistry.forget(temp_dir, unregister=True)
+            self.assertFalse(schema_in_registry("9_9_9_lazy_leaf"))
+
+    def test_dependency_waves_orders_inheritance_chain(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_schema_chain(Path(temp_dir))
+            schema_dicts = [
+                convert_yaml_to_dict(schema_file.read_text())
+                for schema_file in sorted(Path(temp_dir).glob("*.yaml"), reverse=True)
+            ]
+
+        waves = MLSchemaRegistry.dependency_waves(schema_dicts)
+        wave_types = [
+            sorted(schema_dict["mlspec_schema_type"]["meta"] for schema_dict in wave)
+            for wave in waves
+        ]
+        self.assertEqual(
+            wave_types, [["lazy_base", "lazy_unused"], ["lazy_middle"], ["lazy_leaf"]]
+        )
+
+    def test_dependency_waves_detects_cycles(self):
+        schema_dicts = [
+            {
+                "mlspec_schema_version": {"meta": "9.9.9"},
+                "mlspec_schema_type": {"meta": "cycle_a"},
+                "mlspec_base_type": {"meta": "cycle_b"},
+            },
+            {
+                "mlspec_schema_version": {"meta": "9.9.9"},
+                "mlspec_schema_type": {"meta": "cycle_b"},
+                "mlspec_base_type": {"meta": "cycle_a"},
+            },
+        ]
+        with self.assertRaises(ValueError) as context:
+            MLSchemaRegistry.dependency_waves(schema_dicts)
+        self.assertTrue("9_9_9_cycle_a" in str(context.exception))
+
+    def test_append_schemas_parsed_in_process_pool(self):
+        with tempfile.TemporaryDirectory() as temp_dir, patch.object(
+            MLSchemaRegistry, "PARALLEL_PARSE_THRESHOLD", 0
+        ):
+            write_schema_chain(Path(temp_dir))
+            self.assertTrue(MLSchema.append_schema_to_registry(temp_dir, workers=2))
+
+        leaf_schema = marshmallow.class_registry.get_class("9_9_9_lazy_leaf")
+        self.assertIn("base_field", leaf_schema().fields)
+        self.assertIn("middle_field", leaf_schema().fields)
+
+    def test_validate_batch(self):
+        MLSchema.populate_registry()
+        datapath_text = Path("tests/data/0/0/1/datapath.yaml").read_text("utf-8")
+        train_results_dict = convert_yaml_to_dict(
+            Path("tests/data/0/0/1/train_results.yaml").read_text("utf-8")
+        )
+        invalid_train_results = dict(train_results_dict)
+        invalid_train_results.pop("run_id")
+        invalid_train_results["accuracy"] = "not a float"
+
+        documents = [
+            datapath_text,
+            train_results_dict,
+            invalid_train_results,
+            SampleSchema.TEST.INVALID_YAML,
+            {"schema_version": "0.0.1", "schema_type": "not_a_schema"},
+            {"no_schema": True},
+            train_results_dict,
+        ]
+
+        results = list(MLSchema.validate_batch(iter(documents)))
+
+        self.assertEqual([result[0] for result in results], list(range(len(documents))))
+        self.assertEqual(results[0][1:], ("0_0_1_datapath", {}))
+        self.assertEqual(results[1][1:], ("0_0_1_train_results", {}))
+        self.assertEqual(results[6][1:], ("0_0_1_train_results", {}))
+
+        train_results_schema = marshmallow.class_registry.get_class(
+            "0_0_1_train_results"
+        )()
+        self.assertEqual(results[2][1], "0_0_1_train_results")
+        self.assertEqual(
+            results[2][2], train_results_schema.validate(invalid_train_results)
+        )
+        self.assertIn("run_id", results[2][2])
+        self.assertIn("accuracy", results[2][2])
+
+        self.assertIsNone(results[3][1])
+        self.assertIn("_schema", results[3][2])
+        self.assertEqual(results[4][1], "0_0_1_not_a_schema")
+        self.assertIn("_schema", results[4][2])
+        self.assertIn("_schema", results[5][2])
+
+    def test_identical_field_specs_share_a_field(self):
+        first = MLSchema._field_method_from_dict(
+            "first", {"type": "string", "required": True}
+        )
+        second = MLSchema._field_method_from_dict(
+            "second", {"type": "String", "required": True}
+        )
+        self.assertIs(first, second)
+        self.assertIsNot(
+            first, MLSchema._field_method_from_dict("third", {"type": "string"})
+        )
+
+        # The regex error message names the field, so those are not shared
+        regex_spec = {"type": "string", "regex": "[a-z]+"}
+        self.assertIsNot(
+            MLSchema._field_method_from_dict("first", regex_spec),
+            MLSchema._field_method_from_dict("second", regex_spec),
+        )
+
+    def test_shared_fields_bound_separately(self):
+        schema = MLSchema.create_schema(
+            """
+            mlspec_schema_version:
+                meta: 9.9.7
+            mlspec_schema_type:
+                meta: shared_fields
+            first_name:
+                type: string
+            last_name:
+                type: string
+            """
+        )
+        self.assertIsNot(schema.fields["first_name"], schema.fields["last_name"])
+        self.assertEqual(schema.fields["last_name"].name, "last_name")
+        self.assertEqual(
+            schema.validate({"first_name": 1, "last_name": "a"}),
+            {"first_name": ["Not a valid string."]},
+        )
+
+    def test_identical_nested_schemas_share_a_class(self):
+        nested_template = """
+            mlspec_schema_version:
+                meta: 9.9.6
+            mlspec_schema_type:
+                meta: {schema_type}
+            location:
+                type: nested
+                schema:
+                    bucket:
+                        type: bucket
+                        required: True
+                    credentials:
+                        type: nested
+                        schema:
+                            key_id:
+                                type: string
+                                regex: '^[A-Z]+$'
+            """
+        first = MLSchema.create_schema_type(
+            nested_template.format(schema_type="first_nested")
+        )
+        second = MLSchema.create_schema_type(
+            nested_template.format(schema_type="second_nested")
+        )
+        different = MLSchema.create_schema_type(
+            """
+            mlspec_schema_version:
+                meta: 9.9.6
+            mlspec_schema_type:
+                meta: different_nested
+            location:
+                type: nested
+                schema:
+                    bucket:
+                        type: string
+            """
+        )
+
+        shared_type = first._declared_fields["location"].nested
+        self.assertIs(second._declared_fields["location"].nested, shared_type)
+        self.assertIsNot(different._declared_fields["location"].nested, shared_type)
+
+        # Every name still resolves, including nested schemas of the shared class
+        get_class = marshmallow.class_registry.get_class
+        self.assertIs(get_class("9_9_6_first_nested_location"), shared_type)
+        self.assertIs(get_class("9_9_6_second_nested_location"), shared_type)
+        self.assertIs(
+            get_class("9_9_6_second_nested_location_credentials"),
+            get_class("9_9_6_first_nested_location_credentials"),
+        )
+
+        # Unregistering the first owner doesn't break the second
+        for schema_name in list(marshmallow.class_registry._registry):
+            if schema_name.startswith("9_9_6_first_nested"):
+                del marshmallow.class_registry._registry[schema_name]
+        self.assertTrue(MLSchemaCompiler.is_compilable(shared_type()))
+
+        errors = second().validate(
+            {"location": {"bucket": "my-bucket", "credentials": {"key_id": "abc"}}}
+        )
+        self.assertEqual(
+            errors,
+            {"location": {"credentials": {"key_id": ["No match for in field: key_id"]}}},
+        )
+
+    def test_register_field_type(self):
+        MLSchema.register_field_type(
+            "Port", lambda: fields.Int(validate=validate.Range(1, 65535))
+        )
+        try:
+            schema = MLSchema.create_schema(
+                """
+                mlspec_schema_version:
+                    meta: 9.9.7
+                mlspec_schema_type:
+                    meta: custom_field
+                port:
+                    type: port
+                    required: True
+                """
+            )
+            self.assertEqual(schema.validate({"port": 80}), {})
+            self.assertIn("port", schema.validate({"port": 0}))
+        finally:
+            MLSchema.FIELD_FACTORIES.pop("port")
+
+        with self.assertRaises(AttributeError):
+            MLSchema._field_method_from_dict("port", {"type": "port"})
+
 
 def return_base_schema_and_submission():
     instantiated_schema = MLSchema.create_schema(SampleSchema.SCHEMAS.BASE)
@@ -273,5 +683,40 @@ def return_base_schema_and_submission():
     return instantiated_schema, yaml_submission
 
 
+def write_schema_chain(schema_root: Path):
+    """Writes lazy_base <- lazy_middle <- lazy_leaf, plus an unrelated schema."""
+    for schema_type, base_type in [
+        ("lazy_base", None),
+        ("lazy_middle", "lazy_base"),
+        ("lazy_leaf", "lazy_middle"),
+        ("lazy_unused", None),
+    ]:
+        base_block = ""
+        if base_type is not None:
+            base_block = f"""
+mlspec_base_type:
+  meta: {base_type}
+"""
+        field_name = schema_type.split("_")[1] + "_field"
+        (schema_root / f"{schema_type}.yaml").write_text(f"""
+mlspec_schema_version:
+  meta: 9.9.9
+{base_block}
+mlspec_schema_type:
+  meta: {schema_type}
+
+schema_version:
+  type: semver
+  required: True
+
+schema_type:
+  type: allowed_schema_types
+  required: True
+
+{field_name}:
+  type: string
+""")
+
+
 if __name__ == "__main__":
     unittest.main()
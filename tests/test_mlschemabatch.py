@@ -0,0 +1,86 @@
+# pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
+# -*- coding: utf-8 -*-
+import tempfile
+import unittest
+from pathlib import Path
+
+import marshmallow.class_registry
+
+from mlspeclib.helpers import convert_yaml_to_dict, schema_in_registry
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemabatch import MLSchemaBatchValidator, _initialize_worker
+from mlspeclib.mlschemaregistry import MLSchemaRegistry
+from tests.test_mlschema import write_schema_chain
+
+
+class MLSchemaBatchTestSuite(unittest.TestCase):
+    """MLSchemaBatchValidator test cases."""
+
+    default_registry = None
+
+    def setUp(self):
+        if MLSchemaBatchTestSuite.default_registry is None:
+            MLSchemaBatchTestSuite.default_registry = (
+                marshmallow.class_registry._registry.copy()
+            )
+        else:
+            marshmallow.class_registry._registry = (
+                MLSchemaBatchTestSuite.default_registry.copy()
+            )
+
+    def test_validate_in_input_order(self):
+        MLSchema.populate_registry()
+        train_results = convert_yaml_to_dict(
+            Path("tests/data/0/0/1/train_results.yaml").read_text("utf-8")
+        )
+        documents = []
+        for i in range(25):
+            document = dict(train_results)
+            document["global_step"] = i if i % 4 else "not an int"
+            documents.append(document)
+        documents.append(Path("tests/data/0/0/1/datapath.yaml").read_text("utf-8"))
+
+        with MLSchemaBatchValidator(workers=2, chunk_size=3) as validator:
+            results = list(validator.validate(documents))
+
+        self.assertEqual(results, list(MLSchema.validate_batch(documents)))
+        self.assertEqual([result[0] for result in results], list(range(26)))
+        self.assertIn("global_step", results[0][2])
+        self.assertEqual(results[1][2], {})
+        self.assertEqual(results[25][1], "0_0_1_datapath")
+
+    def test_validate_files(self):
+        file_paths = sorted(Path("tests").glob("data/**/*.yaml"))
+        file_paths.insert(1, Path("tests/data/does_not_exist.yaml"))
+
+        with MLSchemaBatchValidator(workers=2, chunk_size=4) as validator:
+            results = list(validator.validate_files(file_paths))
+
+        self.assertEqual(len(results), len(file_paths))
+        self.assertIn("Could not read file", results[1][2]["_schema"][0])
+        self.assertTrue(all(errors == {} for index, _, errors in results if index != 1))
+
+    def test_workers_warmed_with_appended_schemas(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_schema_chain(Path(temp_dir))
+            MLSchema.append_schema_to_registry(temp_dir)
+            document = {
+                "schema_version": "9.9.9",
+                "schema_type": "lazy_leaf",
+                "leaf_field": "a",
+            }
+
+            with MLSchemaBatchValidator(workers=1, start_method="spawn") as validator:
+                results = list(validator.validate([document]))
+            self.assertEqual(results, [(0, "9_9_9_lazy_leaf", {})])
+
+            # What a spawned worker does on start up
+            MLSchemaRegistry.forget(temp_dir, unregister=True)
+            self.assertFalse(schema_in_registry("9_9_9_lazy_leaf"))
+            _initialize_worker([(str(Path(temp_dir).absolute()), False)])
+            self.assertTrue(schema_in_registry("9_9_9_lazy_leaf"))
+            MLSchemaRegistry.forget(temp_dir, unregister=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
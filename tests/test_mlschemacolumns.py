@@ -0,0 +1,254 @@
+# pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
+# -*- coding: utf-8 -*-
+import datetime
+import unittest
+from unittest.mock import patch
+
+import marshmallow.class_registry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mlspeclib.mlobject import MLObject
+from mlspeclib.mlrecord import MLRecord
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemacolumns import MLSchemaColumns
+from tests.test_mlschemacompiler import (
+    COMPILER_SCHEMA,
+    SAMPLE_VALUES,
+    VALID_DOCUMENT,
+    outcome,
+)
+
+SCHEMA_NAME = "9_9_8_compiler_test"
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class MLSchemaColumnsTestSuite(unittest.TestCase):
+    """MLSchemaColumns test cases - every row's errors must equal marshmallow's for
+    the row as a dict."""
+
+    default_registry = None
+
+    def setUp(self):
+        if MLSchemaColumnsTestSuite.default_registry is None:
+            MLSchemaColumnsTestSuite.default_registry = (
+                marshmallow.class_registry._registry.copy()
+            )
+        else:
+            marshmallow.class_registry._registry = (
+                MLSchemaColumnsTestSuite.default_registry.copy()
+            )
+        MLSchemaColumns.clear_cache()
+        MLSchema.populate_registry()
+        MLSchema.create_schema_type(COMPILER_SCHEMA)
+
+    def assert_same_as_marshmallow(self, columns, rows, schema_name=SCHEMA_NAME):
+        schema = marshmallow.class_registry.get_class(schema_name)()
+        expected = {}
+        for index, row in enumerate(rows):
+            row_errors = schema.validate(row)
+            if row_errors:
+                expected[index] = row_errors
+
+        error_mask, errors = MLSchemaColumns.validate(schema_name, columns)
+        self.assertEqual(errors, expected)
+        self.assertEqual(numpy.flatnonzero(error_mask).tolist(), list(expected))
+
+    def test_valid_columns(self):
+        columns = {
+            field_name: [value] * 3
+            for field_name, value in VALID_DOCUMENT.items()
+            if field_name != "location"
+        }
+        for field_name, value in VALID_DOCUMENT["location"].items():
+            columns[f"location.{field_name}"] = numpy.array([value] * 3)
+
+        error_mask, errors = MLSchemaColumns.validate(SCHEMA_NAME, columns)
+        self.assertEqual(errors, {})
+        self.assertEqual(error_mask.tolist(), [False] * 3)
+
+    def test_list_columns_with_every_value(self):
+        for field_name in VALID_DOCUMENT:
+            rows = []
+            for value in SAMPLE_VALUES:
+                row = dict(VALID_DOCUMENT)
+                row[field_name] = value
+                schema = marshmallow.class_registry.get_class(SCHEMA_NAME)()
+                if not isinstance(outcome(schema.validate, row), type):
+                    rows.append(row)
+
+            columns = {name: [row[name] for row in rows] for name in VALID_DOCUMENT}
+            self.assert_same_as_marshmallow(columns, rows)
+
+    def test_array_columns_with_every_value(self):
+        arrays = [
+            numpy.array([0, 3, 12, -1]),
+            numpy.array([0, 3, 12, 255], dtype=numpy.uint8),
+            numpy.array([0.5, 2.5, 12.0, numpy.nan, numpy.inf], dtype=numpy.float32),
+            numpy.array([True, False]),
+            numpy.array([value for value in SAMPLE_VALUES if isinstance(value, str)]),
+            numpy.array(["6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1", "6A6AC9B2FC8C"]),
+            numpy.array(["{6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1}", "6a6ac9b2"]),
+        ]
+        for field_name in VALID_DOCUMENT:
+            if field_name == "location":
+                continue
+            for array in arrays:
+                rows = []
+                for value in array.tolist():
+                    row = dict(VALID_DOCUMENT)
+                    row[field_name] = value
+                    rows.append(row)
+
+                columns = {name: [row[name] for row in rows] for name in VALID_DOCUMENT}
+                columns[field_name] = array
+                self.assert_same_as_marshmallow(columns, rows)
+
+    def test_large_int_columns(self):
+        # int64 arithmetic on these overflows - rows must still match marshmallow
+        MLSchema.create_schema_type(
+            COMPILER_SCHEMA.replace("meta: 9.9.8", "meta: 9.9.7")
+            .replace("'x >= 10'", "'x * 1000 <= 1000000'")
+            .replace("'x < 1'", "'x * 4 > 1'")
+        )
+        values = [2**62, 2**62 + 1, -(2**62), 2**53 + 1, 2**63 - 1, 1000, 1001]
+        rows = []
+        for value in values:
+            row = dict(VALID_DOCUMENT)
+            row["count"] = value
+            row["ratio"] = value
+            rows.append(row)
+
+        columns = {name: [row[name] for row in rows] for name in VALID_DOCUMENT}
+        columns["count"] = numpy.array(values)
+        columns["ratio"] = numpy.array(values)
+        self.assert_same_as_marshmallow(columns, rows, "9_9_7_compiler_test")
+
+    def test_nested_columns(self):
+        depths = numpy.array([4, 3, 2])
+        rows = []
+        for depth in depths.tolist():
+            row = dict(VALID_DOCUMENT)
+            row["location"] = {"bucket": "my-bucket", "depth": depth}
+            rows.append(row)
+
+        columns = {
+            name: [VALID_DOCUMENT[name]] * 3
+            for name in VALID_DOCUMENT
+            if name != "location"
+        }
+        columns["location.bucket"] = ["my-bucket"] * 3
+        columns["location.depth"] = depths
+        self.assert_same_as_marshmallow(columns, rows)
+
+        # A nested column that is not in the nested schema
+        columns["location.surprise"] = [1, 2, 3]
+        for row in rows:
+            row["location"]["surprise"] = 1
+        error_mask, errors = MLSchemaColumns.validate(SCHEMA_NAME, columns)
+        self.assertTrue(error_mask.all())
+        self.assertEqual(errors[0], {"location": {"surprise": ["Unknown field."]}})
+
+    def test_missing_and_unknown_columns(self):
+        columns = {name: [VALID_DOCUMENT[name]] * 2 for name in VALID_DOCUMENT}
+        columns.pop("color")
+        self.assertEqual(MLSchemaColumns.validate(SCHEMA_NAME, columns)[1], {})
+
+        columns.pop("name")
+        error_mask, errors = MLSchemaColumns.validate(SCHEMA_NAME, columns)
+        self.assertEqual(error_mask.tolist(), [True, True])
+        self.assertEqual(errors[1], {"name": ["Missing data for required field."]})
+
+        columns["name"] = ["a name", None]
+        columns["surprise"] = numpy.array([1, 2])
+        error_mask, errors = MLSchemaColumns.validate(SCHEMA_NAME, columns)
+        self.assertEqual(errors[0], {"surprise": ["Unknown field."]})
+        self.assertEqual(
+            errors[1],
+            {"name": ["Field may not be null."], "surprise": ["Unknown field."]},
+        )
+
+    def test_invalid_columns(self):
+        with self.assertRaises(ValueError):
+            MLSchemaColumns.validate(SCHEMA_NAME, {"name": ["a"], "count": [1, 2]})
+        with self.assertRaises(ValueError):
+            MLSchemaColumns.validate(SCHEMA_NAME, {"count": numpy.ones((2, 2))})
+        with self.assertRaises(ValueError):
+            MLSchemaColumns.validate(
+                SCHEMA_NAME, {"location": [{}], "location.depth": [2]}
+            )
+
+    def test_dtype_for(self):
+        record_dtype = MLSchemaColumns.dtype_for(SCHEMA_NAME)
+        self.assertEqual(record_dtype["count"], numpy.int64)
+        self.assertEqual(record_dtype["ratio"], numpy.float64)
+        self.assertEqual(record_dtype["flag"], numpy.bool_)
+        self.assertEqual(record_dtype["name"], numpy.dtype("U64"))
+        self.assertEqual(record_dtype["color"], numpy.dtype("U5"))
+        self.assertEqual(record_dtype["run_id"], numpy.dtype("U36"))
+        self.assertEqual(record_dtype["run_date"], numpy.dtype("datetime64[us]"))
+        self.assertEqual(record_dtype["items"], object)
+        self.assertEqual(record_dtype["location.depth"], numpy.int64)
+        self.assertNotIn("location", record_dtype.names)
+
+        self.assertEqual(
+            MLSchemaColumns.dtype_for(SCHEMA_NAME, string_width=8)["name"],
+            numpy.dtype("U8"),
+        )
+
+    def test_pack(self):
+        partial = dict(VALID_DOCUMENT)
+        partial.pop("count")
+        partial["ratio"] = None
+        partial["location"] = {"bucket": "my-bucket"}
+        ml_object, errors = MLObject.create_object_from_string(VALID_DOCUMENT)
+        self.assertEqual(errors, {})
+        record = MLRecord.type_for_schema(SCHEMA_NAME).from_dict(VALID_DOCUMENT)
+
+        with patch("mlspeclib.mlschemacolumns.PACK_CHUNK_SIZE", 2):
+            records = MLSchemaColumns.pack(
+                SCHEMA_NAME, iter([VALID_DOCUMENT, partial, ml_object, record]), count=1
+            )
+
+        self.assertEqual(records.dtype, MLSchemaColumns.dtype_for(SCHEMA_NAME))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records["count"].tolist(), [11, None, 11, 11])
+        self.assertEqual(records["ratio"].tolist(), [0.5, None, 0.5, 0.5])
+        self.assertEqual(records["location.depth"].tolist(), [4, None, 4, 4])
+        self.assertEqual(records["name"].tolist(), ["a name"] * 4)
+        self.assertEqual(
+            records["run_date"][0], numpy.datetime64("2020-01-01T10:11:12")
+        )
+        self.assertEqual(records["run_id"][2], VALID_DOCUMENT["run_id"])
+        self.assertEqual(records["items"][3], [1, "two"])
+
+        # Packed rows are still valid
+        complete_rows = records.data[[0, 2, 3]]
+        error_mask, _ = MLSchemaColumns.validate(
+            SCHEMA_NAME, {name: complete_rows[name] for name in records.dtype.names}
+        )
+        self.assertFalse(error_mask.any())
+
+    def test_pack_converts_values(self):
+        document = dict(VALID_DOCUMENT)
+        document["count"] = "12"
+        document["run_id"] = "6A6AC9B2FC8C4E469E340E5A3A8CD1D1"
+        document["run_date"] = datetime.datetime(
+            2020, 1, 1, 10, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+        )
+        records = MLSchemaColumns.pack(SCHEMA_NAME, [document])
+        self.assertEqual(records["count"][0], 12)
+        self.assertEqual(records["run_id"][0], "6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1")
+        self.assertEqual(records["run_date"][0], numpy.datetime64("2020-01-01T08:00"))
+
+        document["name"] = "x" * 65
+        with self.assertRaises(ValueError):
+            MLSchemaColumns.pack(SCHEMA_NAME, [document])
+        self.assertEqual(len(MLSchemaColumns.pack(SCHEMA_NAME, [])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,313 @@
+# pylint: disable=protected-access,missing-function-docstring, missing-class-docstring, missing-module-docstring
+# -*- coding: utf-8 -*-
+import datetime
+import unittest
+import uuid
+from pathlib import Path
+
+import marshmallow.class_registry
+from marshmallow import Schema, fields, post_load
+
+from mlspeclib.helpers import convert_yaml_to_dict
+from mlspeclib.mlschema import MLSchema
+from mlspeclib.mlschemacompiler import MLSchemaCompiler
+
+COMPILER_SCHEMA = """
+mlspec_schema_version:
+  meta: 9.9.8
+mlspec_schema_type:
+  meta: compiler_test
+schema_version:
+  type: semver
+  required: True
+schema_type:
+  type: allowed_schema_types
+  required: True
+name:
+  type: string
+  required: True
+code:
+  type: string
+  regex: '^[A-Z]{3}$'
+color:
+  type: string
+  allowed:
+    - red
+    - green
+count:
+  type: int
+  constraint: 'x >= 10'
+ratio:
+  type: float
+  constraint: 'x < 1'
+flag:
+  type: boolean
+run_id:
+  type: uuid
+run_date:
+  type: datetime
+endpoint:
+  type: uri
+local_path:
+  type: path
+bucket_name:
+  type: bucket
+email:
+  type: email
+items:
+  type: list
+labels:
+  type: list_strings
+tags:
+  type: tags
+extra:
+  type: dict
+not_empty:
+  type: string
+  empty: False
+location:
+  type: nested
+  schema:
+    bucket:
+      type: bucket
+      required: True
+    key_id:
+      type: string
+      regex: '^[A-Z0-9]{4}$'
+    depth:
+      type: int
+      constraint: 'x % 2 == 0'
+"""
+
+VALID_DOCUMENT = {
+    "schema_version": "9.9.8",
+    "schema_type": "compiler_test",
+    "name": "a name",
+    "code": "ABC",
+    "color": "red",
+    "count": 11,
+    "ratio": 0.5,
+    "flag": True,
+    "run_id": "6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1",
+    "run_date": "2020-01-01T10:11:12",
+    "endpoint": "https://example.com/a",
+    "local_path": "/tmp/path",
+    "bucket_name": "my-bucket",
+    "email": "a@example.com",
+    "items": [1, "two"],
+    "labels": ["a", "b"],
+    "tags": [["a", "b"]],
+    "extra": {"a": 1},
+    "not_empty": "x",
+    "location": {"bucket": "my-bucket", "key_id": "AB12", "depth": 4},
+}
+
+SAMPLE_VALUES = [
+    None,
+    "",
+    "ABC",
+    "red",
+    "abc def",
+    "1.0.0",
+    "not a semver",
+    "12",
+    "0.25",
+    "true",
+    "nan",
+    "6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1",
+    "2020-01-01T10:11:12",
+    "https://example.com",
+    "a@example.com",
+    b"ABC",
+    b"\xff\xfe",
+    0,
+    3,
+    12,
+    -1,
+    10**400,
+    0.5,
+    2.5,
+    float("nan"),
+    float("inf"),
+    True,
+    False,
+    [],
+    ["a", 1],
+    [["a", "b"]],
+    {},
+    {"bucket": "my-bucket"},
+    {"bucket": "x", "depth": 3, "key_id": "lower", "surprise": 1},
+    uuid.UUID("6a6ac9b2-fc8c-4e46-9e34-0e5a3a8cd1d1"),
+    datetime.datetime(2020, 1, 1),
+    "bucket: my-bucket\ndepth: 2",
+]
+
+
+def outcome(validate_function, document):
+    """Errors returned, or the type of exception raised, for comparing validators."""
+    try:
+        return validate_function(document)
+    except Exception as error:  # pylint: disable=broad-except
+        return type(error)
+
+
+class MLSchemaCompilerTestSuite(unittest.TestCase):
+    """MLSchemaCompiler differential test cases - every compiled result must equal
+    marshmallow's."""
+
+    default_registry = None
+
+    def setUp(self):
+        if MLSchemaCompilerTestSuite.default_registry is None:
+            MLSchemaCompilerTestSuite.default_registry = (
+                marshmallow.class_registry._registry.copy()
+            )
+        else:
+            marshmallow.class_registry._registry = (
+                MLSchemaCompilerTestSuite.default_registry.copy()
+            )
+        MLSchemaCompiler.clear_cache()
+        MLSchema.populate_registry()
+        MLSchema.create_schema_type(COMPILER_SCHEMA)
+
+    def assert_same_as_marshmallow(self, schema_name, document):
+        expected = outcome(
+            marshmallow.class_registry.get_class(schema_name)().validate, document
+        )
+        actual = outcome(MLSchemaCompiler.validator_for(schema_name), document)
+        self.assertEqual(actual, expected, f"Document: {document}")
+
+    def test_valid_document(self):
+        validator = MLSchemaCompiler.validator_for("9_9_8_compiler_test")
+        self.assertEqual(validator(VALID_DOCUMENT), {})
+        self.assert_same_as_marshmallow("9_9_8_compiler_test", VALID_DOCUMENT)
+
+    def test_every_field_with_every_value(self):
+        for field_name in VALID_DOCUMENT:
+            missing_field = dict(VALID_DOCUMENT)
+            missing_field.pop(field_name)
+            self.assert_same_as_marshmallow("9_9_8_compiler_test", missing_field)
+
+            for value in SAMPLE_VALUES:
+                document = dict(VALID_DOCUMENT)
+                document[field_name] = value
+                self.assert_same_as_marshmallow("9_9_8_compiler_test", document)
+
+    def test_nested_fields_with_every_value(self):
+        for field_name in VALID_DOCUMENT["location"]:
+            for value in SAMPLE_VALUES:
+                document = dict(VALID_DOCUMENT)
+                document["location"] = dict(VALID_DOCUMENT["location"])
+                document["location"][field_name] = value
+                self.assert_same_as_marshmallow("9_9_8_compiler_test", document)
+
+    def test_unknown_fields_and_input_types(self):
+        document = dict(VALID_DOCUMENT)
+        document["surprise"] = 1
+        document[3] = "three"
+        self.assert_same_as_marshmallow("9_9_8_compiler_test", document)
+        self.assertEqual(
+            MLSchemaCompiler.validator_for("9_9_8_compiler_test")(document)[
+                "surprise"
+            ],
+            ["Unknown field."],
+        )
+
+        for document in [
+            "name: only a name",
+            '{"name": 5}',
+            "- a list",
+            [],
+            5,
+            b"name: bytes",
+        ]:
+            self.assert_same_as_marshmallow("9_9_8_compiler_test", document)
+
+    def test_sample_submissions(self):
+        for submission_path in sorted(Path("tests/data").glob("**/*.yaml")):
+            submission = convert_yaml_to_dict(submission_path.read_text("utf-8"))
+            schema_name = MLSchema.load_schema_from_registry(submission).schema_name
+            self.assert_same_as_marshmallow(schema_name, submission)
+
+            for field_name in submission:
+                for value in [None, "", 5, [], {}]:
+                    document = dict(submission)
+                    document[field_name] = value
+                    self.assert_same_as_marshmallow(schema_name, document)
+
+    def test_cached_per_schema_name(self):
+        validator = MLSchemaCompiler.validator_for("9_9_8_compiler_test")
+        self.assertIs(MLSchemaCompiler.validator_for("9_9_8_compiler_test"), validator)
+
+        # Re-registering the name compiles the new schema
+        marshmallow.class_registry._registry.pop("9_9_8_compiler_test")
+        MLSchema.create_schema_type(COMPILER_SCHEMA)
+        self.assertIsNot(
+            MLSchemaCompiler.validator_for("9_9_8_compiler_test"), validator
+        )
+
+    def test_change_validator(self):
+        schema_class = marshmallow.class_registry.get_class("9_9_8_compiler_test")
+        validate_changes = MLSchemaCompiler.change_validator_for(schema_class)
+        self.assertIs(
+            MLSchemaCompiler.change_validator_for(schema_class()), validate_changes
+        )
+
+        for field_name in VALID_DOCUMENT:
+            for value in SAMPLE_VALUES:
+                document = dict(VALID_DOCUMENT)
+                document[field_name] = value
+                changes = {field_name: True}
+                self.assertEqual(
+                    outcome(lambda data: validate_changes(data, changes), document),
+                    outcome(schema_class().validate, document),
+                    f"Document: {document}",
+                )
+
+        for value in SAMPLE_VALUES:
+            document = dict(VALID_DOCUMENT)
+            document["location"] = dict(VALID_DOCUMENT["location"], depth=value)
+            changes = {"location": {"depth": True}}
+            self.assertEqual(
+                outcome(lambda data: validate_changes(data, changes), document),
+                outcome(schema_class().validate, document),
+                f"Document: {document}",
+            )
+
+        document = dict(VALID_DOCUMENT, surprise=1)
+        document.pop("name")
+        self.assertEqual(
+            validate_changes(document, {"surprise": True, "name": True, "gone": True}),
+            schema_class().validate(document),
+        )
+
+    def test_schemas_with_other_hooks_use_marshmallow(self):
+        class HookedSchema(Schema):
+            name = fields.Str(required=True)
+
+            @post_load
+            def make_object(self, data, **kwargs):
+                return data
+
+        schema = HookedSchema()
+        self.assertFalse(MLSchemaCompiler.is_compilable(schema))
+        self.assertEqual(MLSchemaCompiler.compile(schema), schema.validate)
+        self.assertIsNone(MLSchemaCompiler.change_validator_for(schema))
+
+    def test_validate_batch_compiled(self):
+        documents = []
+        for i in range(20):
+            document = dict(VALID_DOCUMENT)
+            document["count"] = i
+            documents.append(document)
+        documents.append(Path("tests/data/0/0/1/datapath.yaml").read_text("utf-8"))
+        documents.append("schema_type: nothing\nschema_version: 0.0.1")
+
+        self.assertEqual(
+            list(MLSchema.validate_batch(documents)),
+            list(MLSchema.validate_batch(documents, compiled=False)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
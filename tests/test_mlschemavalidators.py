@@ -101,13 +101,28 @@ schema_type:
             SampleSchema.TEST.INVALID_REGEX, None, AssertionError, "valid regex"
         )
 
-    # @unittest.skip("NYI")
-    # def test_path(self):
-    #     self.assertTrue(False)
+    def test_path(self):
+        self.assertTrue(MLSchemaValidators.validate_type_path("/tmp/a-path/file.txt"))
+        self.assertFalse(MLSchemaValidators.validate_type_path("/tmp/UPPER CASE"))
 
-    # @unittest.skip("NYI")
-    # def test_bucket(self):
-    #     self.assertTrue(False)
+    def test_bucket(self):
+        self.assertTrue(MLSchemaValidators.validate_type_bucket("my-bucket.name"))
+        self.assertFalse(MLSchemaValidators.validate_type_bucket("192.168.1.1"))
+        self.assertFalse(MLSchemaValidators.validate_type_bucket("-bucket"))
+
+    def test_validator_results_memoized(self):
+        MLSchemaValidators.clear_caches()
+        for _ in range(3):
+            self.assertTrue(MLSchemaValidators.validate_type_semver("1.2.3"))
+            self.assertFalse(MLSchemaValidators.validate_type_URI("not a uri"))
+
+        cache_info = MLSchemaValidators.cache_info()
+        self.assertEqual((cache_info["semver"].hits, cache_info["semver"].misses), (2, 1))
+        self.assertEqual((cache_info["URI"].hits, cache_info["URI"].misses), (2, 1))
+        self.assertEqual(cache_info["path"].currsize, 0)
+
+        MLSchemaValidators.clear_caches()
+        self.assertEqual(MLSchemaValidators.cache_info()["semver"].currsize, 0)
 
     def test_interfaces_valid(self):
         instantiated_object = self.generic_schema_validator(
@@ -122,6 +137,11 @@ schema_type:
         )
         self.assertTrue(len(instantiated_object["inputs"]) == 2)
 
+    def test_interfaces_do_not_modify_submission(self):
+        interface = {"videos": {"type": "LocalPath"}}
+        self.assertTrue(MLSchemaValidators.validate_type_interfaces(interface))
+        self.assertEqual(interface, {"videos": {"type": "LocalPath"}})
+
     # @unittest.skip("Type is not required in KFP (but it should be)")
     # def test_interfaces_missing_type(self):
     #     self.generic_schema_validator(